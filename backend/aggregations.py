@@ -0,0 +1,176 @@
+# aggregations.py - ANALYSE charts computed locally (exact counts, estimated amounts), no LLM numbers
+import re
+from collections import Counter, defaultdict
+
+from normalize import canonical_category, canonical_company, normalize_date
+
+PALETTE = ["#6366f1", "#8b5cf6", "#06b6d4", "#10b981", "#f59e0b", "#ef4444"]
+UNKNOWN = "Unknown"
+
+# "$1,234.56", "USD 1234.56", "1,234.56 USD"
+AMOUNT_RE = re.compile(
+    r"(?:\$|usd\s?)\s?(\d{1,3}(?:,\d{3})+(?:\.\d{2})?|\d+(?:\.\d{2})?)|(\d{1,3}(?:,\d{3})+\.\d{2}|\d+\.\d{2})\s?usd",
+    re.IGNORECASE,
+)
+MONEY_WORDS = re.compile(r"\b(bill\w*|amount\w*|payment\w*|paid|cost\w*|charge\w*|total\w*|revenue|invoice\w*|spend\w*|\$)",
+                         re.IGNORECASE)
+COUNT_WORDS = re.compile(r"\b(how many|count\w*|number of|volume|distribution|breakdown|overview|statistic\w*|frequenc\w*)\b",
+                         re.IGNORECASE)
+TIME_WORDS = re.compile(r"\b(over time|trend\w*|timeline|monthly|yearly|annual\w*|quarterly|per (?:month|year|quarter)|"
+                        r"by (?:month|year|quarter|date|period)|each (?:month|year)|growth)\b", re.IGNORECASE)
+COMPANY_WORDS = re.compile(r"\b(compan(?:y|ies)|vendors?|providers?|clients?|customers?|labs?)\b", re.IGNORECASE)
+CATEGORY_WORDS = re.compile(r"\b(categor(?:y|ies)|document types?|types? of documents?|by type)\b", re.IGNORECASE)
+# Subjects the document-level counts cannot answer; those questions keep the model's own charts
+CONTENT_WORDS = re.compile(r"\b(diagnos\w*|tests?|testing|drugs?|medications?|prescri\w*|outcomes?|results?|symptoms?|"
+                           r"procedures?|patients?|treatments?|conditions?|diseases?|payers?|insur\w*)\b", re.IGNORECASE)
+
+
+def requested_views(request_text: str):
+    """
+    Which local aggregates answer the question: a subset of {"time", "company", "category",
+    "amount"}, or an empty set when it asks about something they cannot answer (diagnoses,
+    tests, outcomes...). No question at all means a general overview: every view.
+    """
+    text = (request_text or "").strip()
+    if not text:
+        return {"time", "company", "category", "amount"}
+    if CONTENT_WORDS.search(text):
+        return set()
+    dimensions = {name for name, words in (("time", TIME_WORDS), ("company", COMPANY_WORDS),
+                                           ("category", CATEGORY_WORDS)) if words.search(text)}
+    money = bool(MONEY_WORDS.search(text))
+    if not (dimensions or money or COUNT_WORDS.search(text)):
+        return set()
+    if not dimensions:
+        dimensions = {"time", "company", "category"}
+    return dimensions | ({"amount"} if money else set())
+
+
+def document_period(f: dict):
+    """(year, month) the same way the indexer derives it: date field first, then the description head."""
+    year, month = normalize_date(f.get("date"))
+    if year is None:
+        year, month = normalize_date((f.get("description") or "")[:2000])
+    return year, month
+
+
+def document_amount(f: dict, facts: dict = None):
+    """
+    Estimated billed amount for one document: the largest amount extracted for it (map step
+    facts when available, else currency amounts in the text). On invoices and statements that is
+    usually the total, but it is a heuristic (line items and payments are not reconciled), so
+    it is reported as an estimate and never as an exact aggregate.
+    """
+    values = []
+    for amount in (facts or {}).get("amounts") or []:
+        value = amount.get("value") if isinstance(amount, dict) else amount
+        try:
+            values.append(float(str(value).replace(",", "").replace("$", "")))
+        except (TypeError, ValueError):
+            continue
+    if not values:
+        for m in AMOUNT_RE.finditer(f.get("description") or ""):
+            values.append(float((m.group(1) or m.group(2)).replace(",", "")))
+    return max(values) if values else None
+
+
+def _colors(n: int):
+    return [PALETTE[i % len(PALETTE)] for i in range(n)]
+
+
+def _period_label(year, month):
+    return f"{year}-{month:02d}" if month else str(year)
+
+
+def _bucket(periods):
+    """
+    One granularity for every time bucket: months when every dated document has a month,
+    otherwise years (a year-only document cannot be placed in a month).
+    """
+    monthly = all(month for _, month in periods)
+    return (lambda period: period) if monthly else (lambda period: (period[0], None))
+
+
+def _series_chart(chart_type, title, label, counter, order=None):
+    labels = order if order is not None else [k for k, _ in counter.most_common()]
+    data = [round(counter[k], 2) for k in labels]
+    colors = _colors(len(labels)) if chart_type in ("pie", "doughnut") else [PALETTE[0]] * len(labels)
+    return {
+        "type": chart_type,
+        "title": title,
+        "labels": labels,
+        "datasets": [{"label": label, "data": data, "backgroundColor": colors}],
+    }
+
+
+def build_aggregates(files, facts=None, request_text: str = ""):
+    """
+    Return {"charts", "tables", "summary", "estimates"} for the selected documents, limited to
+    the views the question asks for (see requested_views; no charts when it asks for something
+    else). Charts follow the schema renderAnalysisCharts expects. "summary" holds the exact
+    counts for the narrative prompt; "estimates" the heuristic billed amounts, kept apart.
+    """
+    views = requested_views(request_text)
+    facts = facts or [None] * len(files)
+    dated, companies, categories = [], Counter(), Counter()
+    amounts = []  # (period or None, amount)
+    undated = 0
+
+    for f, doc_facts in zip(files, facts):
+        year, month = document_period(f)
+        period = (year, month) if year else None
+        if period:
+            dated.append(period)
+        else:
+            undated += 1
+        companies[canonical_company(f.get("company")) or UNKNOWN] += 1
+        categories[canonical_category(f.get("category")) or UNKNOWN] += 1
+
+        amount = document_amount(f, doc_facts)
+        if amount is not None:
+            amounts.append((period, amount))
+
+    bucket = _bucket(dated)
+    periods = Counter(bucket(p) for p in dated)
+    charts, tables, summary, estimates = [], [], {"documents": len(files)}, {}
+
+    ordered = sorted(periods, key=lambda p: (p[0], p[1] or 0))
+    if "time" in views and len(ordered) >= 2:
+        labels = [_period_label(*p) for p in ordered]
+        counter = Counter({_period_label(*p): n for p, n in periods.items()})
+        charts.append(_series_chart("line", "Documents over time", "Documents", counter, labels))
+    summary["documents_by_period"] = {_period_label(*p): periods[p] for p in ordered}
+    if undated:
+        summary["undated_documents"] = undated
+
+    if "company" in views and len(companies) >= 2:
+        charts.append(_series_chart("bar", "Documents by company", "Documents", companies))
+    summary["documents_by_company"] = dict(companies.most_common())
+
+    if "category" in views and len(categories) >= 2:
+        charts.append(_series_chart("doughnut", "Documents by category", "Documents", categories))
+    summary["documents_by_category"] = dict(categories.most_common())
+
+    if "amount" in views and amounts:
+        totals = defaultdict(float)
+        for period, amount in amounts:
+            totals[bucket(period) if period else None] += amount
+        dated_totals = sorted((p for p in totals if p), key=lambda p: (p[0], p[1] or 0))
+        grand_total = round(sum(totals.values()), 2)
+        if len(dated_totals) >= 2:
+            labels = [_period_label(*p) for p in dated_totals]
+            counter = Counter({_period_label(*p): totals[p] for p in dated_totals})
+            charts.append(_series_chart("bar", "Estimated billed amount over time (USD)", "Estimated amount",
+                                        counter, labels))
+        rows = [[_period_label(*p), f"{totals[p]:,.2f}"] for p in dated_totals]
+        if None in totals:
+            rows.append(["Undated", f"{totals[None]:,.2f}"])
+        rows.append(["Total", f"{grand_total:,.2f}"])
+        tables.append({"title": "Estimated billed amounts (largest amount found per document, not reconciled)",
+                       "headers": ["Period", "Estimated amount (USD)"], "rows": rows})
+        estimates["billed_total_usd"] = grand_total
+        estimates["documents_with_amounts"] = len(amounts)
+        estimates["billed_by_period_usd"] = {("Undated" if p is None else _period_label(*p)): round(v, 2)
+                                             for p, v in totals.items()}
+
+    return {"charts": charts, "tables": tables, "summary": summary, "estimates": estimates}
@@ -0,0 +1,256 @@
+# analysis.py - map-reduce ANALYSE: per-document fact extraction (cached) feeding one reduce prompt
+import contextvars
+import hashlib
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from metrics import record_tokens, stage
+
+log = logging.getLogger(__name__)
+
+# Bump when EXTRACT_SYSTEM_PROMPT changes so cached facts are re-extracted
+EXTRACT_VERSION = "1"
+
+EXTRACT_SYSTEM_PROMPT = """You extract structured facts from one medical laboratory document (or one part of it).
+
+Respond with VALID JSON only, no markdown, using exactly these keys (empty lists when absent):
+{
+  "document_type": "invoice|bank statement|lab report|claim|policy|compliance|correspondence|other",
+  "dates": ["YYYY-MM-DD or as written"],
+  "amounts": [{"value": 123.45, "currency": "USD", "label": "what the amount is for", "date": "YYYY-MM-DD or null"}],
+  "payers": ["insurers, companies or people paying"],
+  "patients": ["patient names"],
+  "diagnoses": ["diagnoses or ICD codes"],
+  "tests": ["lab tests or procedures"],
+  "companies": ["organisations mentioned"],
+  "notes": "one or two sentences with anything else relevant to an analyst"
+}
+
+Copy numbers exactly as written; never invent values."""
+
+LIST_FIELDS = ("dates", "amounts", "payers", "patients", "diagnoses", "tests", "companies")
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha1(f"{EXTRACT_VERSION}\0{text}".encode("utf-8")).hexdigest()
+
+
+def document_key(f: dict) -> str:
+    """Stable identity for a dropped file: database id when known, else its path or name."""
+    for field in ("id", "filepath", "filename"):
+        if f.get(field) not in (None, ""):
+            return f"{field}:{f[field]}"
+    return "anonymous"
+
+
+def chunk_text(text: str, size: int):
+    """Split on paragraph boundaries into pieces of at most ~size characters."""
+    if len(text) <= size:
+        return [text]
+    chunks, current = [], ""
+    for part in re.split(r"(\n\s*\n)", text):
+        if current and len(current) + len(part) > size:
+            chunks.append(current)
+            current = ""
+        while len(part) > size:
+            chunks.append(part[:size])
+            part = part[size:]
+        current += part
+    if current.strip():
+        chunks.append(current)
+    return chunks
+
+
+def parse_facts(content: str) -> dict:
+    clean = content.strip()
+    if clean.startswith("```"):
+        clean = re.sub(r"^```\w*\n?", "", clean)
+        clean = re.sub(r"\n?```$", "", clean)
+    try:
+        facts = json.loads(clean)
+    except json.JSONDecodeError:
+        return {"notes": clean[:1000]}
+    return facts if isinstance(facts, dict) else {"notes": str(facts)[:1000]}
+
+
+def merge_facts(parts):
+    """Combine per-chunk facts for one document, keeping list order and dropping duplicates."""
+    merged = {"document_type": None, "notes": []}
+    for field in LIST_FIELDS:
+        merged[field] = []
+    seen = {field: set() for field in LIST_FIELDS}
+    for facts in parts:
+        merged["document_type"] = merged["document_type"] or facts.get("document_type")
+        if facts.get("notes"):
+            merged["notes"].append(str(facts["notes"]))
+        for field in LIST_FIELDS:
+            values = facts.get(field) or []
+            for value in values if isinstance(values, list) else [values]:
+                marker = json.dumps(value, sort_keys=True, default=str)
+                if marker not in seen[field]:
+                    seen[field].add(marker)
+                    merged[field].append(value)
+    merged["notes"] = " ".join(merged["notes"])[:1500]
+    return merged
+
+
+class ExtractionCache:
+    """SQLite cache of per-document JSON (extracted facts, summaries) keyed by (document key, content hash)."""
+
+    def __init__(self, path, table: str = "extractions"):
+        self.path = path
+        self.table = table
+        self._lock = threading.Lock()
+        self._ready = False
+
+    def _connect(self):
+        conn = sqlite3.connect(str(self.path), timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def _ensure(self, conn):
+        if self._ready:
+            return
+        conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {self.table} ("
+            " doc_key TEXT NOT NULL, content_hash TEXT NOT NULL, facts TEXT NOT NULL, created_at REAL NOT NULL,"
+            " PRIMARY KEY (doc_key, content_hash))"
+        )
+        self._ready = True
+
+    def get_many(self, keys):
+        """keys: list of (doc_key, content_hash) -> {key: facts}"""
+        if not keys:
+            return {}
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        found = {}
+        conn = self._connect()
+        try:
+            self._ensure(conn)
+            for doc_key, digest in keys:
+                row = conn.execute(
+                    f"SELECT facts FROM {self.table} WHERE doc_key = ? AND content_hash = ?", (doc_key, digest)
+                ).fetchone()
+                if row is not None:
+                    found[(doc_key, digest)] = json.loads(row[0])
+        finally:
+            conn.close()
+        return found
+
+    def put(self, doc_key: str, digest: str, facts: dict):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            conn = self._connect()
+            try:
+                self._ensure(conn)
+                conn.execute(
+                    f"INSERT OR REPLACE INTO {self.table} (doc_key, content_hash, facts, created_at) VALUES (?, ?, ?, ?)",
+                    (doc_key, digest, json.dumps(facts, ensure_ascii=False, default=str), time.time()),
+                )
+            finally:
+                conn.close()
+
+
+class MapReduceAnalyzer:
+    """
+    Map step of ANALYSE for large document sets: each document (split into chunks when long)
+    is reduced to a compact facts JSON by a small, parallel LLM call, cached per document so
+    re-analysing the same files costs nothing. The caller feeds the facts to the usual
+    ANALYSE prompt (the reduce step) instead of the raw descriptions.
+    """
+
+    def __init__(self, get_client, cache: ExtractionCache, concurrency: int = 8, chunk_chars: int = 12000,
+                 model: str = "gpt-4o-mini"):
+        self._get_client = get_client
+        self.cache = cache
+        self.concurrency = concurrency
+        self.chunk_chars = chunk_chars
+        self.model = model
+
+    def _extract_chunk(self, filename: str, category: str, text: str) -> dict:
+        with stage("llm_map"):
+            response = self._get_client().chat.completions.create(
+                model=self.model,
+                messages=[
+                    {"role": "system", "content": EXTRACT_SYSTEM_PROMPT},
+                    {"role": "user", "content": f"Document: {filename} (Category: {category})\n\n{text}"},
+                ],
+                temperature=0,
+                max_tokens=800,
+            )
+        record_tokens("analyse_map", getattr(response, "usage", None))
+        return parse_facts(response.choices[0].message.content)
+
+    def extract(self, files, progress=None):
+        """Return one facts dict per file (same order). progress(done, total) after each document."""
+        progress = progress or (lambda done, total: None)
+        keys = [(document_key(f), content_hash(f.get("description") or "")) for f in files]
+        cached = self.cache.get_many(list(set(keys)))
+        results = [cached.get(key) for key in keys]
+
+        # Identical documents dropped twice are extracted once
+        todo = {}
+        for index, key in enumerate(keys):
+            if results[index] is None:
+                todo.setdefault(key, []).append(index)
+        done = len(files) - sum(len(v) for v in todo.values())
+        progress(done, len(files))
+        if not todo:
+            return results
+
+        # Chunks of long documents are extracted in parallel too, then merged per document
+        chunks = {}
+        for key, indexes in todo.items():
+            f = files[indexes[0]]
+            chunks[key] = chunk_text(f.get("description") or "", self.chunk_chars)
+        parts = {key: [None] * len(pieces) for key, pieces in chunks.items()}
+        remaining = {key: len(pieces) for key, pieces in chunks.items()}
+        failed = set()
+
+        with ThreadPoolExecutor(max_workers=max(1, min(self.concurrency, sum(remaining.values()))),
+                                thread_name_prefix="analyse-map") as pool:
+            futures = {}
+            for key, pieces in chunks.items():
+                f = files[todo[key][0]]
+                for n, piece in enumerate(pieces):
+                    # Each call runs in a copy of the caller's context so its tokens are charged to the same tenant
+                    future = pool.submit(contextvars.copy_context().run, self._extract_chunk,
+                                         f.get("filename", "Document"), f.get("category", "Unknown"), piece)
+                    futures[future] = (key, n)
+            for future in as_completed(futures):
+                key, n = futures[future]
+                try:
+                    parts[key][n] = future.result()
+                except Exception as exc:
+                    # One unreadable chunk should not sink the whole analysis
+                    log.warning("fact extraction failed for %s: %s", key[0], exc)
+                    parts[key][n] = {"notes": f"Extraction failed: {exc}"}
+                    failed.add(key)
+                remaining[key] -= 1
+                if remaining[key]:
+                    continue
+                facts = parts[key][0] if len(parts[key]) == 1 else merge_facts(parts[key])
+                if key not in failed:  # retry failed documents next time
+                    self.cache.put(key[0], key[1], facts)
+                for index in todo[key]:
+                    results[index] = facts
+                done += len(todo[key])
+                progress(done, len(files))
+        return results
+
+
+def facts_context(files, facts) -> str:
+    """Document context for the reduce prompt: one compact facts line per document."""
+    parts = []
+    for i, (f, doc_facts) in enumerate(zip(files, facts), 1):
+        filename = f.get("filename", f"Document {i}")
+        category = f.get("category", "Unknown")
+        compact = {k: v for k, v in (doc_facts or {}).items() if v not in (None, "", [])}
+        parts.append(f"=== Document {i}: {filename} (Category: {category}) ===\n"
+                     f"{json.dumps(compact, ensure_ascii=False, separators=(',', ':'), default=str)}")
+    return "\n\n".join(parts)
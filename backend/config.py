@@ -0,0 +1,137 @@
+# config.py - env-driven settings shared by every module (values from .env when present)
+import os
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+load_dotenv()  # load values from .env if present
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+STATIC_DIR = BASE_DIR / "frontend" / "dist"
+CHAT_STORE_DIR = Path(os.getenv("CHAT_STORE_DIR", BASE_DIR / "TEMP_STORAGE"))
+
+# Restrict file serving; set FILE_BASE_PATH in .env if files live elsewhere (e.g., C:\Users\Owner\Desktop)
+ALLOWED_BASE_PATH = os.path.abspath(os.getenv("FILE_BASE_PATH", os.getcwd()))
+# Document previews: stat results cached briefly; max-age 0 means always revalidate (cheap 304s)
+FILE_STAT_TTL = float(os.getenv("FILE_STAT_TTL", "10"))
+FILE_CACHE_MAX_AGE = int(os.getenv("FILE_CACHE_MAX_AGE", "0"))
+# Rendered thumbnails/text previews live on disk keyed by path + mtime; renders run in a small process pool
+PREVIEW_CACHE_DIR = Path(os.getenv("PREVIEW_CACHE_DIR", BASE_DIR / "preview_cache"))
+PREVIEW_WAIT_SECONDS = float(os.getenv("PREVIEW_WAIT_SECONDS", "5"))
+PREVIEW_PREFETCH = int(os.getenv("PREVIEW_PREFETCH", "12"))
+PREVIEW_WORKERS = int(os.getenv("PREVIEW_WORKERS", "2"))
+PREVIEW_CACHE_MAX_MB = float(os.getenv("PREVIEW_CACHE_MAX_MB", "1024"))
+PREVIEW_CACHE_MAX_AGE = float(os.getenv("PREVIEW_CACHE_MAX_AGE", str(30 * 86400)))  # seconds since last use
+
+DB_CONFIG = {
+    "host": os.getenv("DB_HOST", "localhost"),
+    "port": int(os.getenv("DB_PORT", "5433")),
+    "database": os.getenv("DB_NAME", "bismillah"),
+    "user": os.getenv("DB_USER", "postgres"),
+    "password": os.getenv("DB_PASSWORD", "Chicago@1713"),
+}
+DB_CONNECT_TIMEOUT = int(os.getenv("DB_CONNECT_TIMEOUT", "5"))
+
+# Per-worker pool used by request handlers; size DB_POOL_MAX to at least the worker's thread count
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "1"))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+# Workload classes: interactive searches and bulk work (show_all, batch, analyse) use separate pools whose
+# sessions carry their own statement_timeout/work_mem; DB_BULK_USER/PASSWORD log bulk work in as its own role
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "30000"))
+DB_WORK_MEM = os.getenv("DB_WORK_MEM", "")
+DB_BULK_POOL_MAX = int(os.getenv("DB_BULK_POOL_MAX", "4"))
+DB_BULK_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_BULK_STATEMENT_TIMEOUT_MS", "300000"))
+DB_BULK_WORK_MEM = os.getenv("DB_BULK_WORK_MEM", "")
+DB_BULK_USER = os.getenv("DB_BULK_USER", "")
+DB_BULK_PASSWORD = os.getenv("DB_BULK_PASSWORD", "")
+# Read replicas ("host[:port],..." with the primary's database and credentials) take search reads;
+# writes, maintenance and lag-sensitive reads stay on the primary. Replicas further than
+# DB_REPLICA_MAX_LAG seconds behind, or failing their health probe, are skipped.
+DB_REPLICAS = os.getenv("DB_REPLICAS", "")
+DB_REPLICA_STRATEGY = os.getenv("DB_REPLICA_STRATEGY", "least_connections")  # or round_robin
+DB_REPLICA_MAX_LAG = float(os.getenv("DB_REPLICA_MAX_LAG", "30"))
+DB_REPLICA_CHECK_INTERVAL = float(os.getenv("DB_REPLICA_CHECK_INTERVAL", "5"))
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "1000"))
+FACETS_CACHE_TTL = float(os.getenv("FACETS_CACHE_TTL", "30"))
+HEALTH_CACHE_TTL = float(os.getenv("HEALTH_CACHE_TTL", "5"))
+# When uml_temp is partitioned by document year (migrate_partitions.py), searches limited to some
+# years only scan those years' partitions (plus undated rows, including dates naming several years).
+# "date": only when the generated SQL's own predicate is on the date column alone; "intent": whenever
+# the question names years, also skipping other years' documents that merely mention them in the
+# description; "off"
+PARTITION_PRUNING = os.getenv("PARTITION_PRUNING", "date").lower()
+PARTITION_LAYOUT_TTL = float(os.getenv("PARTITION_LAYOUT_TTL", "300"))
+
+# Background indexer that keeps derived tables (uml_index, facets) in step with uml_temp
+INDEXER_ENABLED = os.getenv("INDEXER_ENABLED", "1") == "1"
+INDEXER_BATCH_SIZE = int(os.getenv("INDEXER_BATCH_SIZE", "1000"))
+INDEXER_INTERVAL = float(os.getenv("INDEXER_INTERVAL", "10"))
+
+# Run the per-worker warm-up in a background thread so a (re)spawned worker serves immediately
+WARM_UP_BACKGROUND = os.getenv("WARM_UP_BACKGROUND", "1") == "1"
+
+# Preforked workers share /metrics through per-process files here (gunicorn.conf.py sets a temporary
+# directory when unset); empty serves only the answering process's metrics (waitress, dev server)
+METRICS_DIR = os.getenv("METRICS_DIR", "")
+METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", "1"))
+
+# Concurrent identical searches / SQL statements share one LLM call and one DB execution
+COALESCE_REQUESTS = os.getenv("COALESCE_REQUESTS", "1") == "1"
+
+# match_reason is evaluated in Python for the returned rows (Postgres only filters); cached per row id
+MATCH_REASON_IN_APP = os.getenv("MATCH_REASON_IN_APP", "1") == "1"
+MATCH_REASON_CACHE_SIZE = int(os.getenv("MATCH_REASON_CACHE_SIZE", "100000"))
+MATCH_REASON_CACHE_TTL = float(os.getenv("MATCH_REASON_CACHE_TTL", "600"))
+
+# /batch-query: searches per call, and how many generate/execute at once (also capped by DB_POOL_MAX)
+BATCH_QUERY_MAX = int(os.getenv("BATCH_QUERY_MAX", "50"))
+BATCH_QUERY_WORKERS = int(os.getenv("BATCH_QUERY_WORKERS", "8"))
+
+# Long-running ANALYSE requests run as durable background jobs (SQLite file shared by all workers)
+ANALYSE_JOB_WORKERS = int(os.getenv("ANALYSE_JOB_WORKERS", "2"))
+JOB_DEDUP_TTL = float(os.getenv("JOB_DEDUP_TTL", "3600"))
+
+# Result snapshots (ordered row ids per chat message) let reopened chats reload rows by id
+SNAPSHOT_TTL = float(os.getenv("SNAPSHOT_TTL", str(30 * 86400)))  # 0 disables snapshots
+SNAPSHOT_MAX_IDS = int(os.getenv("SNAPSHOT_MAX_IDS", "100000"))
+SNAPSHOT_MAX_MB = float(os.getenv("SNAPSHOT_MAX_MB", "64"))
+
+# ANALYSE over many/long documents: per-document fact extraction (parallel, cached) before the final prompt
+ANALYSE_MAP_MIN_FILES = int(os.getenv("ANALYSE_MAP_MIN_FILES", "6"))
+ANALYSE_MAP_MIN_CHARS = int(os.getenv("ANALYSE_MAP_MIN_CHARS", "40000"))
+ANALYSE_MAP_CONCURRENCY = int(os.getenv("ANALYSE_MAP_CONCURRENCY", "8"))
+ANALYSE_CHUNK_CHARS = int(os.getenv("ANALYSE_CHUNK_CHARS", "12000"))
+
+# SUMMARY over many/long documents starts from cached per-document summaries (keyed by id + content hash)
+SUMMARY_COMPACT_MIN_FILES = int(os.getenv("SUMMARY_COMPACT_MIN_FILES", "4"))
+SUMMARY_COMPACT_MIN_CHARS = int(os.getenv("SUMMARY_COMPACT_MIN_CHARS", "30000"))
+SUMMARY_RAW_BUDGET_CHARS = int(os.getenv("SUMMARY_RAW_BUDGET_CHARS", "40000"))
+SUMMARY_PREFETCH_MIN_OPENS = int(os.getenv("SUMMARY_PREFETCH_MIN_OPENS", "3"))  # 0 disables background summaries
+
+# NL->SQL intent cache (paraphrases of the same search reuse SQL)
+SQL_CACHE_ENABLED = os.getenv("SQL_CACHE_ENABLED", "1") == "1"
+SQL_CACHE_TTL = float(os.getenv("SQL_CACHE_TTL", "86400"))
+SQL_CACHE_MAX_ENTRIES = int(os.getenv("SQL_CACHE_MAX_ENTRIES", "2000"))
+
+# OpenAI resilience: per-call timeout, retries with jittered backoff, circuit breaker (per worker)
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "30"))
+LLM_RETRIES = int(os.getenv("LLM_RETRIES", "2"))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "0.5"))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "8"))
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+LLM_BREAKER_RESET = float(os.getenv("LLM_BREAKER_RESET", "30"))
+
+# Per-tenant isolation. Tenants are identified by TENANT_HEADER (set by an auth proxy) or the client address.
+# The fair scheduler admits WORKLOAD_SLOTS searches/analyses at once per worker, at most WORKLOAD_BULK_SLOTS of
+# them bulk and QUOTA_CONCURRENT_QUERIES per tenant; budgets refill every QUOTA_WINDOW seconds (0 = unlimited)
+TENANT_HEADER = os.getenv("TENANT_HEADER", "X-User-Id")
+WORKLOAD_SLOTS = int(os.getenv("WORKLOAD_SLOTS", str(DB_POOL_MAX)))
+WORKLOAD_BULK_SLOTS = int(os.getenv("WORKLOAD_BULK_SLOTS", str(DB_BULK_POOL_MAX)))
+WORKLOAD_QUEUE_TIMEOUT = float(os.getenv("WORKLOAD_QUEUE_TIMEOUT", "30"))
+QUOTA_CONCURRENT_QUERIES = int(os.getenv("QUOTA_CONCURRENT_QUERIES", "4"))
+QUOTA_WINDOW = float(os.getenv("QUOTA_WINDOW", "3600"))
+QUOTA_LLM_TOKENS = int(os.getenv("QUOTA_LLM_TOKENS", "0"))
+QUOTA_ROWS = int(os.getenv("QUOTA_ROWS", "0"))
+QUOTA_MAX_ROWS_INTERACTIVE = int(os.getenv("QUOTA_MAX_ROWS_INTERACTIVE", "10000"))
+QUOTA_MAX_ROWS_BULK = int(os.getenv("QUOTA_MAX_ROWS_BULK", "100000"))
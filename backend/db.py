@@ -0,0 +1,208 @@
+# db.py - Postgres access: connection factory, per-worker pool, query execution and DB-backed services
+import time
+
+import psycopg2
+
+import config
+from db_pool import ConnectionPool, PoolTimeout
+from facets import FacetStore
+from health import HealthMonitor
+from indexer import IncrementalIndexer
+from metrics import COALESCED, DB_READS, stage
+from partitions import PartitionLayout
+from replicas import Replica, ReplicaRouter, is_connection_error, parse_hosts
+from singleflight import SingleFlight
+from slow_queries import SlowQueryLog
+from workload import BULK, INTERACTIVE
+
+
+def session_options(statement_timeout_ms: int, work_mem: str) -> str:
+    """libpq `options` that apply per-session limits to every connection of a workload class."""
+    options = []
+    if statement_timeout_ms > 0:
+        options.append(f"-c statement_timeout={statement_timeout_ms}")
+    if work_mem:
+        options.append(f"-c work_mem={work_mem}")
+    return " ".join(options)
+
+
+def get_db_connection(workload: str = None, host: str = None, port: int = None):
+    """
+    New connection (to the primary unless host/port name a replica). With a workload class the
+    session gets that class's statement_timeout and work_mem, and bulk work logs in as
+    DB_BULK_USER when one is configured; without one (indexer, health checks, EXPLAIN) it is
+    a plain session.
+    """
+    kwargs = dict(config.DB_CONFIG)
+    if host:
+        kwargs.update(host=host, port=port or kwargs["port"])
+    if workload == INTERACTIVE:
+        options = session_options(config.DB_STATEMENT_TIMEOUT_MS, config.DB_WORK_MEM)
+    elif workload == BULK:
+        options = session_options(config.DB_BULK_STATEMENT_TIMEOUT_MS, config.DB_BULK_WORK_MEM)
+        if config.DB_BULK_USER:
+            kwargs.update(user=config.DB_BULK_USER, password=config.DB_BULK_PASSWORD)
+    else:
+        options = ""
+    if options:
+        kwargs["options"] = options
+    return psycopg2.connect(**kwargs, connect_timeout=config.DB_CONNECT_TIMEOUT)
+
+
+def build_db_pool(workload: str = INTERACTIVE, host: str = None, port: int = None):
+    max_size = config.DB_BULK_POOL_MAX if workload == BULK else config.DB_POOL_MAX
+    min_size = 0 if workload == BULK or host else config.DB_POOL_MIN
+    return ConnectionPool(lambda: get_db_connection(workload, host, port), min_size=min_size, max_size=max_size,
+                          timeout=config.DB_POOL_TIMEOUT)
+
+
+def build_replica_router():
+    replicas = [
+        Replica(host, port, build_db_pool, lambda h, p: get_db_connection(None, h, p), (INTERACTIVE, BULK))
+        for host, port in parse_hosts(config.DB_REPLICAS, config.DB_CONFIG["port"])
+    ]
+    return ReplicaRouter(replicas, strategy=config.DB_REPLICA_STRATEGY, max_lag=config.DB_REPLICA_MAX_LAG,
+                         check_interval=config.DB_REPLICA_CHECK_INTERVAL)
+
+
+# Rebuilt per worker by reset_pool() so no sockets are shared after fork. Bulk work has its own
+# (smaller) pool, so exports and analyses can never hold every connection interactive searches need.
+db_pool = build_db_pool(INTERACTIVE)
+bulk_pool = build_db_pool(BULK)
+# Search reads go to a healthy, caught-up replica when DB_REPLICAS lists any
+replica_router = build_replica_router()
+
+indexer = IncrementalIndexer(get_db_connection, batch_size=config.INDEXER_BATCH_SIZE, interval=config.INDEXER_INTERVAL)
+facet_store = FacetStore(get_db_connection, ttl=config.FACETS_CACHE_TTL)
+indexer.add_listener(facet_store.apply_changes, prepare=facet_store.prepare)
+health_monitor = HealthMonitor(get_db_connection, ttl=config.HEALTH_CACHE_TTL)
+partition_layout = PartitionLayout(get_db_connection, ttl=config.PARTITION_LAYOUT_TTL)
+slow_query_log = SlowQueryLog(
+    get_db_connection,
+    config.CHAT_STORE_DIR / "slow_queries.jsonl",
+    threshold_ms=config.SLOW_QUERY_MS,
+)
+
+
+# Identical statements running at the same time share one execution (and one result set)
+query_flights = SingleFlight()
+
+
+def reset_pool():
+    global db_pool, bulk_pool
+    db_pool = build_db_pool(INTERACTIVE)
+    bulk_pool = build_db_pool(BULK)
+    replica_router.reset_pools()
+    return db_pool
+
+
+def pool_for(workload: str) -> ConnectionPool:
+    return bulk_pool if workload == BULK else db_pool
+
+
+def execute_query(sql_query: str, params=None, nl_query: str = None, route: str = None,
+                  workload: str = INTERACTIVE, max_rows: int = None, max_lag: float = None):
+    """
+    Execute SQL query and return results. While an identical statement (same SQL and
+    parameters) is already running, wait for it and return its result instead.
+    Runs on the workload class's pool; with max_rows at most that many rows come back
+    and "truncated" says whether there were more. Reads go to a read replica at most
+    max_lag seconds behind (default DB_REPLICA_MAX_LAG; 0 = primary only) when one is available.
+    """
+    if not config.COALESCE_REQUESTS:
+        return _execute(sql_query, params, nl_query, route, workload, max_rows, max_lag)
+    key = (sql_query, repr(params), workload, max_rows, max_lag)
+    result, shared = query_flights.do(
+        key, lambda: _execute(sql_query, params, nl_query, route, workload, max_rows, max_lag)
+    )
+    if shared:
+        COALESCED.inc("sql")
+    return result
+
+
+def _fetch(conn, statement: str, sql_query: str, params, attempt: dict):
+    cursor = conn.cursor()
+
+    # Statement as written, with any parameters bound (re-runnable through /run-sql, and what
+    # the slow query log records when it fails)
+    executed = cursor.mogrify(sql_query, params).decode("utf-8", "replace") if params else sql_query
+    attempt["sql"] = executed
+    cursor.execute(statement, params)
+    rows = cursor.fetchall()
+    columns = [desc[0] for desc in cursor.description]
+
+    cursor.close()
+    conn.rollback()  # end the read transaction before the connection goes back to the pool
+    return rows, columns, executed
+
+
+def _execute(sql_query: str, params, nl_query: str, route: str, workload: str = INTERACTIVE, max_rows: int = None,
+             max_lag: float = None):
+    started = time.perf_counter()
+    attempt = {"sql": sql_query}
+    try:
+        statement = sql_query
+        if max_rows:
+            # One extra row tells a capped result from one that happens to be exactly max_rows long
+            statement = f"SELECT * FROM ({sql_query.strip().rstrip(';')}\n) AS capped LIMIT {int(max_rows) + 1}"
+        replica = replica_router.choose(max_lag)
+        with stage("db"):
+            fetched = None
+            if replica is not None:
+                try:
+                    with replica_router.connection(replica, workload) as conn:
+                        fetched = _fetch(conn, statement, sql_query, params, attempt)
+                    DB_READS.inc("replica")
+                except Exception as exc:
+                    if not (is_connection_error(exc) or isinstance(exc, PoolTimeout)):
+                        raise
+                    # The replica went away mid-request (or is saturated): the primary answers this one
+                    DB_READS.inc("replica_failover")
+            if fetched is None:
+                with pool_for(workload).connection() as conn:
+                    fetched = _fetch(conn, statement, sql_query, params, attempt)
+                DB_READS.inc("primary")
+        rows, columns, executed = fetched
+
+        slow_query_log.record(
+            executed,
+            (time.perf_counter() - started) * 1000,
+            len(rows),
+            nl_query=nl_query,
+            route=route,
+        )
+
+        truncated = bool(max_rows) and len(rows) > max_rows
+        if truncated:
+            rows = rows[:max_rows]
+
+        return {
+            "success": True,
+            "columns": columns,
+            "rows": rows,
+            "count": len(rows),
+            "truncated": truncated,
+            "sql": executed,
+        }
+
+    except Exception as e:
+        if not isinstance(e, PoolTimeout):
+            # Timeouts and failures are often the slowest generated statements; log them too
+            slow_query_log.record(
+                attempt["sql"],
+                (time.perf_counter() - started) * 1000,
+                None,
+                nl_query=nl_query,
+                route=route,
+                error=str(e),
+            )
+        return {
+            "success": False,
+            "error": str(e),
+        }
+
+
+def rows_to_dicts(columns, rows):
+    """Result rows as {column: value} dicts, full descriptions included."""
+    with stage("format"):
+        return [dict(zip(columns, row)) for row in rows]
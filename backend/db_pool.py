@@ -0,0 +1,95 @@
+# db_pool.py - small blocking connection pool shared by request handlers in one worker
+import threading
+from contextlib import contextmanager
+
+import psycopg2
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool over a connect() callable. Unlike psycopg2.pool it blocks (up to
+    `timeout` seconds) when all connections are checked out instead of raising, so a
+    burst of requests queues for a connection rather than failing.
+
+    Connections are opened lazily; `min_size` of them are opened by warm().
+    Each worker process must build its own pool after fork (see init_worker in app.py).
+    """
+
+    def __init__(self, connect, min_size: int = 1, max_size: int = 10, timeout: float = 30.0):
+        self._connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self._idle = []
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def warm(self):
+        """Open min_size connections up front so the first requests skip the TCP/auth handshake."""
+        opened = []
+        for _ in range(self.min_size):
+            opened.append(self._connect())
+        with self._lock:
+            self._idle.extend(opened)
+
+    def _acquire(self):
+        if not self._slots.acquire(timeout=self.timeout):
+            raise PoolTimeout(f"No database connection available within {self.timeout}s")
+        with self._lock:
+            conn = self._idle.pop() if self._idle else None
+        try:
+            if conn is None or conn.closed:
+                conn = self._connect()
+        except Exception:
+            self._slots.release()
+            raise
+        return conn
+
+    def _release(self, conn, broken: bool = False):
+        try:
+            if broken or conn.closed or self._closed:
+                conn.close()
+                return
+            if conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                conn.rollback()
+            with self._lock:
+                self._idle.append(conn)
+        except Exception:
+            try:
+                conn.close()
+            except Exception:
+                pass
+        finally:
+            self._slots.release()
+
+    @contextmanager
+    def connection(self):
+        conn = self._acquire()
+        broken = False
+        try:
+            yield conn
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            broken = True
+            raise
+        finally:
+            self._release(conn, broken=broken)
+
+    def close(self):
+        self._closed = True
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+    def stats(self) -> dict:
+        with self._lock:
+            idle = len(self._idle)
+        return {"max_size": self.max_size, "idle": idle}
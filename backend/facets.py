@@ -0,0 +1,164 @@
+# facets.py - precomputed counts per canonical company, category and year
+import threading
+import time
+from collections import Counter
+
+from psycopg2.extras import execute_values
+
+FACETS = ("company", "category", "year")
+
+SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS uml_facets (
+    facet TEXT NOT NULL,
+    value TEXT NOT NULL,
+    count BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (facet, value)
+);
+"""
+
+# One-off seed from the indexer side table (never from uml_temp) when uml_facets is empty
+SEED_SQL = """
+INSERT INTO uml_facets (facet, value, count)
+SELECT 'company', company_canonical, count(*) FROM uml_index WHERE company_canonical IS NOT NULL GROUP BY 2
+UNION ALL
+SELECT 'category', category_canonical, count(*) FROM uml_index WHERE category_canonical IS NOT NULL GROUP BY 2
+UNION ALL
+SELECT 'year', doc_year::text, count(*) FROM uml_index WHERE doc_year IS NOT NULL GROUP BY 2
+ON CONFLICT (facet, value) DO NOTHING
+"""
+
+FILTER_COLUMNS = {
+    "company": "company_canonical",
+    "category": "category_canonical",
+    "year": "doc_year",
+}
+
+
+class FacetStore:
+    """
+    Keeps uml_facets in step with the indexer and serves counts from a short-lived cache.
+
+    Counts are maintained as +1/-1 deltas applied inside the indexer's batch transaction
+    (see IncrementalIndexer.add_listener), so they never require a scan of uml_temp.
+    """
+
+    def __init__(self, connect, ttl: float = 30.0):
+        self._connect = connect
+        self.ttl = ttl
+        self._cache = None
+        self._cached_at = 0.0
+        self._lock = threading.Lock()
+        self._schema_ready = False
+
+    def ensure_schema(self, cur):
+        if self._schema_ready:
+            return
+        cur.execute(SCHEMA_SQL)
+        self._schema_ready = True
+
+    def prepare(self, cur):
+        """Indexer hook, run under its advisory lock before each batch: seed counts once."""
+        self.ensure_schema(cur)
+        cur.execute("SELECT NOT EXISTS (SELECT 1 FROM uml_facets)")
+        if cur.fetchone()[0]:
+            cur.execute(SEED_SQL)
+
+    def apply_changes(self, cur, changes):
+        """Indexer listener: turn (old, new) canonical tuples into count deltas."""
+        deltas = Counter()
+        for old, new in changes:
+            if old == new:
+                continue
+            for sign, entry in ((-1, old), (1, new)):
+                if entry is None:
+                    continue
+                for facet, value in zip(FACETS, entry):
+                    if value is not None:
+                        deltas[(facet, str(value))] += sign
+        rows = [(facet, value, delta) for (facet, value), delta in deltas.items() if delta]
+        if not rows:
+            return
+        execute_values(
+            cur,
+            """
+            INSERT INTO uml_facets (facet, value, count) VALUES %s
+            ON CONFLICT (facet, value) DO UPDATE SET count = uml_facets.count + EXCLUDED.count
+            """,
+            rows,
+        )
+        cur.execute("DELETE FROM uml_facets WHERE count <= 0")
+        self._cache = None
+
+    def counts(self) -> dict:
+        """Return {facet: [{"value", "count"}, ...]} sorted by count, cached for ttl seconds."""
+        with self._lock:
+            if self._cache is not None and time.monotonic() - self._cached_at < self.ttl:
+                return self._cache
+            conn = self._connect()
+            try:
+                with conn, conn.cursor() as cur:
+                    self.ensure_schema(cur)
+                    cur.execute("SELECT facet, value, count FROM uml_facets ORDER BY facet, count DESC, value")
+                    rows = cur.fetchall()
+            finally:
+                conn.close()
+            result = {facet: [] for facet in FACETS}
+            for facet, value, count in rows:
+                if facet in result:
+                    result[facet].append({"value": value, "count": count})
+            result["year"].sort(key=lambda item: item["value"], reverse=True)
+            self._cache = result
+            self._cached_at = time.monotonic()
+            return result
+
+
+def normalize_filters(raw) -> dict:
+    """Validate a {"company": [...], "category": [...], "year": [...]} payload; drops empty facets."""
+    filters = {}
+    if not isinstance(raw, dict):
+        return filters
+    for facet in FACETS:
+        values = raw.get(facet)
+        if isinstance(values, (str, int)):
+            values = [values]
+        if not isinstance(values, list):
+            continue
+        values = [str(v).strip() for v in values if str(v).strip()]
+        if facet == "year":
+            values = [int(v) for v in values if v.isdigit()]
+        if values:
+            filters[facet] = values
+    return filters
+
+
+def filter_clause(filters: dict):
+    """Build "col = ANY(%s) AND ..." over uml_index plus its parameters."""
+    clauses, params = [], []
+    for facet, values in filters.items():
+        clauses.append(f"{FILTER_COLUMNS[facet]} = ANY(%s)")
+        params.append(values)
+    return " AND ".join(clauses), params
+
+
+def apply_filters(sql_query: str, filters: dict):
+    """
+    Restrict a (generated) SELECT over uml_temp to ids matching the facet filters.
+    Returns (sql, params); the indexed semi-join lets Postgres prune before the text scan.
+    """
+    clause, params = filter_clause(filters)
+    inner = sql_query.strip().rstrip(";")
+    # Literal % in the generated SQL (ILIKE '%x%') must be escaped once parameters are bound
+    inner = inner.replace("%", "%%")
+    sql = f"SELECT q.* FROM ({inner}) q WHERE q.id IN (SELECT id FROM uml_index WHERE {clause})"
+    return sql, params
+
+
+def filter_only_query(filters: dict):
+    """Browse by facets alone, without the LLM or a text scan."""
+    clause, params = filter_clause(filters)
+    sql = (
+        "SELECT t.*, %s AS match_reason FROM uml_temp t JOIN uml_index i ON i.id = t.id "
+        f"WHERE {clause} ORDER BY t.id DESC"
+    )
+    reason = "Filter matched: " + ", ".join(f"{k}={'/'.join(map(str, v))}" for k, v in filters.items())
+    return sql, [reason] + params
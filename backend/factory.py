@@ -0,0 +1,78 @@
+# factory.py - application factory plus per-worker start-up/shutdown shared by every entry point
+import logging
+import threading
+
+from flask import Flask
+
+import config
+import db
+import llm
+import metrics
+import storage
+from routes import bp, run_analysis_job
+
+log = logging.getLogger(__name__)
+
+
+def create_app(client=None):
+    """
+    Build the Flask app: API and SPA routes, metrics hooks and the ANALYSE job handler.
+    Services (DB pool, LLM client, caches, job queue) are per-process singletons in db, llm
+    and storage; pass client to replace the OpenAI client (benchmarks, tests).
+    """
+    if client is not None:
+        llm.client = client
+    app = Flask(__name__, static_folder=None)
+    metrics.init_app(app)  # Server-Timing header on every response, Prometheus text on /metrics
+    app.register_blueprint(bp)
+    storage.job_queue.register("analyse", run_analysis_job)
+    return app
+
+
+def init_worker(warm_up: bool = True):
+    """
+    Build per-process resources. Production workers call this after fork (gunicorn.conf.py)
+    so no sockets are shared between processes: a fresh DB pool and OpenAI client, the
+    metrics flush thread when workers share /metrics through METRICS_DIR, the
+    background indexer (an advisory lock keeps only one worker indexing), the job queue
+    workers, and a warm-up that opens pooled connections and primes the health and facet caches.
+    """
+    db.reset_pool()
+    llm.reset_client()
+    if config.METRICS_DIR:
+        metrics.init_multiprocess(config.METRICS_DIR, config.METRICS_FLUSH_INTERVAL)
+    if config.INDEXER_ENABLED:
+        db.indexer.start()
+    storage.job_queue.start()
+    if warm_up:
+        if config.WARM_UP_BACKGROUND:
+            # Accept requests immediately; the first ones simply pay for whatever is not warm yet
+            threading.Thread(target=warm_up_worker, name="warm-up", daemon=True).start()
+        else:
+            warm_up_worker()
+
+
+def warm_up_worker():
+    """Open pooled connections, probe read replicas, prime the health and facet caches and build the OpenAI client."""
+    try:
+        db.db_pool.warm()
+        db.replica_router.check()
+        db.health_monitor.check()
+        db.facet_store.counts()
+    except Exception as exc:
+        log.warning("Worker warm-up failed (will retry lazily): %s", exc)
+    try:
+        llm.client.warm()
+    except Exception as exc:
+        log.warning("OpenAI client warm-up failed: %s", exc)
+
+
+def shutdown_worker():
+    """Stop background threads and close pooled connections on graceful shutdown."""
+    db.indexer.stop()
+    storage.job_queue.stop()
+    storage.previews.shutdown()
+    metrics.shutdown_multiprocess()
+    db.db_pool.close()
+    db.bulk_pool.close()
+    db.replica_router.close()
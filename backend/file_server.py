@@ -0,0 +1,122 @@
+# file_server.py - conditional, range-aware streaming of documents under FILE_BASE_PATH
+import mimetypes
+import os
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import quote
+
+from flask import Response
+from werkzeug.exceptions import RequestedRangeNotSatisfiable
+from werkzeug.wsgi import wrap_file
+
+STREAM_CHUNK_BYTES = 64 * 1024
+
+
+class FileStat:
+    __slots__ = ("size", "mtime", "etag", "mimetype")
+
+    def __init__(self, size, mtime, etag, mimetype):
+        self.size = size
+        self.mtime = mtime
+        self.etag = etag
+        self.mimetype = mimetype
+
+
+class StatCache:
+    """
+    Small LRU of path -> FileStat (or None for missing files) with a TTL, so repeated
+    opens and range requests for the same document skip the filesystem round trip.
+    """
+
+    def __init__(self, ttl: float = 10.0, max_entries: int = 4096):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, path: str):
+        now = time.monotonic()
+        with self._lock:
+            hit = self._entries.get(path)
+            if hit is not None and now - hit[0] < self.ttl:
+                self._entries.move_to_end(path)
+                return hit[1]
+        try:
+            st = os.stat(path)
+        except OSError:
+            info = None
+        else:
+            if not os.path.isfile(path):
+                info = None
+            else:
+                info = FileStat(
+                    size=st.st_size,
+                    mtime=st.st_mtime,
+                    etag=f"{st.st_ino:x}-{st.st_size:x}-{int(st.st_mtime * 1000):x}",
+                    mimetype=mimetypes.guess_type(path)[0] or "application/octet-stream",
+                )
+        with self._lock:
+            self._entries[path] = (now, info)
+            self._entries.move_to_end(path)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return info
+
+    def invalidate(self, path: str):
+        with self._lock:
+            self._entries.pop(path, None)
+
+
+def send_document(abs_path: str, info: FileStat, request, max_age: int = 0):
+    """
+    Stream a file with ETag/Last-Modified validators and HTTP Range support.
+    Conditional requests that match are answered with 304 before the file is opened;
+    Range requests (used by browser PDF viewers) get 206 with only the requested bytes,
+    and 416 with "Content-Range: bytes */<size>" when no requested byte exists.
+    """
+    response = Response(mimetype=info.mimetype, direct_passthrough=True)
+    response.set_etag(info.etag)
+    response.last_modified = info.mtime
+    response.headers["Content-Disposition"] = _inline_disposition(os.path.basename(abs_path))
+    if max_age > 0:
+        response.cache_control.private = True
+        response.cache_control.max_age = max_age
+    else:
+        response.cache_control.no_cache = True
+
+    if _not_modified(request, info):
+        response.status_code = 304
+        return response
+
+    handle = open(abs_path, "rb")
+    try:
+        response.response = wrap_file(request.environ, handle, buffer_size=STREAM_CHUNK_BYTES)
+        response.content_length = info.size
+        return response.make_conditional(request, accept_ranges=True, complete_length=info.size)
+    except RequestedRangeNotSatisfiable:
+        handle.close()
+        unsatisfiable = Response(status=416)
+        unsatisfiable.headers["Content-Range"] = f"bytes */{info.size}"
+        unsatisfiable.headers["Accept-Ranges"] = "bytes"
+        return unsatisfiable
+    except BaseException:
+        handle.close()
+        raise
+
+
+def _not_modified(request, info: FileStat) -> bool:
+    if request.if_none_match:
+        return request.if_none_match.contains(info.etag)
+    if request.if_modified_since is not None:
+        return int(info.mtime) <= int(request.if_modified_since.timestamp())
+    return False
+
+
+def _inline_disposition(filename: str) -> str:
+    """
+    inline Content-Disposition: an ASCII filename="..." fallback (quotes, backslashes, control and
+    non-ASCII characters replaced by "_") plus the exact name as RFC 5987 filename*=UTF-8''...
+    """
+    fallback = "".join(ch if " " <= ch < "\x7f" and ch not in '"\\' else "_" for ch in filename)
+    return f"inline; filename=\"{fallback}\"; filename*=UTF-8''{quote(filename, safe='')}"
@@ -0,0 +1,58 @@
+# gunicorn.conf.py - production serving: preforked workers x threads, graceful shutdown
+# Run from the repo root: gunicorn -c backend/gunicorn.conf.py --chdir backend app:app
+import multiprocessing
+import os
+import tempfile
+from pathlib import Path
+
+bind = os.getenv("BIND", "0.0.0.0:5000")
+workers = int(os.getenv("WEB_CONCURRENCY", str(multiprocessing.cpu_count() * 2 + 1)))
+# Requests mostly wait on the LLM or Postgres, so threads per worker add cheap concurrency
+worker_class = "gthread"
+threads = int(os.getenv("WEB_THREADS", "4"))
+
+# Import app.py (prompts, config, route table) once in the master and share it copy-on-write
+preload_app = True
+
+# /analyse-chat can legitimately take tens of seconds
+timeout = int(os.getenv("WEB_TIMEOUT", "120"))
+graceful_timeout = int(os.getenv("WEB_GRACEFUL_TIMEOUT", "30"))
+keepalive = 5
+
+# Recycle workers periodically to bound memory growth from large result sets
+max_requests = int(os.getenv("WEB_MAX_REQUESTS", "2000"))
+max_requests_jitter = max_requests // 10
+
+accesslog = os.getenv("WEB_ACCESS_LOG", "-")
+
+# /metrics adds up every worker's samples (metrics.py); set before the app (and config.py) is preloaded
+if not os.getenv("METRICS_DIR"):
+    os.environ["METRICS_DIR"] = tempfile.mkdtemp(prefix="dashboard-metrics-")
+
+
+def on_starting(server):
+    # Totals start from zero with the server, like any Prometheus target restart
+    metrics_dir = Path(os.environ["METRICS_DIR"])
+    metrics_dir.mkdir(parents=True, exist_ok=True)
+    for stale in metrics_dir.glob("*.json"):
+        stale.unlink()
+
+
+def post_fork(server, worker):
+    # Sockets (DB pool, OpenAI HTTP client) must never be shared across forked processes
+    import app as dashboard
+
+    dashboard.init_worker(warm_up=os.getenv("WEB_WARM_UP", "1") == "1")
+
+
+def worker_exit(server, worker):
+    import app as dashboard
+
+    dashboard.shutdown_worker()
+
+
+def child_exit(server, worker):
+    # Runs in the master once a worker is gone (recycled, crashed or shut down): keep its counts
+    import metrics
+
+    metrics.mark_process_dead(os.environ["METRICS_DIR"], worker.pid)
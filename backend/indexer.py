@@ -0,0 +1,399 @@
+# indexer.py - background incremental indexer keeping derived structures in step with uml_temp
+import hashlib
+import logging
+import threading
+from datetime import datetime
+
+from psycopg2.extras import execute_values
+
+from normalize import canonical_category, canonical_company, normalize_date
+from partitions import partition_year
+
+log = logging.getLogger(__name__)
+
+# Arbitrary constant so only one process (across workers/hosts) indexes at a time
+ADVISORY_LOCK_KEY = int(hashlib.md5(b"uml_index").hexdigest()[:12], 16)
+
+SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS uml_index (
+    id BIGINT PRIMARY KEY,
+    content_hash TEXT NOT NULL,
+    doc_year SMALLINT,
+    doc_month SMALLINT,
+    company_canonical TEXT,
+    category_canonical TEXT,
+    search_tsv TSVECTOR,
+    indexed_at TIMESTAMP NOT NULL DEFAULT now()
+);
+CREATE INDEX IF NOT EXISTS uml_index_year_idx ON uml_index (doc_year, doc_month);
+CREATE INDEX IF NOT EXISTS uml_index_company_idx ON uml_index (company_canonical);
+CREATE INDEX IF NOT EXISTS uml_index_category_idx ON uml_index (category_canonical);
+CREATE INDEX IF NOT EXISTS uml_index_tsv_idx ON uml_index USING GIN (search_tsv);
+
+CREATE TABLE IF NOT EXISTS uml_index_state (
+    name TEXT PRIMARY KEY,
+    last_id BIGINT NOT NULL DEFAULT 0,
+    last_created_at TIMESTAMP,
+    last_created_id BIGINT NOT NULL DEFAULT 0,
+    sweep_id BIGINT NOT NULL DEFAULT 0,
+    caught_up_at TIMESTAMP,
+    updated_at TIMESTAMP NOT NULL DEFAULT now()
+);
+ALTER TABLE uml_index_state ADD COLUMN IF NOT EXISTS last_created_id BIGINT NOT NULL DEFAULT 0;
+INSERT INTO uml_index_state (name) VALUES ('uml_temp') ON CONFLICT (name) DO NOTHING;
+"""
+
+# The late-insert pass scans uml_temp by created_at. Built CONCURRENTLY (outside a transaction) so
+# writes to uml_temp are not blocked while it builds; a build that failed half-way leaves an invalid
+# index behind, which is dropped and rebuilt. Partitioned layouts get theirs from migrate_partitions.py.
+CREATED_AT_INDEX_SQL = """
+SELECT c.relkind, i.indisvalid
+  FROM pg_class c
+  LEFT JOIN pg_class ix ON ix.relname = 'uml_temp_created_at_idx' AND ix.relnamespace = c.relnamespace
+  LEFT JOIN pg_index i ON i.indexrelid = ix.oid
+ WHERE c.oid = 'uml_temp'::regclass
+"""
+
+# Hash over every source column so edits to any field are picked up by the sweep
+HASH_COLUMNS = ("account", "filename", "filepath", "name", "date", "dob", "email", "company", "category", "description")
+ROW_HASH_SQL = f"md5(concat_ws('|', {', '.join(HASH_COLUMNS)}))"
+
+FETCH_COLUMNS = f"id, date, company, category, left(description, 2000), created_at, {ROW_HASH_SQL}"
+
+# Partitioned by document year (migrate_partitions.py): rows loaded without a year, or whose date was
+# edited, are moved to their partition (partitions.partition_year) once they are indexed here
+HAS_DOC_YEAR_SQL = """
+SELECT EXISTS (SELECT 1 FROM information_schema.columns
+                WHERE table_schema = current_schema() AND table_name = 'uml_temp' AND column_name = 'doc_year')
+"""
+SYNC_DOC_YEAR_SQL = """
+UPDATE uml_temp t SET doc_year = v.doc_year
+  FROM (VALUES %s) AS v (id, doc_year)
+ WHERE t.id = v.id AND t.doc_year <> v.doc_year
+"""
+
+
+class IncrementalIndexer:
+    """
+    Processes uml_temp rows in batches into the uml_index side table.
+
+    Progress is tracked with a high-water mark on id (plus created_at for late inserts
+    with lower ids) and committed in the same transaction as each batch, so a crash
+    simply replays the last uncommitted batch. A rolling sweep walks uml_temp and uml_index
+    ids side by side one batch per tick: edited rows are found by hash, deleted ones by their
+    missing uml_temp row, and rows that both marks passed over (committed late by a long
+    transaction with an older id and created_at) by their missing uml_index row.
+
+    Listeners registered with add_listener() receive (cursor, changes) inside the batch
+    transaction, where changes is a list of (old, new) tuples of (company, category, year)
+    or None, so derived summaries can be maintained incrementally.
+    """
+
+    def __init__(self, connect, batch_size: int = 1000, interval: float = 10.0):
+        self._connect = connect
+        self.batch_size = batch_size
+        self.interval = interval
+        self._conn = None
+        self._listeners = []
+        self._prepare_hooks = []
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._schema_ready = False
+        self._created_at_index_ready = False
+        self._has_doc_year = False
+        self._status = {
+            "running": False,
+            "last_id": 0,
+            "max_id": None,
+            "pending_rows": None,
+            "lag_seconds": None,
+            "last_run_at": None,
+            "last_batch_rows": 0,
+            "error": None,
+        }
+
+    def add_listener(self, callback, prepare=None):
+        """
+        Register callback(cursor, changes), invoked after each batch. The optional
+        prepare(cursor) runs under the indexer lock before every batch (schema, seeding).
+        """
+        self._listeners.append(callback)
+        if prepare is not None:
+            self._prepare_hooks.append(prepare)
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="uml-indexer", daemon=True)
+        self._thread.start()
+        self._status["running"] = True
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+        self._status["running"] = False
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except Exception:
+                pass
+            self._conn = None
+
+    def status(self) -> dict:
+        return dict(self._status)
+
+    def _run(self):
+        while not self._stop.is_set():
+            processed = 0
+            try:
+                processed = self.run_once()
+                self._status["error"] = None
+            except Exception as exc:
+                log.warning("indexer tick failed: %s", exc)
+                self._status["error"] = str(exc)
+                self._reset_connection()
+            # Drain a backlog without sleeping; otherwise poll at the configured interval
+            self._stop.wait(0 if processed >= self.batch_size else self.interval)
+
+    def _reset_connection(self):
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except Exception:
+                pass
+        self._conn = None
+
+    def _connection(self):
+        if self._conn is None or self._conn.closed:
+            self._conn = self._connect()
+        return self._conn
+
+    def ensure_schema(self):
+        conn = self._connection()
+        with conn, conn.cursor() as cur:
+            cur.execute(SCHEMA_SQL)
+            cur.execute(HAS_DOC_YEAR_SQL)
+            self._has_doc_year = cur.fetchone()[0]
+        self._schema_ready = True
+
+    def _ensure_created_at_index(self) -> bool:
+        """Build the created_at index if it is missing; False while another worker holds the lock."""
+        conn = self._connection()
+        with conn, conn.cursor() as cur:
+            cur.execute(CREATED_AT_INDEX_SQL)
+            relkind, valid = cur.fetchone()
+        if relkind != "r" or valid:
+            return True
+        conn.autocommit = True
+        try:
+            with conn.cursor() as cur:
+                # Session lock: one worker builds it while the others carry on without it
+                cur.execute("SELECT pg_try_advisory_lock(%s)", (ADVISORY_LOCK_KEY,))
+                if not cur.fetchone()[0]:
+                    return False
+                try:
+                    if valid is False:
+                        cur.execute("DROP INDEX CONCURRENTLY IF EXISTS uml_temp_created_at_idx")
+                    log.info("Building uml_temp_created_at_idx concurrently")
+                    cur.execute("CREATE INDEX CONCURRENTLY IF NOT EXISTS uml_temp_created_at_idx ON uml_temp (created_at)")
+                finally:
+                    cur.execute("SELECT pg_advisory_unlock(%s)", (ADVISORY_LOCK_KEY,))
+        finally:
+            conn.autocommit = False
+        return True
+
+    def run_once(self) -> int:
+        """Index one batch of new rows (or sweep one batch for changes). Returns rows touched."""
+        with self._lock:
+            if not self._schema_ready:
+                self.ensure_schema()
+            if not self._created_at_index_ready:
+                self._created_at_index_ready = self._ensure_created_at_index()
+            conn = self._connection()
+            with conn, conn.cursor() as cur:
+                cur.execute("SELECT pg_try_advisory_xact_lock(%s)", (ADVISORY_LOCK_KEY,))
+                if not cur.fetchone()[0]:
+                    # Another worker holds the indexer lock; just refresh lag numbers
+                    self._refresh_status(cur)
+                    return 0
+
+                for prepare in self._prepare_hooks:
+                    prepare(cur)
+
+                cur.execute(
+                    "SELECT last_id, last_created_at, last_created_id, sweep_id FROM uml_index_state "
+                    "WHERE name = 'uml_temp' FOR UPDATE"
+                )
+                last_id, last_created_at, last_created_id, sweep_id = cur.fetchone()
+
+                new_rows, last_id, (last_created_at, last_created_id) = self._index_new(
+                    cur, last_id, (last_created_at, last_created_id)
+                )
+                processed = new_rows
+                if new_rows < self.batch_size:
+                    swept, sweep_id = self._sweep(cur, sweep_id, last_id)
+                    processed += swept
+
+                cur.execute(
+                    """
+                    UPDATE uml_index_state
+                       SET last_id = %s, last_created_at = %s, last_created_id = %s, sweep_id = %s, updated_at = now(),
+                           caught_up_at = CASE WHEN %s THEN now() ELSE caught_up_at END
+                     WHERE name = 'uml_temp'
+                    """,
+                    (last_id, last_created_at, last_created_id, sweep_id, new_rows < self.batch_size),
+                )
+                self._refresh_status(cur)
+            self._status["last_batch_rows"] = processed
+            self._status["last_run_at"] = datetime.utcnow().isoformat()
+            return processed
+
+    def _index_new(self, cur, last_id, created_mark):
+        """
+        Index the next batch; returns (rows, new id mark, new (created_at, id) mark). The created_at
+        mark is a (created_at, id) pair so rows sharing the boundary timestamp are not skipped.
+        """
+        last_created_at, last_created_id = created_mark
+        cur.execute(
+            f"SELECT {FETCH_COLUMNS} FROM uml_temp WHERE id > %s ORDER BY id LIMIT %s",
+            (last_id, self.batch_size),
+        )
+        rows = cur.fetchall()
+
+        # Rows inserted with an id below the mark (backfills, restores) still carry a newer created_at
+        remaining = self.batch_size - len(rows)
+        if last_created_at is not None and remaining > 0:
+            cur.execute(
+                f"""
+                SELECT {FETCH_COLUMNS} FROM uml_temp t
+                 WHERE (t.created_at, t.id) > (%s, %s) AND t.id <= %s
+                   AND NOT EXISTS (SELECT 1 FROM uml_index i WHERE i.id = t.id)
+                 ORDER BY t.created_at, t.id LIMIT %s
+                """,
+                (last_created_at, last_created_id, last_id, remaining),
+            )
+            rows.extend(cur.fetchall())
+
+        if not rows:
+            return 0, last_id, created_mark
+
+        self._apply(cur, rows)
+        new_last_id = max([last_id] + [r[0] for r in rows])
+        created = [(r[5], r[0]) for r in rows if r[5] is not None]
+        if created:
+            newest = max(created)
+            created_mark = newest if last_created_at is None else max(created_mark, newest)
+        return len(rows), new_last_id, created_mark
+
+    def _sweep(self, cur, sweep_id, last_id):
+        """Walk one batch of ids in uml_temp and uml_index together: index missed rows, re-hash edits, drop deletions."""
+        cur.execute(
+            f"""
+            SELECT COALESCE(t.id, i.id), t.row_hash, i.content_hash, t.id IS NULL, i.id IS NULL
+              FROM (SELECT id, {ROW_HASH_SQL} AS row_hash FROM uml_temp
+                     WHERE id > %s AND id <= %s ORDER BY id LIMIT %s) t
+              FULL JOIN (SELECT id, content_hash FROM uml_index
+                          WHERE id > %s AND id <= %s ORDER BY id LIMIT %s) i ON i.id = t.id
+             ORDER BY 1 LIMIT %s
+            """,
+            (sweep_id, last_id, self.batch_size, sweep_id, last_id, self.batch_size, self.batch_size),
+        )
+        swept = cur.fetchall()
+        if not swept:
+            # Wrap around; pick up a partition layout migrated in while the app was running
+            cur.execute(HAS_DOC_YEAR_SQL)
+            self._has_doc_year = cur.fetchone()[0]
+            return 0, 0
+
+        deleted = [r[0] for r in swept if r[3]]
+        changed = [r[0] for r in swept if not r[3] and (r[4] or r[1] != r[2])]
+
+        touched = 0
+        if changed:
+            cur.execute(f"SELECT {FETCH_COLUMNS} FROM uml_temp WHERE id = ANY(%s)", (changed,))
+            touched += self._apply(cur, cur.fetchall())
+        if deleted:
+            touched += self._remove(cur, deleted)
+        return touched, swept[-1][0]
+
+    def _previous(self, cur, ids):
+        cur.execute(
+            "SELECT id, company_canonical, category_canonical, doc_year FROM uml_index WHERE id = ANY(%s)",
+            (ids,),
+        )
+        return {r[0]: (r[1], r[2], r[3]) for r in cur.fetchall()}
+
+    def _apply(self, cur, rows) -> int:
+        ids = [r[0] for r in rows]
+        previous = self._previous(cur, ids)
+        values = []
+        changes = []
+        partition_years = []
+        for row_id, date, company, category, description_head, _created_at, content_hash in rows:
+            year, month = normalize_date(date)
+            if year is None:
+                year, month = normalize_date(description_head)
+            company_c = canonical_company(company)
+            category_c = canonical_category(category)
+            values.append((row_id, content_hash, year, month, company_c, category_c))
+            partition_years.append((row_id, partition_year(date, description_head)))
+            changes.append((previous.get(row_id), (company_c, category_c, year)))
+
+        execute_values(
+            cur,
+            """
+            INSERT INTO uml_index (id, content_hash, doc_year, doc_month, company_canonical, category_canonical)
+            VALUES %s
+            ON CONFLICT (id) DO UPDATE SET
+                content_hash = EXCLUDED.content_hash,
+                doc_year = EXCLUDED.doc_year,
+                doc_month = EXCLUDED.doc_month,
+                company_canonical = EXCLUDED.company_canonical,
+                category_canonical = EXCLUDED.category_canonical,
+                indexed_at = now()
+            """,
+            values,
+        )
+        cur.execute(
+            """
+            UPDATE uml_index i
+               SET search_tsv = to_tsvector('simple', concat_ws(' ', t.filename, t.name, t.company, t.category, t.description))
+              FROM uml_temp t
+             WHERE t.id = i.id AND i.id = ANY(%s)
+            """,
+            (ids,),
+        )
+        if self._has_doc_year:
+            execute_values(cur, SYNC_DOC_YEAR_SQL, partition_years, page_size=len(partition_years))
+        self._notify(cur, changes)
+        return len(rows)
+
+    def _remove(self, cur, ids) -> int:
+        previous = self._previous(cur, ids)
+        cur.execute("DELETE FROM uml_index WHERE id = ANY(%s)", (ids,))
+        self._notify(cur, [(old, None) for old in previous.values()])
+        return len(ids)
+
+    def _notify(self, cur, changes):
+        for callback in self._listeners:
+            callback(cur, changes)
+
+    def _refresh_status(self, cur):
+        cur.execute(
+            """
+            SELECT s.last_id, (SELECT max(id) FROM uml_temp), EXTRACT(EPOCH FROM now() - s.caught_up_at)
+              FROM uml_index_state s WHERE s.name = 'uml_temp'
+            """
+        )
+        last_id, max_id, since_caught_up = cur.fetchone()
+        # max(id) - last_id is an upper bound (id gaps) but needs no scan
+        pending = max(0, (max_id or 0) - last_id)
+        self._status.update(
+            last_id=last_id,
+            max_id=max_id,
+            pending_rows=pending,
+            lag_seconds=0.0 if pending == 0 else (round(float(since_caught_up), 1) if since_caught_up is not None else None),
+        )
@@ -0,0 +1,262 @@
+# jobs.py - SQLite-backed background job queue for long-running requests (ANALYSE)
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+log = logging.getLogger(__name__)
+
+
+class JobQueue:
+    """
+    Durable job queue in a local SQLite file, drained by a small pool of worker threads.
+    Jobs survive browser timeouts and reloads (clients poll by id), identical submissions
+    share one job via a dedup key, and jobs claimed by a process that died are re-queued
+    once their heartbeat goes stale. Several server processes can share the same file:
+    claiming a job is a single IMMEDIATE transaction.
+    """
+
+    def __init__(self, path, workers: int = 2, dedup_ttl: float = 3600.0, stale_after: float = 600.0,
+                 max_attempts: int = 3, retention: float = 7 * 86400.0, poll_interval: float = 1.0):
+        self.path = path
+        self.workers = workers
+        self.dedup_ttl = dedup_ttl
+        self.stale_after = stale_after
+        self.max_attempts = max_attempts
+        self.retention = retention
+        self.poll_interval = poll_interval
+        self._handlers = {}
+        self._threads = []
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._schema_ready = False
+
+    def register(self, kind: str, handler):
+        """handler(payload, progress) -> result dict; progress(fraction, message) reports status."""
+        self._handlers[kind] = handler
+
+    def _connect(self):
+        conn = sqlite3.connect(str(self.path), timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def ensure_schema(self):
+        if self._schema_ready:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = self._connect()
+        try:
+            conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    dedup_key TEXT,
+                    status TEXT NOT NULL,
+                    progress REAL NOT NULL DEFAULT 0,
+                    message TEXT,
+                    payload TEXT NOT NULL,
+                    meta TEXT,
+                    result TEXT,
+                    error TEXT,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS jobs_status_idx ON jobs (status, created_at);
+                CREATE INDEX IF NOT EXISTS jobs_dedup_idx ON jobs (dedup_key, created_at);
+                """
+            )
+            conn.execute("DELETE FROM jobs WHERE status NOT IN ('queued', 'running') AND updated_at < ?",
+                         (time.time() - self.retention,))
+        finally:
+            conn.close()
+        self._schema_ready = True
+
+    def start(self):
+        with self._lock:
+            if any(t.is_alive() for t in self._threads):
+                return
+            self.ensure_schema()
+            self._stop.clear()
+            self._threads = [
+                threading.Thread(target=self._run, name=f"job-worker-{i}", daemon=True) for i in range(self.workers)
+            ]
+            for thread in self._threads:
+                thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        self._wake.set()
+        for thread in self._threads:
+            thread.join(timeout=timeout)
+        self._threads = []
+
+    def submit(self, kind: str, payload: dict, dedup_key: str = None, meta: dict = None):
+        """
+        Return (job, created). A queued, running or recently finished job with the same key is
+        reused. meta is small client-facing data (e.g. the conversation id) returned with the job.
+        """
+        self.ensure_schema()
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            if dedup_key:
+                row = conn.execute(
+                    """
+                    SELECT * FROM jobs
+                    WHERE dedup_key = ? AND kind = ?
+                      AND (status IN ('queued', 'running') OR (status = 'done' AND updated_at >= ?))
+                    ORDER BY created_at DESC LIMIT 1
+                    """,
+                    (dedup_key, kind, now - self.dedup_ttl),
+                ).fetchone()
+                if row is not None:
+                    conn.execute("COMMIT")
+                    return self._to_dict(row), False
+            job_id = f"job_{datetime.utcnow().strftime('%Y%m%d%H%M%S')}_{os.urandom(6).hex()}"
+            conn.execute(
+                "INSERT INTO jobs (id, kind, dedup_key, status, message, payload, meta, created_at, updated_at) "
+                "VALUES (?, ?, ?, 'queued', 'Queued', ?, ?, ?, ?)",
+                (job_id, kind, dedup_key, json.dumps(payload, ensure_ascii=False, default=str),
+                 json.dumps(meta or {}), now, now),
+            )
+            conn.execute("COMMIT")
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        finally:
+            conn.close()
+        self.start()
+        self._wake.set()
+        return self._to_dict(row), True
+
+    def get(self, job_id: str):
+        self.ensure_schema()
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        finally:
+            conn.close()
+        return self._to_dict(row) if row is not None else None
+
+    def stats(self) -> dict:
+        self.ensure_schema()
+        conn = self._connect()
+        try:
+            rows = conn.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status").fetchall()
+        finally:
+            conn.close()
+        return {row["status"]: row["n"] for row in rows}
+
+    @staticmethod
+    def _to_dict(row) -> dict:
+        job = {
+            "id": row["id"],
+            "kind": row["kind"],
+            "status": row["status"],
+            "progress": row["progress"],
+            "message": row["message"],
+            "meta": json.loads(row["meta"]) if row["meta"] else {},
+            "created_at": datetime.utcfromtimestamp(row["created_at"]).isoformat(),
+            "updated_at": datetime.utcfromtimestamp(row["updated_at"]).isoformat(),
+        }
+        if row["result"] is not None:
+            job["result"] = json.loads(row["result"])
+        if row["error"] is not None:
+            job["error"] = row["error"]
+        return job
+
+    # --- worker side ----------------------------------------------------------------------
+
+    def _claim(self):
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            # Jobs whose worker stopped heart-beating (process killed, deploy) go back to the queue,
+            # unless they have already taken down max_attempts workers
+            conn.execute(
+                "UPDATE jobs SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'queued' END, "
+                "message = CASE WHEN attempts >= ? THEN 'Failed' ELSE 'Re-queued' END, "
+                "error = CASE WHEN attempts >= ? THEN 'Worker stopped while running this job' ELSE error END "
+                "WHERE status = 'running' AND updated_at < ?",
+                (self.max_attempts, self.max_attempts, self.max_attempts, now - self.stale_after),
+            )
+            row = conn.execute(
+                "SELECT id, kind, payload FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1"
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = 'running', message = 'Started', attempts = attempts + 1, updated_at = ? "
+                "WHERE id = ?",
+                (now, row["id"]),
+            )
+            conn.execute("COMMIT")
+            return row["id"], row["kind"], json.loads(row["payload"])
+        finally:
+            conn.close()
+
+    def _update(self, job_id: str, **fields):
+        fields["updated_at"] = time.time()
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        conn = self._connect()
+        try:
+            conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+        finally:
+            conn.close()
+
+    def _heartbeat(self, job_id: str, done: threading.Event):
+        while not done.wait(self.stale_after / 4):
+            try:
+                self._update(job_id)
+            except Exception as exc:
+                log.warning("job %s heartbeat failed: %s", job_id, exc)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                claimed = self._claim()
+            except Exception as exc:
+                log.warning("job claim failed: %s", exc)
+                claimed = None
+            if claimed is None:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+                continue
+
+            job_id, kind, payload = claimed
+            handler = self._handlers.get(kind)
+            if handler is None:
+                self._update(job_id, status="failed", error=f"No handler for job kind '{kind}'")
+                continue
+
+            def progress(fraction: float, message: str = None, _job_id=job_id):
+                self._update(_job_id, progress=max(0.0, min(1.0, float(fraction))), message=message)
+
+            # Heartbeat so a single long LLM call is not mistaken for a dead worker
+            done = threading.Event()
+            beat = threading.Thread(target=self._heartbeat, args=(job_id, done), daemon=True)
+            beat.start()
+            try:
+                result = handler(payload, progress)
+            except Exception as exc:
+                log.exception("job %s failed", job_id)
+                self._update(job_id, status="failed", message="Failed", error=str(exc))
+                continue
+            finally:
+                done.set()
+            self._update(
+                job_id,
+                status="done",
+                progress=1.0,
+                message="Done",
+                result=json.dumps(result, ensure_ascii=False, default=str),
+            )
@@ -0,0 +1,161 @@
+# llm.py - LLM access: lazily built OpenAI client, NL->SQL generation and the per-document map services
+import logging
+import os
+import threading
+
+import config
+from analysis import ExtractionCache, MapReduceAnalyzer
+from metrics import LLM_RESILIENCE, record_tokens, stage
+from prompts import SYSTEM_PROMPT
+from resilience import CircuitBreaker, ResilientClient
+from rule_sql import rule_based_sql
+from sql_cache import SqlIntentCache, extract_intent
+from summaries import DocumentSummarizer
+from workload import BULK, INTERACTIVE, TenantQuotas
+
+log = logging.getLogger(__name__)
+
+
+def openai_api_key():
+    """OPENAI_API_KEY, or the legacy OPENAI_API name."""
+    return os.getenv("OPENAI_API_KEY") or os.getenv("OPENAI_API")
+
+
+class LazyOpenAI:
+    """
+    Stand-in for OpenAI() that imports the SDK and creates the real client on first attribute
+    access (client.chat.completions.create(...)). A missing key therefore fails the first LLM
+    call with a clear error instead of preventing the app from importing.
+    """
+
+    def __init__(self, api_key=None, timeout: float = None):
+        self._api_key = api_key
+        self._timeout = timeout
+        self._client = None
+        self._lock = threading.Lock()
+
+    def _get(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    key = self._api_key or openai_api_key()
+                    if not key:
+                        raise RuntimeError("Missing OPENAI_API_KEY (or OPENAI_API) environment variable.")
+                    from openai import OpenAI
+
+                    # Retries happen in ResilientClient (with the circuit breaker), not in the SDK
+                    self._client = OpenAI(api_key=key, timeout=self._timeout, max_retries=0)
+        return self._client
+
+    @property
+    def ready(self) -> bool:
+        return self._client is not None
+
+    def warm(self):
+        """Import the SDK and build the client now (used by the background warm-up)."""
+        self._get()
+
+    def __getattr__(self, name):
+        return getattr(self._get(), name)
+
+
+# OpenAI client (OPENAI_API_KEY or OPENAI_API); the SDK is imported and the client built on first use.
+# Callers read llm.client at call time, so tests and benchmarks can swap in a fake.
+client = LazyOpenAI(timeout=config.LLM_TIMEOUT)
+
+
+def reset_client():
+    global client
+    client = LazyOpenAI(timeout=config.LLM_TIMEOUT)
+    return client
+
+
+# Per-tenant budgets: LLM tokens (checked and charged by resilient_client) and returned rows (charged per search)
+quotas = TenantQuotas(
+    tokens_per_window=config.QUOTA_LLM_TOKENS,
+    rows_per_window=config.QUOTA_ROWS,
+    window=config.QUOTA_WINDOW,
+    max_rows={INTERACTIVE: config.QUOTA_MAX_ROWS_INTERACTIVE, BULK: config.QUOTA_MAX_ROWS_BULK},
+)
+
+# Every LLM call goes through this wrapper: quotas, coalescing, retries with backoff, circuit breaker
+breaker = CircuitBreaker(failure_threshold=config.LLM_BREAKER_FAILURES, reset_timeout=config.LLM_BREAKER_RESET)
+resilient_client = ResilientClient(
+    lambda: client,
+    breaker,
+    retries=config.LLM_RETRIES,
+    backoff_base=config.LLM_BACKOFF_BASE,
+    backoff_max=config.LLM_BACKOFF_MAX,
+    quota=quotas,
+)
+
+
+sql_cache = SqlIntentCache(
+    ttl=config.SQL_CACHE_TTL,
+    max_entries=config.SQL_CACHE_MAX_ENTRIES,
+    enabled=config.SQL_CACHE_ENABLED,
+)
+map_reduce = MapReduceAnalyzer(
+    lambda: resilient_client,
+    ExtractionCache(config.CHAT_STORE_DIR / "extractions.sqlite3"),
+    concurrency=config.ANALYSE_MAP_CONCURRENCY,
+    chunk_chars=config.ANALYSE_CHUNK_CHARS,
+)
+doc_summarizer = DocumentSummarizer(
+    lambda: resilient_client,
+    ExtractionCache(config.CHAT_STORE_DIR / "extractions.sqlite3", table="summaries"),
+    concurrency=config.ANALYSE_MAP_CONCURRENCY,
+    min_opens=config.SUMMARY_PREFETCH_MIN_OPENS,
+)
+
+
+def generate_sql(user_query: str):
+    """
+    (sql, source) for a search. source is "cache" or "llm" normally; when the model cannot be
+    reached (circuit open, retries exhausted) or the tenant is out of LLM tokens, the search
+    degrades to "stale_cache" (an expired entry for the same intent) or "rules" (rule_sql.py)
+    instead of failing.
+    """
+    # Paraphrases of an earlier search (same entities, dates and terms) reuse its SQL
+    cached_sql, intent = sql_cache.lookup(user_query)
+    if cached_sql is not None:
+        return cached_sql, "cache"
+
+    try:
+        with stage("sql_gen"):
+            response = resilient_client.chat.completions.create(
+                model="gpt-4o-mini",
+                messages=[
+                    {"role": "system", "content": SYSTEM_PROMPT},
+                    {"role": "user", "content": user_query},
+                ],
+                temperature=0.1,
+                max_tokens=800,
+            )
+        record_tokens("sql_gen", getattr(response, "usage", None))
+
+        sql_query = response.choices[0].message.content.strip()
+        sql_query = sql_query.replace("```sql", "").replace("```", "").strip()
+        sql_cache.store(user_query, intent, sql_query)
+
+        return sql_query, "llm"
+
+    except Exception as e:
+        log.warning("SQL generation failed, trying fallbacks: %s", e)
+        intent = intent or extract_intent(user_query)
+        stale_sql = sql_cache.stale(intent)
+        if stale_sql is not None:
+            LLM_RESILIENCE.inc("fallback_cache")
+            return stale_sql, "stale_cache"
+        rules_sql = rule_based_sql(intent)
+        if rules_sql is not None:
+            LLM_RESILIENCE.inc("fallback_rules")
+            return rules_sql, "rules"
+        return f"Error: {str(e)}", "error"
+
+
+def generate_sql_query(user_query: str) -> str:
+    """
+    Generate SQL query from natural language using OpenAI
+    """
+    return generate_sql(user_query)[0]
@@ -0,0 +1,350 @@
+# match_reasons.py - compute match_reason in Python for the returned rows instead of re-scanning in Postgres
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+
+# SELECT [DISTINCT] *, CONCAT_WS('<sep>', ...) [AS] match_reason FROM ...
+HEAD_RE = re.compile(r"^\s*SELECT\s+(DISTINCT\s+)?\*\s*,\s*CONCAT_WS\s*\(", re.IGNORECASE)
+# Facet-filtered searches wrap the generated query: SELECT q.* FROM (<generated>) q WHERE ...
+WRAPPED_RE = re.compile(r"^\s*SELECT\s+q\.\*\s+FROM\s*\(", re.IGNORECASE)
+ALIAS_RE = re.compile(r"\s*(?:AS\s+)?match_reason\b", re.IGNORECASE)
+TOKEN_RE = re.compile(
+    r"\s*(?:(?P<str>'(?:[^']|'')*')|(?P<op>!~\*|~\*|!~|~|<>|!=|=)|(?P<punct>[(),.])|(?P<word>[A-Za-z_][A-Za-z0-9_]*))"
+)
+FUNCTIONS = {"lower": str.lower, "upper": str.upper, "trim": str.strip}
+# POSIX character classes and Postgres word-boundary escapes that Python's re spells differently
+POSIX_CLASSES = {
+    "[:alpha:]": "a-zA-Z", "[:digit:]": "0-9", "[:alnum:]": "a-zA-Z0-9", "[:upper:]": "A-Z",
+    "[:lower:]": "a-z", "[:space:]": r"\s", "[:punct:]": r"!-/:-@\[-`{-~",
+}
+ARE_ESCAPES = {r"\y": r"\b", r"\m": r"\b(?=\w)", r"\M": r"\b(?<=\w)"}
+
+
+class Unsupported(ValueError):
+    """The SQL uses a construct this module does not evaluate; Postgres computes match_reason instead."""
+
+
+def _unquote(literal: str) -> str:
+    return literal[1:-1].replace("''", "'")
+
+
+def like_to_regex(pattern: str, flags: int):
+    out, i = [], 0
+    while i < len(pattern):
+        ch = pattern[i]
+        if ch == "\\" and i + 1 < len(pattern):
+            out.append(re.escape(pattern[i + 1]))
+            i += 2
+            continue
+        out.append(".*" if ch == "%" else "." if ch == "_" else re.escape(ch))
+        i += 1
+    return re.compile("".join(out), flags | re.DOTALL)
+
+
+def posix_to_regex(pattern: str, flags: int):
+    for posix, python in POSIX_CLASSES.items():
+        pattern = pattern.replace(posix, python)
+    for are, python in ARE_ESCAPES.items():
+        pattern = pattern.replace(are, python)
+    if "[:" in pattern:
+        raise Unsupported(f"character class in {pattern!r}")
+    try:
+        # Postgres ARE: '.' matches newlines, ^/$ anchor the whole string
+        return re.compile(pattern, flags | re.DOTALL)
+    except re.error as exc:
+        raise Unsupported(str(exc))
+
+
+class _Parser:
+    """Recursive descent over one CASE WHEN condition: AND/OR/NOT, parentheses and column predicates."""
+
+    def __init__(self, text: str):
+        self.tokens, pos = [], 0
+        text = text.rstrip()
+        while pos < len(text):
+            m = TOKEN_RE.match(text, pos)
+            if not m or m.end() == pos:
+                raise Unsupported(f"cannot parse near {text[pos:pos + 20]!r}")
+            kind = m.lastgroup
+            value = m.group(kind)
+            self.tokens.append((kind, value.lower() if kind == "word" else value))
+            pos = m.end()
+        self.i = 0
+
+    def peek(self, offset=0):
+        j = self.i + offset
+        return self.tokens[j] if j < len(self.tokens) else (None, None)
+
+    def take(self, kind=None, value=None):
+        tok = self.peek()
+        if (kind and tok[0] != kind) or (value and tok[1] != value):
+            raise Unsupported(f"expected {value or kind}, got {tok[1]!r}")
+        self.i += 1
+        return tok[1]
+
+    def parse(self):
+        node = self.expr()
+        if self.i != len(self.tokens):
+            raise Unsupported(f"trailing tokens from {self.peek()[1]!r}")
+        return node
+
+    def expr(self):
+        nodes = [self.conjunction()]
+        while self.peek() == ("word", "or"):
+            self.take()
+            nodes.append(self.conjunction())
+        return nodes[0] if len(nodes) == 1 else ("or", nodes)
+
+    def conjunction(self):
+        nodes = [self.unary()]
+        while self.peek() == ("word", "and"):
+            self.take()
+            nodes.append(self.unary())
+        return nodes[0] if len(nodes) == 1 else ("and", nodes)
+
+    def unary(self):
+        if self.peek() == ("word", "not"):
+            self.take()
+            return ("not", self.unary())
+        if self.peek() == ("punct", "("):
+            self.take()
+            node = self.expr()
+            self.take("punct", ")")
+            return node
+        return self.predicate()
+
+    def operand(self):
+        name = self.take("word")
+        if name in FUNCTIONS and self.peek() == ("punct", "("):
+            self.take()
+            inner = self.operand()
+            self.take("punct", ")")
+            return ("call", FUNCTIONS[name], inner)
+        if name == "coalesce" and self.peek() == ("punct", "("):
+            self.take()
+            inner = self.operand()
+            self.take("punct", ",")
+            default = _unquote(self.take("str"))
+            self.take("punct", ")")
+            return ("coalesce", inner, default)
+        if self.peek() == ("punct", "."):  # table-qualified column
+            self.take()
+            name = self.take("word")
+        return ("column", name)
+
+    def pattern(self):
+        kind, value = self.peek()
+        if kind == "str":
+            self.take()
+            return _unquote(value)
+        name = self.take("word")
+        if name not in FUNCTIONS:
+            raise Unsupported(f"pattern function {name!r}")
+        self.take("punct", "(")
+        inner = self.pattern()
+        self.take("punct", ")")
+        return FUNCTIONS[name](inner)
+
+    def predicate(self):
+        column = self.operand()
+        negate = False
+        if self.peek() == ("word", "not"):
+            self.take()
+            negate = True
+        kind, op = self.peek()
+        if kind == "word" and op in ("like", "ilike"):
+            self.take()
+            regex = like_to_regex(self.pattern(), re.IGNORECASE if op == "ilike" else 0)
+            node = ("match", column, regex.fullmatch)
+        elif kind == "op" and op in ("~", "~*", "!~", "!~*") and not negate:
+            self.take()
+            regex = posix_to_regex(self.pattern(), re.IGNORECASE if op.endswith("*") else 0)
+            node = ("match", column, regex.search)
+            negate = op.startswith("!")
+        elif kind == "op" and op in ("=", "<>", "!=") and not negate:
+            self.take()
+            expected = self.pattern()
+            node = ("match", column, lambda value, expected=expected: value == expected)
+            negate = op != "="
+        else:
+            raise Unsupported(f"operator {op!r}")
+        return ("not", node) if negate else node
+
+
+def _value(operand, row):
+    kind = operand[0]
+    if kind == "column":
+        value = row.get(operand[1])
+        return None if value is None else str(value)
+    if kind == "call":
+        value = _value(operand[2], row)
+        return None if value is None else operand[1](value)
+    value = _value(operand[1], row)  # coalesce
+    return operand[2] if value is None else value
+
+
+def evaluate(node, row):
+    """SQL three-valued logic: True, False or None (NULL, which CASE WHEN treats as false)."""
+    kind = node[0]
+    if kind == "match":
+        value = _value(node[1], row)
+        return None if value is None else bool(node[2](value))
+    if kind == "not":
+        value = evaluate(node[1], row)
+        return None if value is None else not value
+    values = [evaluate(child, row) for child in node[1]]
+    if kind == "and":
+        return False if False in values else None if None in values else True
+    return True if True in values else None if None in values else False
+
+
+def _split_args(text: str):
+    """Split a call's argument text on top-level commas (outside quotes and parentheses)."""
+    args, depth, start, i = [], 0, 0, 0
+    while i < len(text):
+        ch = text[i]
+        if ch == "'":
+            i = text.index("'", i + 1)
+            while text.startswith("''", i):
+                i = text.index("'", i + 2)
+        elif ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+        elif ch == "," and depth == 0:
+            args.append(text[start:i].strip())
+            start = i + 1
+        i += 1
+    args.append(text[start:].strip())
+    return args
+
+
+def _closing_paren(text: str, start: int) -> int:
+    depth, i = 1, start
+    while i < len(text):
+        ch = text[i]
+        if ch == "'":
+            i = text.index("'", i + 1)
+            while text.startswith("''", i):
+                i = text.index("'", i + 2)
+        elif ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+            if depth == 0:
+                return i
+        i += 1
+    raise Unsupported("unbalanced parentheses")
+
+
+CASE_RE = re.compile(r"^CASE\s+WHEN\s+(?P<cond>.+?)\s+THEN\s+(?P<label>'(?:[^']|'')*')\s+END$", re.IGNORECASE | re.DOTALL)
+
+
+class ReasonPlan:
+    """
+    A generated query split into the filtering SQL sent to Postgres and the match_reason
+    predicates evaluated here. sql is the statement to execute; annotate() fills
+    row["match_reason"] exactly as CONCAT_WS would have.
+    """
+
+    def __init__(self, sql: str, separator: str = " | ", predicates=(), digest: str = None, original: str = None):
+        self.sql = sql
+        self.separator = separator
+        self.predicates = list(predicates)
+        self.digest = digest
+        self.original = original or sql
+
+    @property
+    def active(self) -> bool:
+        return self.digest is not None
+
+    def reasons(self, row: dict) -> str:
+        return self.separator.join(label for node, label in self.predicates if evaluate(node, row))
+
+    def restore(self, executed: str) -> str:
+        """Executed statement with the match_reason expression put back (for display and /run-sql)."""
+        if not self.active:
+            return executed
+        inner = self.sql.strip().rstrip(";")
+        original = self.original.strip().rstrip(";")
+        return executed.replace(inner, original, 1) if inner in executed else original
+
+
+@lru_cache(maxsize=2048)
+def plan(sql: str) -> ReasonPlan:
+    """Split sql when its match_reason is a plain CONCAT_WS of CASE WHEN predicates; else run it unchanged."""
+    wrapped = WRAPPED_RE.match(sql or "")
+    if wrapped:
+        try:
+            close = _closing_paren(sql, wrapped.end())
+        except ValueError:
+            return ReasonPlan(sql)
+        inner = plan(sql[wrapped.end():close])
+        if not inner.active or "match_reason" in sql[close:].lower():
+            return ReasonPlan(sql)
+        stripped = sql[:wrapped.end()] + inner.sql + sql[close:]
+        return ReasonPlan(stripped, inner.separator, inner.predicates, inner.digest, original=sql)
+
+    head = HEAD_RE.match(sql or "")
+    if not head:
+        return ReasonPlan(sql)
+    try:
+        close = _closing_paren(sql, head.end())
+        alias = ALIAS_RE.match(sql, close + 1)
+        if not alias:
+            raise Unsupported("match_reason alias")
+        tail = sql[alias.end():]
+        if not re.match(r"\s+FROM\b", tail, re.IGNORECASE) or "match_reason" in tail.lower():
+            raise Unsupported("match_reason used outside the select list")
+        args = _split_args(sql[head.end():close])
+        if not args or not re.fullmatch(r"'(?:[^']|'')*'", args[0]):
+            raise Unsupported("separator")
+        predicates = []
+        for arg in args[1:]:
+            m = CASE_RE.match(arg)
+            if not m:
+                raise Unsupported(f"argument {arg[:40]!r}")
+            predicates.append((_Parser(m.group("cond")).parse(), _unquote(m.group("label"))))
+    except (Unsupported, ValueError):
+        return ReasonPlan(sql)
+
+    stripped = "SELECT " + (head.group(1) or "") + "*" + tail
+    digest = hashlib.sha1(sql[head.end():close].encode("utf-8")).hexdigest()
+    return ReasonPlan(stripped, _unquote(args[0]), predicates, digest, original=sql)
+
+
+class ReasonCache:
+    """LRU of computed match_reason strings keyed by (predicate set digest, row id)."""
+
+    def __init__(self, max_entries: int = 100000, ttl: float = 600.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def annotate(self, reason_plan: ReasonPlan, rows):
+        """Set row["match_reason"] on every row (dicts from SELECT *), reusing cached values by id."""
+        if not reason_plan.active:
+            return
+        now = time.monotonic()
+        missing = []
+        with self._lock:
+            for row in rows:
+                row_id = row.get("id")
+                entry = self._entries.get((reason_plan.digest, row_id)) if row_id is not None else None
+                if entry is not None and now - entry[1] < self.ttl:
+                    self._entries.move_to_end((reason_plan.digest, row_id))
+                    row["match_reason"] = entry[0]
+                else:
+                    missing.append(row)
+        computed = [(row, reason_plan.reasons(row)) for row in missing]
+        with self._lock:
+            for row, reason in computed:
+                row["match_reason"] = reason
+                if row.get("id") is not None:
+                    self._entries[(reason_plan.digest, row["id"])] = (reason, now)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
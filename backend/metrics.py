@@ -0,0 +1,312 @@
+# metrics.py - per-stage request timing, Prometheus exposition and Server-Timing headers
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from pathlib import Path
+
+from flask import Response, g, has_request_context, request
+
+log = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+ROW_BUCKETS = (0, 1, 10, 100, 1000, 10000, 100000, 1000000)
+
+
+def _format_labels(names, values):
+    if not names:
+        return ""
+    pairs = []
+    for name, value in zip(names, values):
+        escaped = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append(f'{name}="{escaped}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount: float = 1.0):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0.0) + amount
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return dict(self._values)
+
+    @staticmethod
+    def merge(total: dict, values: dict):
+        for key, value in values.items():
+            total[key] = total.get(key, 0.0) + value
+
+    def render(self, values=None):
+        """Exposition lines for values (label values -> total; this process's own by default)."""
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for key, value in sorted((self.snapshot() if values is None else values).items()):
+            lines.append(f"{self.name}{_format_labels(self.labels, key)} {value:g}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}  # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, *label_values, value: float):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * len(self.buckets) + [0.0, 0]
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {key: list(series) for key, series in self._series.items()}
+
+    @staticmethod
+    def merge(total: dict, values: dict):
+        for key, series in values.items():
+            current = total.get(key)
+            total[key] = list(series) if current is None else [a + b for a, b in zip(current, series)]
+
+    def render(self, values=None):
+        """Exposition lines for values (label values -> series; this process's own by default)."""
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, series in sorted((self.snapshot() if values is None else values).items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                labels = _format_labels(self.labels + ("le",), key + (f"{bound:g}",))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labels + ("le",), key + ("+Inf",))
+            lines.append(f"{self.name}_bucket{labels} {series[-1]}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {series[-2]:g}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {series[-1]}")
+        return lines
+
+
+REQUEST_SECONDS = Histogram(
+    "dashboard_request_duration_seconds", "End-to-end request latency.", labels=("route", "method", "status")
+)
+STAGE_SECONDS = Histogram(
+    "dashboard_stage_duration_seconds",
+    "Time spent per stage (sql_gen, db, format, serialize, conv_load, conv_save, llm).",
+    labels=("route", "stage"),
+)
+LLM_TOKENS = Counter("dashboard_llm_tokens_total", "OpenAI tokens consumed.", labels=("call", "kind"))
+ROWS_RETURNED = Histogram("dashboard_rows_returned", "Rows returned per request.", labels=("route",), buckets=ROW_BUCKETS)
+
+SQL_CACHE = Counter(
+    "dashboard_sql_cache_total", "NL->SQL intent cache lookups (hit, miss, bypass, rejected).", labels=("outcome",)
+)
+
+LLM_RESILIENCE = Counter(
+    "dashboard_llm_resilience_total",
+    "OpenAI resilience events (retry, coalesced, short_circuit, circuit_opened, failure, fallback_cache, fallback_rules).",
+    labels=("event",),
+)
+
+COALESCED = Counter(
+    "dashboard_coalesced_total", "Requests served by joining an identical in-flight execution.", labels=("layer",)
+)
+
+QUOTA_REJECTED = Counter(
+    "dashboard_quota_rejected_total",
+    "Requests refused by tenant quotas (llm_tokens, rows) or the fair scheduler (queue_timeout).",
+    labels=("reason",),
+)
+WORKLOAD_WAIT = Histogram(
+    "dashboard_workload_wait_seconds", "Time spent queued for a scheduler slot.", labels=("workload",)
+)
+
+DB_READS = Counter(
+    "dashboard_db_reads_total", "Query executions by target (primary, replica, replica_failover).", labels=("target",)
+)
+
+REGISTRY = [
+    REQUEST_SECONDS, STAGE_SECONDS, LLM_TOKENS, ROWS_RETURNED, SQL_CACHE, LLM_RESILIENCE, COALESCED,
+    QUOTA_REJECTED, WORKLOAD_WAIT, DB_READS,
+]
+
+
+def _route():
+    if has_request_context():
+        return request.endpoint or "unknown"
+    return "background"
+
+
+@contextmanager
+def stage(name: str):
+    """
+    Time a block; records a histogram sample and, on the request's own thread, a Server-Timing
+    entry. Worker threads running in a copy of the request context (batch searches, map-reduce)
+    only record the histogram: their request may already have sent its headers.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.observe(_route(), name, value=elapsed)
+        if has_request_context() and g.get("timing_thread") == threading.get_ident():
+            g.server_timing.append((name, elapsed))
+
+
+def record_tokens(call: str, usage):
+    """Count prompt/completion tokens from an OpenAI response.usage object."""
+    if usage is None:
+        return
+    LLM_TOKENS.inc(call, "prompt", amount=getattr(usage, "prompt_tokens", 0) or 0)
+    LLM_TOKENS.inc(call, "completion", amount=getattr(usage, "completion_tokens", 0) or 0)
+
+
+def record_rows(count: int):
+    ROWS_RETURNED.observe(_route(), value=count)
+
+
+# Preforked workers (gunicorn.conf.py) each write their samples to <dir>/<pid>.json; /metrics adds
+# up every file, and the master folds exited workers into archive.json so totals never go back
+_multiprocess = {"dir": None, "stop": threading.Event(), "thread": None}
+
+
+def _dump() -> dict:
+    return {metric.name: [[list(key), value] for key, value in metric.snapshot().items()] for metric in REGISTRY}
+
+
+def _load(path: Path, totals: dict):
+    try:
+        data = json.loads(path.read_text())
+    except (OSError, ValueError):
+        return  # a worker that exited between listing and reading, or a torn file
+    for metric in REGISTRY:
+        metric.merge(totals[metric.name], {tuple(key): value for key, value in data.get(metric.name, ())})
+
+
+def _write(path: Path, data: dict):
+    tmp = path.with_name(f".{path.name}.tmp")
+    tmp.write_text(json.dumps(data))
+    os.replace(tmp, path)
+
+
+@contextmanager
+def _dir_lock(directory: Path, exclusive: bool):
+    import fcntl  # multi-process mode only runs under gunicorn (POSIX); waitress serves one process
+
+    with open(directory / ".lock", "a") as handle:
+        fcntl.flock(handle, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+def flush():
+    """Write this process's samples to the shared directory (no-op outside multi-process mode)."""
+    directory = _multiprocess["dir"]
+    if directory is not None:
+        _write(directory / f"{os.getpid()}.json", _dump())
+
+
+def _flush_loop(interval: float):
+    while not _multiprocess["stop"].wait(interval):
+        try:
+            flush()
+        except OSError as exc:
+            log.warning("Could not write metrics: %s", exc)
+
+
+def init_multiprocess(directory, interval: float = 1.0):
+    """Share /metrics across preforked workers through directory; call in each worker after fork."""
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    _multiprocess["dir"] = directory
+    _multiprocess["stop"].clear()
+    _multiprocess["thread"] = threading.Thread(target=_flush_loop, args=(interval,), name="metrics-flush", daemon=True)
+    _multiprocess["thread"].start()
+
+
+def shutdown_multiprocess():
+    """Stop the flush thread and write the final samples (the master then archives them)."""
+    if _multiprocess["dir"] is None:
+        return
+    _multiprocess["stop"].set()
+    if _multiprocess["thread"] is not None:
+        _multiprocess["thread"].join(5)
+    flush()
+
+
+def mark_process_dead(directory, pid: int):
+    """Fold an exited worker's samples into archive.json (run by the gunicorn master)."""
+    directory = Path(directory)
+    path = directory / f"{pid}.json"
+    if not path.exists():
+        return
+    with _dir_lock(directory, exclusive=True):
+        totals = {metric.name: {} for metric in REGISTRY}
+        _load(directory / "archive.json", totals)
+        _load(path, totals)
+        _write(directory / "archive.json",
+               {name: [[list(key), value] for key, value in values.items()] for name, values in totals.items()})
+        path.unlink()
+
+
+def render() -> str:
+    directory = _multiprocess["dir"]
+    totals = None
+    if directory is not None:
+        # Other workers' last flush plus this process's live samples
+        totals = {metric.name: {} for metric in REGISTRY}
+        own = f"{os.getpid()}.json"
+        with _dir_lock(directory, exclusive=False):
+            for path in directory.glob("*.json"):
+                if path.name != own:
+                    _load(path, totals)
+        for metric in REGISTRY:
+            metric.merge(totals[metric.name], metric.snapshot())
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render(None if totals is None else totals[metric.name]))
+    return "\n".join(lines) + "\n"
+
+
+def init_app(app):
+    """Install request timing hooks, the Server-Timing header and the /metrics endpoint."""
+
+    @app.before_request
+    def _start_timer():
+        g.request_started = time.perf_counter()
+        g.timing_thread = threading.get_ident()
+        g.server_timing = []
+
+    @app.after_request
+    def _finish_timer(response):
+        started = g.pop("request_started", None)
+        if started is None:
+            return response
+        total = time.perf_counter() - started
+        REQUEST_SECONDS.observe(request.endpoint or "unknown", request.method, str(response.status_code), value=total)
+        g.pop("timing_thread", None)
+        entries = [f"{name};dur={elapsed * 1000:.1f}" for name, elapsed in g.pop("server_timing", [])]
+        entries.append(f"total;dur={total * 1000:.1f}")
+        response.headers["Server-Timing"] = ", ".join(entries)
+        return response
+
+    @app.route("/metrics")
+    def metrics():
+        return Response(render(), mimetype="text/plain; version=0.0.4")
@@ -0,0 +1,436 @@
+# migrate_partitions.py - rebuild uml_temp as a partitioned (hot/cold) table, optionally with descriptions split out
+"""
+Usage (from the repository root, with the app's .env / DB_* settings):
+
+    python backend/migrate_partitions.py --by year --hot-years 3 [--split-description] [--cold-tablespace slow]
+    python backend/migrate_partitions.py --by created_at --hot-years 2
+    python backend/migrate_partitions.py --status
+
+--by year partitions on doc_year (partitions.partition_year): the one year a row's date names,
+or, for a date without a year, the indexer's normalization of it (falling back to the head of
+description). Dates naming several years, and rows with no year at all, go to the undated
+partition (0). Searches whose date predicate names years then only scan those years'
+partitions plus the undated one (see partitions.year_predicate). --by created_at partitions on
+the load timestamp, keyed (id, created_at); rows without one are stamped with the migration
+time. Postgres prunes it natively for queries that filter created_at.
+
+The most recent --hot-years years get one partition each; everything older shares one cold
+partition (optionally in --cold-tablespace), and a default partition catches later years.
+With --split-description, description moves to uml_description (partitioned by doc_year in
+either mode, lz4-compressed where the server supports it) and uml_temp becomes a view over
+uml_temp_data LEFT JOIN uml_description: queries that never read description skip the join,
+and INSTEAD OF triggers keep INSERT/UPDATE/DELETE/COPY into uml_temp working.
+
+Rows are copied in id batches while the app keeps running. A trigger then logs the ids
+written to uml_temp, and the whole copy is verified against uml_temp (by the indexer's row
+hash) with writers still running, re-copying rows added, edited or deleted during the bulk
+copy. The final step blocks writers, re-copies only the ids logged since and swaps the new
+table in. The old table is kept as uml_temp_unpartitioned (drop it once satisfied,
+or run --rollback to swap it back).
+Requires PostgreSQL 12+ (lz4 needs 14+).
+"""
+import argparse
+import sys
+import time
+from datetime import datetime
+
+from psycopg2 import sql as pgsql
+from psycopg2.extras import execute_values
+
+from db import get_db_connection
+from indexer import HASH_COLUMNS
+from partitions import LAYOUT_SQL, UNDATED_YEAR, partition_year
+
+NEW_TABLE = "uml_temp_part"
+NEW_DESCRIPTIONS = "uml_description_part"
+OLD_TABLE = "uml_temp_unpartitioned"
+CHANGE_LOG = "uml_temp_migrate_changes"
+
+# Ids written to uml_temp while the copy is verified, so the locked catch-up only re-copies those
+CHANGE_LOG_SQL = f"""
+CREATE TABLE {CHANGE_LOG} (id BIGINT NOT NULL);
+CREATE FUNCTION uml_temp_migrate_log() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    INSERT INTO {CHANGE_LOG} (id) VALUES (CASE WHEN TG_OP = 'DELETE' THEN OLD.id ELSE NEW.id END);
+    IF TG_OP = 'UPDATE' AND NEW.id IS DISTINCT FROM OLD.id THEN
+        INSERT INTO {CHANGE_LOG} (id) VALUES (OLD.id);
+    END IF;
+    RETURN NULL;
+END
+$$;
+CREATE TRIGGER uml_temp_migrate_log AFTER INSERT OR UPDATE OR DELETE ON uml_temp
+    FOR EACH ROW EXECUTE FUNCTION uml_temp_migrate_log();
+"""
+DROP_CHANGE_LOG_SQL = f"""
+DROP TRIGGER IF EXISTS uml_temp_migrate_log ON uml_temp;
+DROP FUNCTION IF EXISTS uml_temp_migrate_log();
+DROP TABLE IF EXISTS {CHANGE_LOG};
+"""
+
+
+def source_columns(cur):
+    cur.execute(
+        """
+        SELECT column_name FROM information_schema.columns
+         WHERE table_schema = current_schema() AND table_name = 'uml_temp'
+         ORDER BY ordinal_position
+        """
+    )
+    return [row[0] for row in cur.fetchall()]
+
+
+def partition_bounds(by: str, hot_years: int, first_year: int = None):
+    """[(suffix, lower, upper)] for hot partitions plus the cold range below them (values are SQL literals)."""
+    this_year = datetime.utcnow().year
+    hot = list(range(this_year - hot_years + 1, this_year + 2))  # next year too, so January loads land hot
+    if by == "year":
+        bounds = [("undated", str(UNDATED_YEAR), str(UNDATED_YEAR + 1)), ("cold", str(UNDATED_YEAR + 1), str(hot[0]))]
+        bounds += [(f"y{year}", str(year), str(year + 1)) for year in hot]
+    else:
+        bounds = [("cold", "MINVALUE", f"'{hot[0]}-01-01'")]
+        bounds += [(f"y{year}", f"'{year}-01-01'", f"'{year + 1}-01-01'") for year in hot]
+    if first_year and first_year >= hot[0]:
+        bounds = [b for b in bounds if b[0] != "cold"]
+    return bounds
+
+
+def create_partitions(cur, table: str, bounds, cold_tablespace: str):
+    for suffix, lower, upper in bounds:
+        statement = pgsql.SQL("CREATE TABLE {part} PARTITION OF {table} FOR VALUES FROM ({lower}) TO ({upper})").format(
+            part=pgsql.Identifier(f"{table}_{suffix}"), table=pgsql.Identifier(table),
+            lower=pgsql.SQL(lower), upper=pgsql.SQL(upper))
+        if suffix == "cold" and cold_tablespace:
+            statement += pgsql.SQL(" TABLESPACE {space}").format(space=pgsql.Identifier(cold_tablespace))
+        cur.execute(statement)
+    # Later years land here until a partition is added for them
+    cur.execute(pgsql.SQL("CREATE TABLE {part} PARTITION OF {table} DEFAULT").format(
+        part=pgsql.Identifier(f"{table}_default"), table=pgsql.Identifier(table)))
+
+
+def create_tables(cur, columns, by: str, hot_years: int, split: bool, cold_tablespace: str, first_year: int):
+    """Create the partitioned copy of uml_temp (and the description side table); returns its data columns."""
+    key = "doc_year" if by == "year" else "created_at"
+    new = pgsql.Identifier(NEW_TABLE)
+    cur.execute(
+        pgsql.SQL(
+            "CREATE TABLE {new} (LIKE uml_temp INCLUDING DEFAULTS, doc_year SMALLINT NOT NULL DEFAULT {undated}) "
+            "PARTITION BY RANGE ({key})"
+        ).format(new=new, undated=pgsql.Literal(UNDATED_YEAR), key=pgsql.Identifier(key))
+    )
+    if split:
+        cur.execute(pgsql.SQL("ALTER TABLE {new} DROP COLUMN description").format(new=new))
+    if by == "created_at":
+        # Primary key columns cannot be NULL: copy_rows stamps rows loaded without a timestamp
+        cur.execute(pgsql.SQL("ALTER TABLE {new} ALTER COLUMN created_at SET DEFAULT now()").format(new=new))
+    # The partition key must be part of any unique constraint on a partitioned table
+    cur.execute(pgsql.SQL("ALTER TABLE {new} ADD PRIMARY KEY (id, {key})").format(new=new, key=pgsql.Identifier(key)))
+    cur.execute(pgsql.SQL("CREATE INDEX {name} ON {new} (created_at)").format(
+        name=pgsql.Identifier(f"{NEW_TABLE}_created_at_idx"), new=new))
+    create_partitions(cur, NEW_TABLE, partition_bounds(by, hot_years, first_year), cold_tablespace)
+
+    if split:
+        # Always by doc_year: the view joins on (id, doc_year), so a year predicate prunes both sides
+        descriptions = pgsql.Identifier(NEW_DESCRIPTIONS)
+        cur.execute(pgsql.SQL(
+            "CREATE TABLE {desc} (id BIGINT NOT NULL, doc_year SMALLINT NOT NULL DEFAULT {undated}, "
+            "description TEXT, PRIMARY KEY (id, doc_year)) PARTITION BY RANGE (doc_year)"
+        ).format(desc=descriptions, undated=pgsql.Literal(UNDATED_YEAR)))
+        try:
+            cur.execute("SAVEPOINT lz4")
+            cur.execute(pgsql.SQL("ALTER TABLE {desc} ALTER COLUMN description SET COMPRESSION lz4").format(
+                desc=descriptions))
+            cur.execute("RELEASE SAVEPOINT lz4")
+        except Exception as exc:
+            cur.execute("ROLLBACK TO SAVEPOINT lz4")
+            print(f"  lz4 compression unavailable ({str(exc).strip()}); descriptions use the default pglz")
+        create_partitions(cur, NEW_DESCRIPTIONS, partition_bounds("year", hot_years), cold_tablespace)
+    return [c for c in columns if not (split and c == "description")]
+
+
+def document_years(rows):
+    """[(id, doc_year)] for (id, date, description head) rows, as the indexer keeps them (partition_year)."""
+    return [(row_id, partition_year(date, description_head)) for row_id, date, description_head in rows]
+
+
+def copy_rows(cur, ids, data_columns, split: bool):
+    """Copy the given uml_temp ids (with their partition year) into the new tables."""
+    cur.execute("SELECT id, date, left(description, 2000) FROM uml_temp WHERE id = ANY(%s)", (ids,))
+    years = document_years(cur.fetchall())
+    if not years:
+        return 0
+    cur.execute("CREATE TEMP TABLE IF NOT EXISTS migrate_years (id BIGINT PRIMARY KEY, doc_year SMALLINT) ON COMMIT DROP")
+    cur.execute("TRUNCATE migrate_years")
+    execute_values(cur, "INSERT INTO migrate_years (id, doc_year) VALUES %s", years)
+    cur.execute(
+        pgsql.SQL("INSERT INTO {new} ({cols}, doc_year) SELECT {src}, y.doc_year FROM uml_temp t "
+                  "JOIN migrate_years y ON y.id = t.id").format(
+            new=pgsql.Identifier(NEW_TABLE),
+            cols=pgsql.SQL(", ").join(map(pgsql.Identifier, data_columns)),
+            src=pgsql.SQL(", ").join(pgsql.SQL("COALESCE(t.created_at, now())") if c == "created_at"
+                                     else pgsql.SQL("t.") + pgsql.Identifier(c) for c in data_columns))
+    )
+    if split:
+        cur.execute(
+            pgsql.SQL("INSERT INTO {desc} (id, doc_year, description) SELECT t.id, y.doc_year, t.description "
+                      "FROM uml_temp t JOIN migrate_years y ON y.id = t.id").format(
+                desc=pgsql.Identifier(NEW_DESCRIPTIONS))
+        )
+    return len(years)
+
+
+def delete_rows(cur, ids, split: bool):
+    for table in (NEW_TABLE, NEW_DESCRIPTIONS) if split else (NEW_TABLE,):
+        cur.execute(pgsql.SQL("DELETE FROM {table} WHERE id = ANY(%s)").format(table=pgsql.Identifier(table)), (ids,))
+
+
+def row_hash(alias: str, description: str) -> pgsql.Composable:
+    """The indexer's ROW_HASH_SQL with columns qualified by alias (description from its own expression)."""
+    parts = [pgsql.SQL(description) if c == "description" else pgsql.SQL(f"{alias}.") + pgsql.Identifier(c)
+             for c in HASH_COLUMNS]
+    return pgsql.SQL("md5(concat_ws('|', {parts}))").format(parts=pgsql.SQL(", ").join(parts))
+
+
+def changed_ids(cur, split: bool):
+    """Ids added, edited or deleted in uml_temp since they were copied (compares every row)."""
+    copied = pgsql.SQL("SELECT n.id, {h} AS row_hash FROM {new} n").format(
+        h=row_hash("n", "d.description" if split else "n.description"), new=pgsql.Identifier(NEW_TABLE))
+    if split:
+        copied += pgsql.SQL(" LEFT JOIN {desc} d ON d.id = n.id AND d.doc_year = n.doc_year").format(
+            desc=pgsql.Identifier(NEW_DESCRIPTIONS))
+    cur.execute(pgsql.SQL(
+        "SELECT COALESCE(o.id, n.id) FROM uml_temp o FULL JOIN ({copied}) n ON n.id = o.id "
+        "WHERE o.id IS NULL OR n.id IS NULL OR n.row_hash <> {h}"
+    ).format(copied=copied, h=row_hash("o", "o.description")))
+    return [row[0] for row in cur.fetchall()]
+
+
+VIEW_TRIGGER_SQL = """
+CREATE OR REPLACE FUNCTION uml_temp_write() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        DELETE FROM uml_description WHERE id = OLD.id AND doc_year = OLD.doc_year;
+        DELETE FROM uml_temp_data WHERE id = OLD.id AND doc_year = OLD.doc_year;
+        RETURN OLD;
+    END IF;
+    IF TG_OP = 'INSERT' THEN
+        NEW.id := COALESCE(NEW.id, nextval(pg_get_serial_sequence('uml_temp_data', 'id')));
+        NEW.created_at := COALESCE(NEW.created_at, now());
+        NEW.doc_year := COALESCE(NEW.doc_year, {undated});
+        INSERT INTO uml_temp_data ({cols}, doc_year) VALUES ({new_cols}, NEW.doc_year);
+        INSERT INTO uml_description (id, doc_year, description) VALUES (NEW.id, NEW.doc_year, NEW.description);
+        RETURN NEW;
+    END IF;
+    UPDATE uml_temp_data SET ({cols}, doc_year) = ({new_cols}, NEW.doc_year)
+     WHERE id = OLD.id AND doc_year = OLD.doc_year;
+    IF NEW.description IS DISTINCT FROM OLD.description OR NEW.doc_year IS DISTINCT FROM OLD.doc_year THEN
+        -- Changing doc_year moves the row to another partition of both tables
+        UPDATE uml_description SET (id, doc_year, description) = (NEW.id, NEW.doc_year, NEW.description)
+         WHERE id = OLD.id AND doc_year = OLD.doc_year;
+    END IF;
+    RETURN NEW;
+END
+$$;
+"""
+
+
+def recopy(cur, ids, data_columns, split: bool):
+    """Replace the copies of the given ids with uml_temp's current rows (dropping deleted ones)."""
+    if ids:
+        delete_rows(cur, ids, split)
+        copy_rows(cur, ids, data_columns, split)
+
+
+def swap(cur, columns, data_columns, split: bool):
+    """Rename the old table away and put the new one (or the view over it) in place as uml_temp."""
+    cur.execute(pgsql.SQL("ALTER TABLE uml_temp RENAME TO {old}").format(old=pgsql.Identifier(OLD_TABLE)))
+    # Index names are schema-wide: free the ones the app and indexer create on uml_temp
+    cur.execute(pgsql.SQL("ALTER INDEX IF EXISTS uml_temp_created_at_idx RENAME TO {name}").format(
+        name=pgsql.Identifier(f"{OLD_TABLE}_created_at_idx")))
+    cur.execute(pgsql.SQL("ALTER INDEX {name} RENAME TO uml_temp_created_at_idx").format(
+        name=pgsql.Identifier(f"{NEW_TABLE}_created_at_idx")))
+    # Keep the id sequence (new rows continue after the copied ids) but tie it to the new table
+    cur.execute("SELECT pg_get_serial_sequence(%s, 'id')", (OLD_TABLE,))
+    sequence = cur.fetchone()[0]
+    target = "uml_temp_data" if split else "uml_temp"
+    cur.execute(pgsql.SQL("ALTER TABLE {new} RENAME TO {target}").format(
+        new=pgsql.Identifier(NEW_TABLE), target=pgsql.Identifier(target)))
+    if sequence:
+        cur.execute(pgsql.SQL("ALTER SEQUENCE {seq} OWNED BY {target}.id").format(
+            seq=pgsql.SQL(sequence), target=pgsql.Identifier(target)))
+    if not split:
+        return
+    cur.execute(pgsql.SQL("ALTER TABLE {desc} RENAME TO uml_description").format(
+        desc=pgsql.Identifier(NEW_DESCRIPTIONS)))
+    select_list = pgsql.SQL(", ").join(
+        pgsql.SQL("s.description") if c == "description" else pgsql.SQL("d.") + pgsql.Identifier(c) for c in columns
+    )
+    # Joining on (id, doc_year) lets a doc_year predicate prune both sides; the LEFT JOIN against a
+    # unique key is removed by the planner whenever a query does not read description
+    cur.execute(pgsql.SQL(
+        "CREATE VIEW uml_temp AS SELECT {select_list}, d.doc_year FROM uml_temp_data d "
+        "LEFT JOIN uml_description s ON s.id = d.id AND s.doc_year = d.doc_year"
+    ).format(select_list=select_list))
+    cols = ", ".join(data_columns)
+    new_cols = ", ".join(f"NEW.{c}" for c in data_columns)
+    cur.execute(VIEW_TRIGGER_SQL.replace("{cols}", cols).replace("{new_cols}", new_cols)
+                .replace("{undated}", str(UNDATED_YEAR)))
+    cur.execute("CREATE TRIGGER uml_temp_write INSTEAD OF INSERT OR UPDATE OR DELETE ON uml_temp "
+                "FOR EACH ROW EXECUTE FUNCTION uml_temp_write()")
+
+
+def migrate(conn, by: str, hot_years: int, split: bool, cold_tablespace: str, batch_size: int, dry_run: bool):
+    with conn, conn.cursor() as cur:
+        cur.execute("SELECT to_regclass('uml_temp_data') IS NOT NULL OR EXISTS (" + LAYOUT_SQL + ")")
+        if cur.fetchone()[0]:
+            raise SystemExit("uml_temp is already partitioned; run --rollback first to rebuild it differently.")
+        cur.execute("SELECT to_regclass(%s) IS NOT NULL", (OLD_TABLE,))
+        if cur.fetchone()[0]:
+            raise SystemExit(f"{OLD_TABLE} exists from an earlier migration; drop it first.")
+        columns = source_columns(cur)
+        if "id" not in columns or "created_at" not in columns:
+            raise SystemExit("uml_temp needs id and created_at columns.")
+        cur.execute("SELECT COALESCE(max(id), 0), count(*), min(created_at) FROM uml_temp")
+        max_id, total, first_created = cur.fetchone()
+
+    first_year = first_created.year if by == "created_at" and first_created else None
+    print(f"Partitioning {total:,} rows of uml_temp by {by} ({hot_years} hot years"
+          f"{', descriptions split out' if split else ''})")
+    for suffix, lower, upper in partition_bounds(by, hot_years, first_year):
+        print(f"  partition {suffix}: [{lower}, {upper})")
+    if dry_run:
+        return
+
+    with conn, conn.cursor() as cur:
+        cur.execute(DROP_CHANGE_LOG_SQL)
+        cur.execute(pgsql.SQL("DROP TABLE IF EXISTS {desc}, {new}").format(
+            desc=pgsql.Identifier(NEW_DESCRIPTIONS), new=pgsql.Identifier(NEW_TABLE)))
+        data_columns = create_tables(cur, columns, by, hot_years, split, cold_tablespace, first_year)
+    try:
+        copy_and_swap(conn, columns, data_columns, split, max_id, total, batch_size)
+    except BaseException:
+        conn.rollback()
+        with conn, conn.cursor() as cur:
+            cur.execute(DROP_CHANGE_LOG_SQL)
+        raise
+    with conn, conn.cursor() as cur:
+        for table in ("uml_temp_data", "uml_description") if split else ("uml_temp",):
+            cur.execute(pgsql.SQL("ANALYZE {table}").format(table=pgsql.Identifier(table)))
+    print(f"Done. The previous table is kept as {OLD_TABLE}.")
+
+
+def copy_and_swap(conn, columns, data_columns, split: bool, max_id: int, total: int, batch_size: int):
+    """Copy uml_temp into the new tables, verify the copy, catch up under a write lock and swap."""
+    # Bulk copy in id order, one transaction per batch, while the app keeps reading and writing uml_temp
+    started, copied, last_id = time.perf_counter(), 0, 0
+    while last_id < max_id:
+        with conn, conn.cursor() as cur:
+            cur.execute("SELECT id FROM uml_temp WHERE id > %s AND id <= %s ORDER BY id LIMIT %s",
+                        (last_id, max_id, batch_size))
+            ids = [row[0] for row in cur.fetchall()]
+            if not ids:
+                break
+            copied += copy_rows(cur, ids, data_columns, split)
+            last_id = ids[-1]
+        rate = copied / max(time.perf_counter() - started, 1e-6)
+        print(f"  copied {copied:,}/{total:,} rows ({rate:,.0f} rows/s)", flush=True)
+
+    # Log writes from here on, then verify the whole copy while writers carry on
+    with conn, conn.cursor() as cur:
+        cur.execute(CHANGE_LOG_SQL)
+    with conn, conn.cursor() as cur:
+        stale = changed_ids(cur, split)
+        recopy(cur, stale, data_columns, split)
+    print(f"  verified the copy; re-copied {len(stale):,} rows added, edited or deleted during it", flush=True)
+
+    # Final catch-up and swap: writers wait (readers carry on) while only the logged ids are re-copied
+    with conn, conn.cursor() as cur:
+        cur.execute("LOCK TABLE uml_temp IN EXCLUSIVE MODE")
+        cur.execute(pgsql.SQL("SELECT DISTINCT id FROM {log}").format(log=pgsql.Identifier(CHANGE_LOG)))
+        stale = [row[0] for row in cur.fetchall()]
+        recopy(cur, stale, data_columns, split)
+        cur.execute(DROP_CHANGE_LOG_SQL)
+        print(f"  caught up {len(stale):,} rows written since")
+        swap(cur, columns, data_columns, split)
+    print(f"  copied and swapped in {time.perf_counter() - started:.1f}s")
+
+
+def rollback(conn):
+    """Put uml_temp_unpartitioned back as uml_temp, with the current rows (including any written since)."""
+    with conn, conn.cursor() as cur:
+        cur.execute("SELECT to_regclass(%s) IS NOT NULL", (OLD_TABLE,))
+        if not cur.fetchone()[0]:
+            raise SystemExit(f"No {OLD_TABLE} to roll back to.")
+        columns = [c for c in source_columns(cur) if c != "doc_year"]
+        cur.execute("LOCK TABLE uml_temp IN EXCLUSIVE MODE")
+        cols = pgsql.SQL(", ").join(map(pgsql.Identifier, columns))
+        # Rows written since the migration live only in the partitioned table: take its contents wholesale
+        cur.execute(pgsql.SQL("TRUNCATE {old}").format(old=pgsql.Identifier(OLD_TABLE)))
+        cur.execute(pgsql.SQL("INSERT INTO {old} ({cols}) SELECT {cols} FROM uml_temp").format(
+            old=pgsql.Identifier(OLD_TABLE), cols=cols))
+        cur.execute("SELECT to_regclass('uml_temp_data') IS NOT NULL")
+        split = cur.fetchone()[0]
+        cur.execute("SELECT pg_get_serial_sequence(%s, 'id')", ("uml_temp_data" if split else "uml_temp",))
+        sequence = cur.fetchone()[0]
+        if split:
+            cur.execute("DROP VIEW uml_temp")
+            cur.execute("DROP FUNCTION IF EXISTS uml_temp_write()")
+        if sequence:
+            cur.execute(pgsql.SQL("ALTER SEQUENCE {seq} OWNED BY {old}.id").format(
+                seq=pgsql.SQL(sequence), old=pgsql.Identifier(OLD_TABLE)))
+        cur.execute("DROP TABLE IF EXISTS uml_description, uml_temp_data" if split else "DROP TABLE uml_temp")
+        cur.execute(pgsql.SQL("ALTER TABLE {old} RENAME TO uml_temp").format(old=pgsql.Identifier(OLD_TABLE)))
+        cur.execute(pgsql.SQL("ALTER INDEX IF EXISTS {name} RENAME TO uml_temp_created_at_idx").format(
+            name=pgsql.Identifier(f"{OLD_TABLE}_created_at_idx")))
+    print("uml_temp is a plain table again.")
+
+
+def status(conn):
+    with conn, conn.cursor() as cur:
+        cur.execute(LAYOUT_SQL)
+        row = cur.fetchone()
+        if not row:
+            print("uml_temp is not partitioned.")
+            return
+        print(f"uml_temp is partitioned by {row[0]}{' with descriptions in uml_description' if row[1] else ''}")
+        cur.execute(
+            """
+            SELECT c.relname, pg_get_expr(c.relpartbound, c.oid), c.reltuples::bigint,
+                   pg_size_pretty(pg_total_relation_size(c.oid))
+              FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+             WHERE i.inhparent IN (SELECT oid FROM pg_class WHERE relname IN ('uml_temp', 'uml_temp_data', 'uml_description'))
+             ORDER BY c.relname
+            """
+        )
+        for name, bound, rows, size in cur.fetchall():
+            print(f"  {name:<32} {bound:<48} ~{max(rows, 0):>10,} rows {size:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Partition uml_temp into hot/cold partitions (see module docstring).")
+    parser.add_argument("--by", choices=("year", "created_at"), default="year",
+                        help="Partition key: normalized document year or load timestamp")
+    parser.add_argument("--hot-years", type=int, default=3, help="Recent years that get a partition each")
+    parser.add_argument("--split-description", action="store_true",
+                        help="Move description to a compressed side table joined only when read")
+    parser.add_argument("--cold-tablespace", help="Tablespace for the cold partition(s)")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--dry-run", action="store_true", help="Print the partition plan only")
+    parser.add_argument("--rollback", action="store_true", help="Restore the unpartitioned table")
+    parser.add_argument("--status", action="store_true", help="Show the current layout and partition sizes")
+    args = parser.parse_args()
+
+    conn = get_db_connection()
+    try:
+        if args.status:
+            status(conn)
+        elif args.rollback:
+            rollback(conn)
+        else:
+            migrate(conn, args.by, max(1, args.hot_years), args.split_description, args.cold_tablespace,
+                    args.batch_size, args.dry_run)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,119 @@
+# normalize.py - canonical forms for the messy uml_temp fields (dates, companies, categories)
+import re
+from typing import Optional, Tuple
+
+# Alias tables mirror the DATA QUALITY section of SYSTEM_PROMPT. Keys are the canonical
+# labels shown in the dashboard; values are lowercase substrings seen in the data.
+COMPANY_ALIASES = {
+    "UML": [
+        "uml", "us medical labs", "us medical laboratory", "usmedlab", "u.s. medical labs",
+        "us medlab", "us med labs", "usmed", "umedlab", "u medical labs", "us-medical",
+        "us medical lab", "medcial lab", "us meical",
+    ],
+    "SEM": ["sem", "seem elahi", "seema md", "seema elahi", "dr seema"],
+    "MMM": ["mmm", "mmm diagnostics center", "mmm diagnostic", "mmm diagnostics"],
+    "BCBS": ["bcbs", "blue cross blue shield", "bluecross", "blue cross"],
+    "Aetna": ["aetna", "aetna better health", "aetna better"],
+    "UHC": ["uhc", "united health care", "unitedhealthcare", "united healthcare"],
+}
+
+CATEGORY_ALIASES = {
+    "Human Resources": ["human resources", "human resource", "hr"],
+    "Billing and Revenue Management": ["billing and revenue", "billing & revenue", "billing", "revenue"],
+    "Financial Management": ["financial management", "financial mgmt", "finance", "financial"],
+    "Operations & Administration": [
+        "operations & administration", "operations and administration", "ops & admin", "operations",
+        "administration",
+    ],
+    "Legal & Compliance": ["legal & compliance", "legal and compliance", "compliance", "legal"],
+    "Supply & Vendor Management": ["supply & vendor", "supply and vendor", "vendor management", "vendor", "supply"],
+    "Patient Care & Records": ["patient care & records", "patient care", "patient records", "patient"],
+    "Transportation Services": ["transportation services", "transportation", "transport", "logistics"],
+}
+
+MONTHS = {
+    "january": 1, "jan": 1, "february": 2, "feb": 2, "march": 3, "mar": 3,
+    "april": 4, "apr": 4, "may": 5, "june": 6, "jun": 6, "july": 7, "jul": 7,
+    "august": 8, "aug": 8, "september": 9, "sept": 9, "sep": 9, "october": 10, "oct": 10,
+    "november": 11, "nov": 11, "december": 12, "dec": 12,
+}
+
+_MONTH_ALT = "|".join(sorted(MONTHS, key=len, reverse=True))
+_ISO_RE = re.compile(r"\b((?:19|20)\d{2})-(\d{1,2})-(\d{1,2})\b")
+_NUMERIC_RE = re.compile(r"\b(\d{1,2})[/-](?:(\d{1,2})[/-])?((?:19|20)\d{2})\b")
+_NAMED_RE = re.compile(rf"\b({_MONTH_ALT})\.?[^0-9a-z]*(?:(\d{{1,2}})(?:st|nd|rd|th)?[^0-9]*)?((?:19|20)\d{{2}})\b", re.I)
+_YEAR_RE = re.compile(r"\b((?:19|20)\d{2})\b")
+
+
+def _match_alias(value: Optional[str], table: dict) -> Optional[str]:
+    """Return the canonical key whose alias occurs in value (longest alias wins)."""
+    if not value:
+        return None
+    text = " ".join(value.lower().split())
+    best, best_len = None, 0
+    for canonical, aliases in table.items():
+        for alias in aliases:
+            if len(alias) <= best_len:
+                continue
+            # Short acronyms must match as whole words ("hr" must not match "three")
+            if len(alias) <= 4:
+                if re.search(rf"(?<![a-z]){re.escape(alias)}(?![a-z])", text):
+                    best, best_len = canonical, len(alias)
+            elif alias in text:
+                best, best_len = canonical, len(alias)
+    return best
+
+
+def alias_spans(text: str, table: dict):
+    """
+    Every non-overlapping alias occurrence in already-lowercased text as (start, end, canonical),
+    preferring longer aliases, with the same whole-word rule for short acronyms as _match_alias.
+    """
+    candidates = []
+    for canonical, aliases in table.items():
+        for alias in aliases:
+            pattern = rf"(?<![a-z]){re.escape(alias)}(?![a-z])" if len(alias) <= 4 else re.escape(alias)
+            for m in re.finditer(pattern, text):
+                candidates.append((m.start(), m.end(), canonical))
+    spans = []
+    for start, end, canonical in sorted(candidates, key=lambda c: c[0] - c[1]):
+        if not any(start < e and s < end for s, e, _ in spans):
+            spans.append((start, end, canonical))
+    return sorted(spans)
+
+
+def canonical_company(value: Optional[str]) -> Optional[str]:
+    """Map a raw company value (any alias or misspelling) to its canonical label."""
+    return _match_alias(value, COMPANY_ALIASES)
+
+
+def canonical_category(value: Optional[str]) -> Optional[str]:
+    """Map a raw category value to one of the known categories."""
+    return _match_alias(value, CATEGORY_ALIASES)
+
+
+def normalize_date(value: Optional[str]) -> Tuple[Optional[int], Optional[int]]:
+    """
+    Extract (year, month) from a free-text date. Month is None when only a year is present.
+    Handles "june 2023", "1/1/2025", "01-01-2025", "January 1st, 2025" and ISO dates.
+    """
+    if not value:
+        return None, None
+    text = value.strip()
+
+    m = _ISO_RE.search(text)
+    if m and 1 <= int(m.group(2)) <= 12:
+        return int(m.group(1)), int(m.group(2))
+
+    m = _NAMED_RE.search(text)
+    if m:
+        return int(m.group(3)), MONTHS[m.group(1).lower()]
+
+    m = _NUMERIC_RE.search(text)
+    if m and 1 <= int(m.group(1)) <= 12:
+        return int(m.group(3)), int(m.group(1))
+
+    m = _YEAR_RE.search(text)
+    if m:
+        return int(m.group(1)), None
+    return None, None
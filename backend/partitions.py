@@ -0,0 +1,301 @@
+# partitions.py - partition layout of uml_temp and year-based partition pruning for generated searches
+import logging
+import re
+import threading
+import time
+
+from normalize import normalize_date
+
+log = logging.getLogger(__name__)
+
+# Partition key of uml_temp (or of uml_temp_data behind the uml_temp view when descriptions are split out)
+LAYOUT_SQL = """
+SELECT a.attname, to_regclass('uml_description') IS NOT NULL
+  FROM pg_partitioned_table p
+  JOIN pg_attribute a ON a.attrelid = p.partrelid AND a.attnum = p.partattrs[0]
+ WHERE p.partrelid = COALESCE(to_regclass('uml_temp_data'), to_regclass('uml_temp'))
+"""
+
+# doc_year 0 holds rows whose date could not be normalized, or names more than one year; they are
+# searched by every query
+UNDATED_YEAR = 0
+
+FROM_RE = re.compile(r"\bFROM\s+uml_temp\b(?:\s+(?:AS\s+)?(?!WHERE\b|ORDER\b|GROUP\b|LIMIT\b)([A-Za-z_]\w*))?",
+                     re.IGNORECASE)
+YEAR_RE = re.compile(r"(?<!\d)(?:19|20)\d{2}(?!\d)")
+# Every year-like substring, overlapping and regardless of neighbouring digits: whatever date ~ '2024' could hit
+YEAR_TEXT_RE = re.compile(r"(?=((?:19|20)\d{2}))")
+# One alternative of a date-only year predicate: date ~* '...2024...'
+DATE_MATCH_RE = re.compile(r"^(?:[A-Za-z_]\w*\.)?date\s*~\*?\s*'((?:[^']|'')*)'$", re.IGNORECASE)
+CLAUSE_RE = re.compile(r"\b(WHERE|GROUP\s+BY|HAVING|ORDER\s+BY|LIMIT|OFFSET|UNION|INTERSECT|EXCEPT|JOIN)\b",
+                       re.IGNORECASE)
+
+
+def partition_year(date, description_head=None) -> int:
+    """
+    doc_year of a row. A date naming exactly one year goes to that year's partition; one naming
+    several ("2019-2024", "filed 2021, amended 2023") goes to the undated partition, so a date
+    predicate on any of its years still finds it. A date without a year is normalized like the
+    indexer does (normalize.normalize_date over date, then the head of description).
+    """
+    named = set(YEAR_TEXT_RE.findall(str(date or "")))
+    if named:
+        return int(named.pop()) if len(named) == 1 else UNDATED_YEAR
+    year, _ = normalize_date(date)
+    if year is None:
+        year, _ = normalize_date(description_head)
+    return year or UNDATED_YEAR
+
+
+def _regex_end(pattern: str, i: int) -> int:
+    """Index just past the escape, bracket expression or group starting at pattern[i] (-1 if unclosed)."""
+    if pattern[i] == "\\":
+        return i + 2
+    if pattern[i] == "[":
+        j = i + 1 + pattern.startswith("^", i + 1)
+        j = pattern.find("]", j + pattern.startswith("]", j))
+        return j + 1 if j != -1 else -1
+    depth, j = 0, i
+    while j < len(pattern):
+        if pattern[j] in "\\[":
+            j = _regex_end(pattern, j)
+            if j == -1:
+                return -1
+            continue
+        depth += {"(": 1, ")": -1}.get(pattern[j], 0)
+        j += 1
+        if depth == 0:
+            return j
+    return -1
+
+
+def _top_level_alternatives(pattern: str):
+    parts, start, i = [], 0, 0
+    while i < len(pattern):
+        if pattern[i] in "\\[(":
+            i = _regex_end(pattern, i)
+            if i == -1:
+                return None
+            continue
+        if pattern[i] == "|":
+            parts.append(pattern[start:i])
+            start = i + 1
+        i += 1
+    return parts + [pattern[start:]]
+
+
+def _required_years(alternative: str):
+    """Years one of which every match of this branch contains: a literal year, or a (2023|2024) group, not quantified."""
+    i = 0
+    while i < len(alternative):
+        ch = alternative[i]
+        end = _regex_end(alternative, i) if ch in "\\[(" else i + 1
+        if end == -1:
+            return None
+        quantified = alternative.startswith(("?", "*", "{"), end)
+        if ch == "(":
+            group = alternative[i + 1:end - 1]
+            branches = (group[2:] if group.startswith("?:") else group).split("|")
+            if not quantified and all(re.fullmatch(r"(?:19|20)\d{2}", b) for b in branches):
+                return set(branches)
+        elif ch not in "\\[":
+            year = YEAR_RE.match(alternative, i)
+            if year and not alternative.startswith(("?", "*", "{"), year.end()):
+                return {year.group()}
+        i = end
+    return None
+
+
+def _pattern_years(pattern: str):
+    """
+    Years a date regex requires, or None unless every top-level alternative must contain a
+    literal year (or one of a group of literal years) that is not optional.
+    """
+    alternatives = _top_level_alternatives(pattern)
+    if alternatives is None:
+        return None
+    if len(alternatives) == 1 and _regex_end(pattern, 0) == len(pattern) and pattern.startswith("("):
+        inner = pattern[3:-1] if pattern.startswith("(?:") else pattern[1:-1]
+        return _pattern_years(inner)
+    years = set()
+    for alternative in alternatives:
+        found = _required_years(alternative)
+        if not found:
+            return None
+        years |= found
+    return years
+
+
+class PartitionLayout:
+    """
+    How uml_temp is stored, read from the catalog and cached for `ttl` seconds: key is
+    "doc_year", "created_at" or None (a plain table), split_description says whether
+    descriptions live in the uml_description side table.
+    """
+
+    def __init__(self, connect, ttl: float = 300.0):
+        self._connect = connect
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._layout = None
+        self._checked_at = 0.0
+
+    def get(self) -> dict:
+        with self._lock:
+            if self._layout is not None and time.monotonic() - self._checked_at < self.ttl:
+                return self._layout
+            try:
+                conn = self._connect()
+                try:
+                    with conn, conn.cursor() as cur:
+                        cur.execute(LAYOUT_SQL)
+                        row = cur.fetchone()
+                finally:
+                    conn.close()
+                self._layout = {"key": row[0], "split_description": bool(row[1])} if row else {
+                    "key": None, "split_description": False}
+            except Exception as exc:
+                log.warning("Could not read the uml_temp partition layout: %s", exc)
+                self._layout = self._layout or {"key": None, "split_description": False}
+            self._checked_at = time.monotonic()
+            return self._layout
+
+    @property
+    def key(self):
+        return self.get()["key"]
+
+
+def _top_level_clauses(sql: str):
+    """(keyword, position) of SQL clause keywords outside parentheses and string literals."""
+    found, depth, i = [], 0, 0
+    while i < len(sql):
+        ch = sql[i]
+        if ch == "'":
+            end = sql.find("'", i + 1)
+            while end != -1 and sql.startswith("''", end):
+                end = sql.find("'", end + 2)
+            if end == -1:
+                return None
+            i = end + 1
+            continue
+        if ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+        elif depth == 0 and ch.isalpha() and (i == 0 or not (sql[i - 1].isalnum() or sql[i - 1] == "_")):
+            m = CLAUSE_RE.match(sql, i)
+            if m:
+                found.append((" ".join(m.group(1).upper().split()), m.start()))
+                i = m.end()
+                continue
+        i += 1
+    return found
+
+
+def _split_top_level(text: str, word: str):
+    """Split text on a keyword (AND/OR) outside parentheses and string literals."""
+    parts, depth, start, i = [], 0, 0, 0
+    pattern = re.compile(rf"{word}\b", re.IGNORECASE)
+    while i < len(text):
+        ch = text[i]
+        if ch == "'":
+            end = text.find("'", i + 1)
+            while end != -1 and text.startswith("''", end):
+                end = text.find("'", end + 2)
+            if end == -1:
+                return None
+            i = end + 1
+            continue
+        if ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+        elif depth == 0 and (i == 0 or not (text[i - 1].isalnum() or text[i - 1] == "_")) and pattern.match(text, i):
+            parts.append(text[start:i])
+            i = start = i + len(word)
+            continue
+        i += 1
+    parts.append(text[start:])
+    return [part.strip() for part in parts]
+
+
+def _unwrap(text: str) -> str:
+    """Drop parentheses that enclose the whole expression."""
+    while text.startswith("(") and text.endswith(")"):
+        depth = 0
+        for i, ch in enumerate(text):
+            depth += ch == "("
+            depth -= ch == ")"
+            if depth == 0 and i < len(text) - 1:
+                return text
+        text = text[1:-1].strip()
+    return text
+
+
+def predicate_years(sql: str):
+    """
+    Years a search's own date predicate limits it to, or None when it is not limited to
+    specific years. Only a top-level condition made purely of date ~* '<pattern>' alternatives
+    that all name years counts: a condition that also matches description (a document dated
+    2021 that mentions 2024) or a pattern without literal years could match any partition. Rows
+    whose date names several years are in the undated partition (partition_year), which pruned
+    searches always scan.
+    """
+    body = sql.strip().rstrip(";")
+    clauses = _top_level_clauses(body)
+    if not clauses:
+        return None
+    where = [pos for name, pos in clauses if name == "WHERE"]
+    if len(where) != 1:
+        return None
+    end = min([pos for name, pos in clauses if pos > where[0]] + [len(body)])
+    conjuncts = _split_top_level(_unwrap(body[where[0] + len("WHERE"):end].strip()), "AND")
+    years = None
+    for conjunct in conjuncts or ():
+        alternatives = _split_top_level(_unwrap(conjunct), "OR") or []
+        found = set()
+        for alternative in alternatives:
+            match = DATE_MATCH_RE.match(_unwrap(alternative))
+            named = _pattern_years(match.group(1).replace("''", "'")) if match else None
+            if not named:
+                found = None
+                break
+            found |= named
+        if found:
+            years = found if years is None else years & found
+    return sorted(years) if years is not None else None
+
+
+def year_predicate(sql: str, years) -> str:
+    """
+    Add "doc_year IN (<years>, 0)" to a single-table SELECT over uml_temp so Postgres only scans
+    the partitions for those years (plus the undated one). The predicate goes into the query's
+    own WHERE (ahead of ORDER BY/LIMIT), so it narrows rather than post-filters. Anything other
+    than a plain SELECT ... FROM uml_temp [alias] [WHERE ...] is returned unchanged.
+    """
+    years = sorted({int(y) for y in years or () if str(y).isdigit()})
+    if not years:
+        return sql
+    body = sql.strip().rstrip(";")
+    clauses = _top_level_clauses(body)
+    from_match = FROM_RE.search(body)
+    if clauses is None or not from_match or not body[:6].upper() == "SELECT":
+        return sql
+    names = [name for name, _ in clauses]
+    if any(name in ("JOIN", "UNION", "INTERSECT", "EXCEPT", "GROUP BY", "HAVING") for name in names):
+        return sql
+    if names.count("WHERE") > 1 or len(FROM_RE.findall(body)) != 1:
+        return sql
+    column = f"{from_match.group(1)}.doc_year" if from_match.group(1) else "doc_year"
+    predicate = f"{column} IN ({', '.join(str(y) for y in years + [UNDATED_YEAR])})"
+
+    tail_start = min([pos for name, pos in clauses if name in ("ORDER BY", "LIMIT", "OFFSET")] + [len(body)])
+    where = [pos for name, pos in clauses if name == "WHERE"]
+    if where:
+        condition = body[where[0] + len("WHERE"):tail_start].strip()
+        head = body[:where[0]].rstrip()
+        rewritten = f"{head}\nWHERE {predicate}\n  AND ({condition})"
+    else:
+        rewritten = f"{body[:tail_start].rstrip()}\nWHERE {predicate}"
+    tail = body[tail_start:].strip()
+    return f"{rewritten}\n{tail}" if tail else rewritten
@@ -0,0 +1,302 @@
+# previews.py - cached first-page thumbnails and text previews for PDF, DOCX and XLSX files
+import hashlib
+import html
+import json
+import logging
+import multiprocessing
+import os
+import threading
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from xml.etree import ElementTree
+
+log = logging.getLogger(__name__)
+
+PREVIEW_VERSION = "1"  # bump to invalidate every cached render
+MAX_TEXT_CHARS = 4000
+MAX_SHEET_ROWS = 20
+THUMB_WIDTH = 320
+SUPPORTED = {".pdf", ".docx", ".xlsx"}
+
+W_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+S_NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+
+
+# --- Renderers (module-level so they can run in worker processes) --------------------------
+
+def _pdf_backend():
+    """Optional PDF libraries, imported inside the render process rather than at app start-up."""
+    try:  # PDF text and thumbnails
+        import fitz  # PyMuPDF
+
+        return "fitz", fitz
+    except ImportError:  # pragma: no cover - depends on environment
+        pass
+    try:  # PDF text only
+        import pypdf
+
+        return "pypdf", pypdf
+    except ImportError:  # pragma: no cover - depends on environment
+        return None, None
+
+
+def _pdf_preview(path):
+    backend, module = _pdf_backend()
+    if backend == "fitz":
+        with module.open(path) as doc:
+            text = "".join(page.get_text() for page in doc.pages(0, min(3, doc.page_count)))
+            page = doc.load_page(0) if doc.page_count else None
+            png = None
+            if page is not None:
+                zoom = THUMB_WIDTH / max(page.rect.width, 1)
+                png = page.get_pixmap(matrix=module.Matrix(zoom, zoom), alpha=False).tobytes("png")
+            return {"type": "pdf", "pages": doc.page_count, "text": text[:MAX_TEXT_CHARS]}, png
+    if backend == "pypdf":
+        reader = module.PdfReader(path)
+        text = "".join((p.extract_text() or "") for p in reader.pages[:3])
+        return {"type": "pdf", "pages": len(reader.pages), "text": text[:MAX_TEXT_CHARS]}, None
+    return {"type": "pdf", "text": "", "note": "Install PyMuPDF for PDF previews"}, None
+
+
+def _docx_preview(path):
+    with zipfile.ZipFile(path) as zf:
+        root = ElementTree.fromstring(zf.read("word/document.xml"))
+    paragraphs, length = [], 0
+    for para in root.iter(f"{W_NS}p"):
+        text = "".join(node.text or "" for node in para.iter(f"{W_NS}t")).strip()
+        if not text:
+            continue
+        paragraphs.append(text)
+        length += len(text)
+        if length >= MAX_TEXT_CHARS:
+            break
+    body = "".join(f"<p>{html.escape(p)}</p>" for p in paragraphs)
+    return {"type": "docx", "text": "\n".join(paragraphs)[:MAX_TEXT_CHARS], "html": body}, None
+
+
+def _xlsx_preview(path):
+    with zipfile.ZipFile(path) as zf:
+        shared = []
+        if "xl/sharedStrings.xml" in zf.namelist():
+            for si in ElementTree.fromstring(zf.read("xl/sharedStrings.xml")).iter(f"{S_NS}si"):
+                shared.append("".join(t.text or "" for t in si.iter(f"{S_NS}t")))
+        sheets = sorted(n for n in zf.namelist() if n.startswith("xl/worksheets/sheet") and n.endswith(".xml"))
+        if not sheets:
+            return {"type": "xlsx", "text": "", "html": ""}, None
+        root = ElementTree.fromstring(zf.read(sheets[0]))
+    rows = []
+    for row in root.iter(f"{S_NS}row"):
+        values = []
+        for cell in row.iter(f"{S_NS}c"):
+            value = cell.find(f"{S_NS}v")
+            inline = cell.find(f"{S_NS}is")
+            if cell.get("t") == "s" and value is not None:
+                values.append(shared[int(value.text)] if int(value.text) < len(shared) else "")
+            elif inline is not None:
+                values.append("".join(t.text or "" for t in inline.iter(f"{S_NS}t")))
+            else:
+                values.append(value.text if value is not None else "")
+        rows.append(values)
+        if len(rows) >= MAX_SHEET_ROWS:
+            break
+    table = "".join("<tr>" + "".join(f"<td>{html.escape(v or '')}</td>" for v in r) + "</tr>" for r in rows)
+    text = "\n".join("\t".join(v or "" for v in r) for r in rows)
+    return {"type": "xlsx", "sheets": len(sheets), "text": text[:MAX_TEXT_CHARS], "html": f"<table>{table}</table>"}, None
+
+
+RENDERERS = {".pdf": _pdf_preview, ".docx": _docx_preview, ".xlsx": _xlsx_preview}
+
+
+def render_to_cache(path: str, cache_dir: str, key: str):
+    """Render one file and write <key>.json (+ <key>.png). Runs in the process pool."""
+    ext = os.path.splitext(path)[1].lower()
+    try:
+        meta, png = RENDERERS[ext](path)
+    except Exception as exc:
+        meta, png = {"type": ext.lstrip("."), "text": "", "error": f"Preview failed: {exc}"}, None
+    meta["thumbnail"] = png is not None
+    if png is not None:
+        _atomic_write(os.path.join(cache_dir, f"{key}.png"), png)
+    _atomic_write(os.path.join(cache_dir, f"{key}.json"), json.dumps(meta, ensure_ascii=False).encode("utf-8"))
+    return key
+
+
+def _atomic_write(target, data: bytes):
+    tmp = f"{target}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, target)
+
+
+# --- Service --------------------------------------------------------------------------------
+
+class PreviewService:
+    """
+    Disk cache of previews keyed by path + mtime + size, filled by a bounded process pool.
+    Concurrent requests for the same file share one render; prefetch() queues renders for
+    freshly returned search results without blocking the response.
+
+    Render processes are started with forkserver (spawn where unavailable), never forked from
+    the threaded web worker, and a pool broken by a crashed renderer is replaced on the next
+    render. Entries unused for max_age seconds are purged, then the least recently used ones
+    until the cache is under max_bytes (checked at most every purge_interval seconds).
+    """
+
+    def __init__(self, cache_dir, workers: int = 2, max_pending: int = 64, max_bytes: int = 1024 * 1024 * 1024,
+                 max_age: float = 30 * 86400.0, purge_interval: float = 300.0):
+        self.cache_dir = cache_dir
+        self.workers = workers
+        self.max_pending = max_pending
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.purge_interval = purge_interval
+        self._pool = None
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._purged_at = 0.0
+        self._purging = False
+
+    @staticmethod
+    def supported(path: str) -> bool:
+        return os.path.splitext(path)[1].lower() in SUPPORTED
+
+    def cache_key(self, path: str, stat) -> str:
+        raw = f"{PREVIEW_VERSION}|{path}|{stat.mtime}|{stat.size}"
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def _executor(self):
+        if self._pool is None:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context(method))
+        return self._pool
+
+    def _discard_pool(self, pool):
+        """Drop a broken pool (a renderer crashed or was killed) so the next render starts a new one."""
+        with self._lock:
+            if self._pool is not pool:
+                return
+            self._pool = None
+        log.warning("preview render pool broke; starting a new one")
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def _submit(self, path: str, key: str):
+        with self._lock:
+            future = self._pending.get(key)
+            if future is not None:
+                return future
+            if len(self._pending) >= self.max_pending:
+                return None
+            for _attempt in range(2):
+                pool = self._executor()
+                try:
+                    future = pool.submit(render_to_cache, path, str(self.cache_dir), key)
+                    break
+                except BrokenProcessPool:
+                    self._pool = None
+                    pool.shutdown(wait=False, cancel_futures=True)
+            else:
+                return None
+            self._pending[key] = future
+        future.add_done_callback(lambda f: self._finished(key, pool, f))
+        return future
+
+    def _finished(self, key, pool, future):
+        with self._lock:
+            self._pending.pop(key, None)
+        if not future.cancelled() and isinstance(future.exception(), BrokenProcessPool):
+            self._discard_pool(pool)
+        self._maybe_purge()
+
+    def _maybe_purge(self):
+        now = time.monotonic()
+        with self._lock:
+            if self._purging or now - self._purged_at < self.purge_interval:
+                return
+            self._purging, self._purged_at = True, now
+        threading.Thread(target=self._purge, name="preview-purge", daemon=True).start()
+
+    def _purge(self):
+        try:
+            self.purge()
+        except OSError as exc:
+            log.warning("preview cache purge failed: %s", exc)
+        finally:
+            with self._lock:
+                self._purging = False
+
+    def purge(self):
+        """Delete expired entries, then least recently used ones until under max_bytes; returns entries removed."""
+        entries = {}  # key -> [last used, size, paths]
+        with os.scandir(self.cache_dir) as it:
+            for item in it:
+                if not item.is_file():
+                    continue
+                st = item.stat()
+                entry = entries.setdefault(item.name.split(".", 1)[0], [0.0, 0, []])
+                entry[0] = max(entry[0], st.st_mtime)
+                entry[1] += st.st_size
+                entry[2].append(item.path)
+        cutoff = time.time() - self.max_age
+        total = sum(e[1] for e in entries.values())
+        removed = 0
+        for key, (used, size, paths) in sorted(entries.items(), key=lambda kv: kv[1][0]):
+            if used >= cutoff and total <= self.max_bytes:
+                break
+            with self._lock:
+                if key in self._pending:
+                    continue
+            for path in paths:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            total -= size
+            removed += 1
+        return removed
+
+    def cached(self, key: str):
+        meta_path = self.cache_dir / f"{key}.json"
+        if not meta_path.exists():
+            return None
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        try:
+            os.utime(meta_path)  # mtime doubles as last use for the purge
+        except OSError:
+            pass
+        return meta
+
+    def get(self, path: str, stat, wait: float = 10.0):
+        """Return (key, meta) rendering on demand; meta is None while a render is still running."""
+        key = self.cache_key(path, stat)
+        meta = self.cached(key)
+        if meta is not None:
+            return key, meta
+        future = self._submit(path, key)
+        if future is None:
+            return key, None
+        try:
+            future.result(timeout=wait)
+        except Exception as exc:
+            log.info("preview for %s not ready: %s", path, exc)
+            return key, None
+        return key, self.cached(key)
+
+    def thumbnail_path(self, key: str):
+        path = self.cache_dir / f"{key}.png"
+        return path if path.exists() else None
+
+    def prefetch(self, items):
+        """items: iterable of (path, stat). Queues renders that are not cached yet."""
+        for path, stat in items:
+            key = self.cache_key(path, stat)
+            if not (self.cache_dir / f"{key}.json").exists():
+                self._submit(path, key)
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
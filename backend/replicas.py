@@ -0,0 +1,189 @@
+# replicas.py - health- and lag-aware routing of read queries across Postgres read replicas
+import itertools
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+import psycopg2
+
+log = logging.getLogger(__name__)
+
+# Seconds since the last replayed transaction; 0 while fully caught up (an idle primary writes nothing,
+# so an old replay timestamp alone does not mean the replica is behind)
+LAG_SQL = """
+SELECT pg_is_in_recovery(),
+       CASE WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+            ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+       END
+"""
+
+
+def parse_hosts(spec: str, default_port: int):
+    """'host1:5432, host2' -> [("host1", 5432), ("host2", default_port)]."""
+    hosts = []
+    for item in (spec or "").split(","):
+        item = item.strip()
+        if not item:
+            continue
+        host, _, port = item.rpartition(":") if ":" in item else (item, "", "")
+        hosts.append((host, int(port) if port else default_port))
+    return hosts
+
+
+def is_connection_error(exc: BaseException) -> bool:
+    """The server is unreachable or went away (not a bad statement or a statement_timeout)."""
+    return isinstance(exc, (psycopg2.OperationalError, psycopg2.InterfaceError)) and not isinstance(
+        exc, psycopg2.extensions.QueryCanceledError
+    )
+
+
+class Replica:
+    """One read replica: its pools (one per workload class) plus the last probe's health and lag."""
+
+    def __init__(self, host: str, port: int, build_pool, connect, workloads):
+        self.host = host
+        self.port = port
+        self.name = f"{host}:{port}"
+        self._build_pool = build_pool
+        self._connect = connect
+        self._workloads = tuple(workloads)
+        self.pools = {}
+        self.healthy = False  # until the first probe says otherwise
+        self.lag = None
+        self.error = None
+        self.checked_at = 0.0
+        self.in_use = 0
+        self.reset_pools()
+
+    def reset_pools(self):
+        self.pools = {workload: self._build_pool(workload, self.host, self.port) for workload in self._workloads}
+
+    def close(self):
+        for pool in self.pools.values():
+            pool.close()
+
+    def probe(self):
+        try:
+            conn = self._connect(self.host, self.port)
+            try:
+                with conn, conn.cursor() as cur:
+                    cur.execute(LAG_SQL)
+                    _, lag = cur.fetchone()
+            finally:
+                conn.close()
+            self.lag, self.error, self.healthy = float(lag or 0), None, True
+        except Exception as exc:
+            if self.healthy:
+                log.warning("Read replica %s is down: %s", self.name, exc)
+            self.error, self.healthy = str(exc), False
+        self.checked_at = time.monotonic()
+
+    def stats(self) -> dict:
+        return {
+            "name": self.name,
+            "healthy": self.healthy,
+            "lag_s": None if self.lag is None else round(self.lag, 1),
+            "in_use": self.in_use,
+            "error": self.error,
+        }
+
+
+class ReplicaRouter:
+    """
+    Picks the replica for a read: healthy, within max_lag seconds of the primary, then by
+    least connections in use (or round robin). None means "use the primary" - no replicas
+    configured, none eligible, or the read needs the primary's current data (max_lag=0).
+    Replicas are re-probed in the background every check_interval seconds, triggered by
+    reads, so no thread runs while the app is idle. A replica whose connection fails is
+    taken out of rotation at once and comes back after its next successful probe.
+    """
+
+    def __init__(self, replicas, strategy: str = "least_connections", max_lag: float = 30.0,
+                 check_interval: float = 5.0):
+        self.replicas = list(replicas)
+        self.strategy = strategy
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self._rr = itertools.count()
+        self._lock = threading.Lock()
+        self._checking = False
+        self._checked_at = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.replicas)
+
+    def check(self):
+        """Probe every replica now (warm-up, tests)."""
+        for replica in self.replicas:
+            replica.probe()
+        self._checked_at = time.monotonic()
+
+    def _refresh_in_background(self):
+        with self._lock:
+            if self._checking or time.monotonic() - self._checked_at < self.check_interval:
+                return
+            self._checking = True
+
+        def run():
+            try:
+                self.check()
+            finally:
+                with self._lock:
+                    self._checking = False
+
+        threading.Thread(target=run, name="replica-check", daemon=True).start()
+
+    def choose(self, max_lag: float = None):
+        if not self.replicas:
+            return None
+        self._refresh_in_background()
+        max_lag = self.max_lag if max_lag is None else max_lag
+        if max_lag <= 0:
+            return None
+        with self._lock:
+            eligible = [r for r in self.replicas if r.healthy and r.lag is not None and r.lag <= max_lag]
+            if not eligible:
+                return None
+            if self.strategy == "round_robin":
+                return eligible[next(self._rr) % len(eligible)]
+            return min(eligible, key=lambda r: (r.in_use, r.lag))
+
+    @contextmanager
+    def connection(self, replica: Replica, workload: str):
+        """A pooled connection to replica; connection failures take it out of rotation."""
+        with self._lock:
+            replica.in_use += 1
+        try:
+            with replica.pools[workload].connection() as conn:
+                yield conn
+        except Exception as exc:
+            if is_connection_error(exc):
+                self.mark_down(replica, exc)
+            raise
+        finally:
+            with self._lock:
+                replica.in_use -= 1
+
+    def mark_down(self, replica: Replica, exc: BaseException):
+        with self._lock:
+            was_healthy, replica.healthy, replica.error = replica.healthy, False, str(exc)
+        if was_healthy:
+            log.warning("Read replica %s taken out of rotation: %s", replica.name, exc)
+
+    def reset_pools(self):
+        for replica in self.replicas:
+            replica.reset_pools()
+
+    def close(self):
+        for replica in self.replicas:
+            replica.close()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "strategy": self.strategy,
+                "max_lag_s": self.max_lag,
+                "replicas": [replica.stats() for replica in self.replicas],
+            }
@@ -0,0 +1,206 @@
+# resilience.py - retries with jittered backoff, a circuit breaker and prompt coalescing around OpenAI calls
+import email.utils
+import hashlib
+import json
+import logging
+import random
+import threading
+import time
+
+from metrics import LLM_RESILIENCE
+from singleflight import SingleFlight
+
+log = logging.getLogger(__name__)
+
+# Exception class names (openai SDK, httpx) that mean "try again later", not "this request is wrong"
+RETRYABLE_ERRORS = {
+    "APITimeoutError", "APIConnectionError", "RateLimitError", "InternalServerError", "ServiceUnavailableError",
+    "TimeoutException", "ConnectError", "ReadTimeout", "ConnectTimeout", "RemoteProtocolError",
+    "TimeoutError", "ConnectionError",
+}
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised without calling the provider while the circuit breaker is open."""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"AI service temporarily unavailable; retry in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+def is_retryable(exc: BaseException) -> bool:
+    status = getattr(exc, "status_code", None)
+    if isinstance(status, int):
+        return status == 429 or status >= 500
+    return any(cls.__name__ in RETRYABLE_ERRORS for cls in type(exc).__mro__)
+
+
+def retry_after_hint(exc: BaseException):
+    """Seconds from a Retry-After header on a rate-limit/overload response, if any."""
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None)
+    value = headers.get("retry-after") if headers is not None else None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        parsed = email.utils.parsedate_to_datetime(value)
+        return max(0.0, parsed.timestamp() - time.time()) if parsed else None
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """Full-jitter exponential backoff: uniform(0, min(cap, base * 2**attempt))."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure breaker. After failure_threshold transient failures in a row it opens
+    and every call fails fast for reset_timeout seconds; then one trial call is let through
+    (half-open) and its outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """Raise CircuitOpenError unless a call may go to the provider now."""
+        with self._lock:
+            if self._state == "closed":
+                return
+            remaining = self._opened_at + self.reset_timeout - time.monotonic()
+            if self._state == "open" and remaining <= 0:
+                self._state = "half_open"
+            if self._state == "half_open" and not self._trial_running:
+                self._trial_running = True
+                return
+        LLM_RESILIENCE.inc("short_circuit")
+        raise CircuitOpenError(max(remaining, 1.0))
+
+    def record_success(self):
+        with self._lock:
+            if self._state != "closed":
+                log.info("LLM circuit closed")
+            self._state = "closed"
+            self._failures = 0
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_running = False
+            if self._state == "half_open" or (self._state == "closed" and self._failures >= self.failure_threshold):
+                if self._state == "closed":
+                    log.warning("LLM circuit opened after %d consecutive failures", self._failures)
+                    LLM_RESILIENCE.inc("circuit_opened")
+                self._state = "open"
+                self._opened_at = time.monotonic()
+
+    def record_ignored(self):
+        """A non-transient error (bad request, auth): says nothing about provider health."""
+        with self._lock:
+            self._trial_running = False
+
+    @property
+    def is_open(self) -> bool:
+        with self._lock:
+            return self._state == "open" and time.monotonic() - self._opened_at < self.reset_timeout
+
+    def stats(self) -> dict:
+        with self._lock:
+            retry_in = self._opened_at + self.reset_timeout - time.monotonic() if self._state == "open" else 0
+            return {"state": self._state, "consecutive_failures": self._failures, "retry_in_s": round(max(retry_in, 0), 1)}
+
+
+class _CoalescedResponse:
+    """A follower's view of the leader's response: same content, no token usage of its own."""
+
+    usage = None
+
+    def __init__(self, response):
+        self._response = response
+
+    def __getattr__(self, name):
+        return getattr(self._response, name)
+
+
+class _Completions:
+    def __init__(self, owner):
+        self._owner = owner
+
+    def create(self, **kwargs):
+        return self._owner.create(**kwargs)
+
+
+class _Chat:
+    def __init__(self, owner):
+        self.completions = _Completions(owner)
+
+
+class ResilientClient:
+    """
+    Drop-in for the client.chat.completions.create(...) call sites. Identical in-flight prompts
+    (same model, messages and parameters) share one provider call; each call is retried on
+    transient errors with jittered exponential backoff (honouring Retry-After) and guarded by
+    the circuit breaker, so a degraded provider fails fast instead of tying up every worker.
+    quota (workload.TenantQuotas) refuses calls for a tenant over its token budget and is
+    charged with each provider call's usage.
+    """
+
+    def __init__(self, get_client, breaker: CircuitBreaker, retries: int = 2, backoff_base: float = 0.5,
+                 backoff_max: float = 8.0, quota=None):
+        self._get_client = get_client
+        self.breaker = breaker
+        self.quota = quota
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._flights = SingleFlight()
+        self.chat = _Chat(self)
+
+    @staticmethod
+    def prompt_key(kwargs: dict) -> str:
+        return hashlib.sha1(json.dumps(kwargs, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+    def create(self, **kwargs):
+        if self.quota is not None:
+            self.quota.before_llm_call()
+        response, shared = self._flights.do(self.prompt_key(kwargs), lambda: self._call(kwargs))
+        if shared:
+            LLM_RESILIENCE.inc("coalesced")
+            return _CoalescedResponse(response)
+        return response
+
+    def _call(self, kwargs: dict):
+        attempt = 0
+        while True:
+            self.breaker.before_call()
+            try:
+                response = self._get_client().chat.completions.create(**kwargs)
+            except Exception as exc:
+                if not is_retryable(exc):
+                    self.breaker.record_ignored()
+                    raise
+                self.breaker.record_failure()
+                if attempt >= self.retries or self.breaker.is_open:
+                    LLM_RESILIENCE.inc("failure")
+                    raise
+                hint = retry_after_hint(exc)
+                delay = min(hint, self.backoff_max) if hint is not None else backoff_delay(
+                    attempt, self.backoff_base, self.backoff_max)
+                LLM_RESILIENCE.inc("retry")
+                log.info("LLM call failed (%s); retry %d in %.2fs", type(exc).__name__, attempt + 1, delay)
+                time.sleep(delay)
+                attempt += 1
+                continue
+            self.breaker.record_success()
+            if self.quota is not None:
+                self.quota.charge_usage(getattr(response, "usage", None))
+            return response
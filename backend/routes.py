@@ -0,0 +1,973 @@
+# routes.py - HTTP API and SPA serving, registered on the app by factory.create_app()
+import functools
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+
+from flask import Blueprint, Response, current_app, jsonify, request, send_file
+from werkzeug.exceptions import HTTPException
+
+import config
+import db
+import llm
+import storage
+from aggregations import build_aggregates
+from analysis import facts_context
+from facets import apply_filters, filter_only_query, normalize_filters
+from file_server import send_document
+from match_reasons import ReasonCache, ReasonPlan, plan
+from metrics import COALESCED, record_rows, record_tokens, stage
+from partitions import predicate_years, year_predicate
+from prompts import ANALYSE_NARRATIVE_PROMPT, ANALYSE_SYSTEM_PROMPT, SUMMARY_SYSTEM_PROMPT
+from resilience import CircuitOpenError
+from singleflight import SingleFlight
+from sql_cache import extract_intent
+from static_assets import StaticAssets
+from summaries import raw_text_needed
+from workload import BULK, INTERACTIVE, FairScheduler, QuotaExceeded
+
+log = logging.getLogger(__name__)
+
+bp = Blueprint("dashboard", __name__)
+
+# frontend/dist is served by StaticAssets (indexed once, precompressed, cache headers) rather than Flask's static route
+static_assets = StaticAssets(config.STATIC_DIR)
+# Identical searches in flight at the same time share one SQL generation and one execution
+search_flights = SingleFlight()
+reason_cache = ReasonCache(max_entries=config.MATCH_REASON_CACHE_SIZE, ttl=config.MATCH_REASON_CACHE_TTL)
+# Admission control shared by every route that runs SQL or LLM work: interactive first, fair across tenants
+scheduler = FairScheduler(
+    slots=config.WORKLOAD_SLOTS,
+    bulk_slots=config.WORKLOAD_BULK_SLOTS,
+    per_tenant=config.QUOTA_CONCURRENT_QUERIES,
+    timeout=config.WORKLOAD_QUEUE_TIMEOUT,
+)
+
+FRONTEND_MISSING = (
+    "Frontend build missing. Run `npm install` and `npm run build` inside frontend/ before starting the backend."
+)
+
+
+@bp.route("/")
+def index():
+    # Serve the SPA entrypoint from the built frontend
+    response = static_assets.serve("index.html", request)
+    if response is None:
+        return FRONTEND_MISSING, 500
+    return response
+
+
+def request_tenant() -> str:
+    """Who a request is charged to: the TENANT_HEADER an auth proxy sets, else the client address."""
+    tenant = request.headers.get(config.TENANT_HEADER, "").strip()
+    return f"user:{tenant}" if tenant else f"addr:{request.remote_addr}"
+
+
+def quota_error(exc: QuotaExceeded, **fields):
+    """429 (tenant over budget) or 503 (no slot in time) with Retry-After."""
+    body = jsonify({"error": str(exc), **fields})
+    body.headers["Retry-After"] = str(int(exc.retry_after + 0.999))
+    return body, exc.status
+
+
+def scheduled(workload: str):
+    """Run the view in a scheduler slot charged to the requesting tenant."""
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            try:
+                with scheduler.slot(request_tenant(), workload):
+                    return view(*args, **kwargs)
+            except QuotaExceeded as exc:
+                return quota_error(exc)
+        return wrapper
+    return decorator
+
+
+def resolve_allowed_path(file_path):
+    """Return (abs_path, None) when file_path lies under ALLOWED_BASE_PATH, else (None, error response)."""
+    if not file_path:
+        return None, (jsonify({"error": "Missing file path"}), 400)
+
+    abs_path = os.path.abspath(file_path)
+    try:
+        common = os.path.commonpath([abs_path, config.ALLOWED_BASE_PATH])
+    except ValueError:
+        common = ""
+
+    if common != config.ALLOWED_BASE_PATH:
+        return None, (jsonify({"error": "Access denied for this path"}), 403)
+    return abs_path, None
+
+
+@bp.route("/open-file")
+def open_file():
+    """
+    Serve a file from disk if it resides under ALLOWED_BASE_PATH.
+    Prevents the browser from blocking file:/// links.
+    """
+    abs_path, error = resolve_allowed_path(request.args.get("path"))
+    if error:
+        return error
+
+    info = storage.file_stats.get(abs_path)
+    if info is None:
+        return jsonify({"error": "File not found"}), 404
+
+    try:
+        return send_document(abs_path, info, request, max_age=config.FILE_CACHE_MAX_AGE)
+    except OSError as e:
+        # File vanished or changed between the cached stat and the open
+        storage.file_stats.invalidate(abs_path)
+        return jsonify({"error": str(e)}), 404
+    except HTTPException:
+        raise
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@bp.route("/preview")
+def preview():
+    """
+    Lightweight preview of a PDF/DOCX/XLSX under ALLOWED_BASE_PATH.
+    kind=text (default) returns JSON {type, text, html?, thumbnail}; kind=thumb returns the
+    first-page PNG. Responds 202 while the render is still running so the client can retry.
+    """
+    abs_path, error = resolve_allowed_path(request.args.get("path"))
+    if error:
+        return error
+    if not storage.previews.supported(abs_path):
+        return jsonify({"error": "Preview not available for this file type"}), 415
+
+    info = storage.file_stats.get(abs_path)
+    if info is None:
+        return jsonify({"error": "File not found"}), 404
+
+    kind = request.args.get("kind", "text")
+    try:
+        with stage("preview"):
+            key, meta = storage.previews.get(abs_path, info, wait=config.PREVIEW_WAIT_SECONDS)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+    if meta is None:
+        response = jsonify({"pending": True})
+        response.status_code = 202
+        response.headers["Retry-After"] = "1"
+        return response
+
+    if kind == "thumb":
+        thumb = storage.previews.thumbnail_path(key)
+        if thumb is None:
+            return jsonify({"error": "No thumbnail for this file"}), 404
+        response = send_file(thumb, mimetype="image/png", conditional=False, etag=False)
+    else:
+        response = jsonify(meta)
+    # Key changes with mtime/size, so it doubles as a strong validator
+    response.set_etag(f"{key}-{kind}")
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+
+def prefetch_previews(rows):
+    """Queue preview renders for the first few result files; never delays the response."""
+    if config.PREVIEW_PREFETCH <= 0:
+        return
+    items = []
+    for row in rows[:config.PREVIEW_PREFETCH]:
+        filepath = row.get("filepath")
+        if not filepath or not storage.previews.supported(filepath):
+            continue
+        abs_path, error = resolve_allowed_path(filepath)
+        if error:
+            continue
+        info = storage.file_stats.get(abs_path)
+        if info is not None:
+            items.append((abs_path, info))
+    try:
+        storage.previews.prefetch(items)
+    except Exception as exc:
+        log.warning("Preview prefetch failed: %s", exc)
+
+
+def match_reason_plan(sql: str) -> ReasonPlan:
+    """Filtering SQL for Postgres plus the match_reason predicates to evaluate on the returned rows."""
+    return plan(sql) if config.MATCH_REASON_IN_APP else ReasonPlan(sql)
+
+
+def add_match_reasons(reason_plan: ReasonPlan, rows, columns):
+    """Fill match_reason for the returned rows (cached by row id); returns the column list to report."""
+    if not reason_plan.active:
+        return columns
+    with stage("match_reason"):
+        reason_cache.annotate(reason_plan, rows)
+    return columns if "match_reason" in columns else columns + ["match_reason"]
+
+
+def prune_partitions(sql: str, user_query: str) -> str:
+    """Narrow a generated search to the year partitions it can match (see PARTITION_PRUNING)."""
+    if config.PARTITION_PRUNING not in ("date", "intent"):
+        return sql
+    layout = db.partition_layout.get()
+    if layout["key"] != "doc_year" and not layout["split_description"]:
+        return sql
+    years = predicate_years(sql)
+    if years is None and config.PARTITION_PRUNING == "intent":
+        years = (extract_intent(user_query) or {}).get("years")
+    return year_predicate(sql, years) if years else sql
+
+
+def search_key(user_query: str, show_all: bool, filters: dict, workload: str = INTERACTIVE,
+               max_lag: float = None) -> str:
+    """Case- and whitespace-insensitive identity of a search, including its options."""
+    text = " ".join((user_query or "").lower().split())
+    return json.dumps([text, bool(show_all), filters or {}, workload, max_lag], sort_keys=True, default=str)
+
+
+def read_max_lag(data: dict):
+    """{"consistent": true} in a request body means the read must see the primary's latest data."""
+    return 0 if data.get("consistent") else None
+
+
+def run_search(user_query: str, show_all: bool = False, filters=None, route: str = None, tenant: str = None,
+               workload: str = None, max_lag: float = None) -> dict:
+    """
+    Generate SQL for one search (or build it from facet filters alone), run it and return
+    the /query response payload. Shared by /query and /batch-query. A search identical to one
+    already running joins it and returns the same payload (treat it as read-only).
+    Runs in a scheduler slot for tenant: show_all searches count as bulk work unless workload
+    says otherwise. Raises QuotaExceeded when the tenant is out of rows or no slot frees up.
+    max_lag bounds how stale a read replica may be (0 = primary; see db.execute_query).
+    """
+    workload = workload or (BULK if show_all else INTERACTIVE)
+    llm.quotas.rows.check(tenant)
+    with scheduler.slot(tenant, workload):
+        if not config.COALESCE_REQUESTS:
+            payload = _run_search(user_query, show_all, filters, route, workload, max_lag)
+        else:
+            payload, shared = search_flights.do(
+                search_key(user_query, show_all, filters, workload, max_lag),
+                lambda: _run_search(user_query, show_all, filters, route, workload, max_lag),
+            )
+            if shared:
+                COALESCED.inc("search")
+    llm.quotas.rows.charge(tenant, payload.get("returned_count") or 0)
+    # Per tenant, after coalescing: a joined search gets its own snapshot, not the leader's
+    snapshot_id = storage.result_snapshots.save(payload.get("sql"), payload.get("columns"), payload.get("results"),
+                                                tenant=tenant)
+    return dict(payload, snapshot_id=snapshot_id) if snapshot_id else payload
+
+
+def _run_search(user_query: str, show_all: bool, filters, route: str, workload: str = INTERACTIVE,
+                max_lag: float = None) -> dict:
+    filters = filters or {}
+    params = None
+    sql_source = None
+    if user_query:
+        # Generate SQL (cached, or rule-based while the LLM is unavailable)
+        sql_query, sql_source = llm.generate_sql(user_query)
+        executed_sql = sql_query
+
+        if show_all:
+            # Remove LIMIT/OFFSET to fetch full result set when requested
+            executed_sql = re.sub(r"limit\s+\d+(\s+offset\s+\d+)?", "", sql_query, flags=re.IGNORECASE)
+
+        if sql_query.startswith("Error:"):
+            return {
+                "error": sql_query,
+                "sql": None,
+                "results": None,
+            }
+
+        executed_sql = prune_partitions(executed_sql, user_query)
+
+        # Postgres only filters; match_reason is computed below for the rows actually returned
+        reason_plan = match_reason_plan(executed_sql)
+        executed_sql = reason_plan.sql
+
+        if filters:
+            # Facet pre-filters narrow the generated query through the indexed side table
+            executed_sql, params = apply_filters(executed_sql, filters)
+    else:
+        # Facet-only browsing skips the LLM and the text scan entirely
+        executed_sql, params = filter_only_query(filters)
+        reason_plan = ReasonPlan(executed_sql)
+
+    # Execute SQL
+    result = db.execute_query(executed_sql, params, nl_query=user_query or None, route=route, workload=workload,
+                              max_rows=llm.quotas.row_cap(workload), max_lag=max_lag)
+
+    if not result["success"]:
+        return {
+            "error": result["error"],
+            "sql": reason_plan.restore(executed_sql),
+            "results": None,
+        }
+
+    # Format results for display - show ALL results with FULL descriptions
+    results_data = db.rows_to_dicts(result["columns"], result["rows"])
+    columns = add_match_reasons(reason_plan, results_data, result["columns"])
+    record_rows(len(results_data))
+    prefetch_previews(results_data)
+
+    payload = {
+        "sql": reason_plan.restore(result["sql"]),
+        "results": results_data,
+        "total_count": result["count"],
+        "returned_count": len(results_data),
+        "columns": columns,
+        "filters": filters,
+    }
+    if result["truncated"]:
+        payload["truncated"] = True
+    if sql_source in ("stale_cache", "rules"):
+        payload["degraded"] = sql_source
+    return payload
+
+
+@bp.route("/query", methods=["POST"])
+def query():
+    data = request.json or {}
+    user_query = data.get("query", "")
+    show_all = bool(data.get("show_all", False))
+    filters = normalize_filters(data.get("filters"))
+
+    if not user_query and not filters:
+        return jsonify({"error": "No query provided"}), 400
+
+    try:
+        payload = run_search(user_query, show_all, filters, route=request.endpoint, tenant=request_tenant(),
+                             max_lag=read_max_lag(data))
+    except QuotaExceeded as exc:
+        return quota_error(exc, sql=None, results=None)
+
+    with stage("serialize"):
+        return jsonify(payload)
+
+
+@bp.route("/batch-query", methods=["POST"])
+def batch_query():
+    """
+    Run several searches in one call.
+    Body: {"queries": [str | {"query", "filters", "show_all"}], "show_all": bool, "filters": {...}}
+    (top-level show_all/filters apply to every item that does not set its own).
+    SQL generation and execution run concurrently as bulk work, bounded by BATCH_QUERY_WORKERS, the
+    bulk DB pool size and the tenant's concurrency quota, and each result is streamed as one NDJSON line as soon as it finishes:
+    {"index", "query", ...same fields as /query}, followed by {"done": true, ...}.
+    """
+    data = request.json or {}
+    raw_items = data.get("queries")
+    if not isinstance(raw_items, list) or not raw_items:
+        return jsonify({"error": "Provide a non-empty 'queries' list"}), 400
+    if len(raw_items) > config.BATCH_QUERY_MAX:
+        return jsonify({"error": f"At most {config.BATCH_QUERY_MAX} queries per batch"}), 400
+
+    default_show_all = bool(data.get("show_all", False))
+    default_filters = normalize_filters(data.get("filters"))
+    items = []
+    for raw in raw_items:
+        if isinstance(raw, dict):
+            text = str(raw.get("query") or "").strip()
+            filters = normalize_filters(raw["filters"]) if "filters" in raw else default_filters
+            show_all = bool(raw.get("show_all", default_show_all))
+        else:
+            text, filters, show_all = str(raw or "").strip(), default_filters, default_show_all
+        items.append((text, show_all, filters))
+
+    limits = [config.BATCH_QUERY_WORKERS, config.DB_BULK_POOL_MAX, len(items)]
+    if config.QUOTA_CONCURRENT_QUERIES > 0:
+        limits.append(config.QUOTA_CONCURRENT_QUERIES)
+    workers = max(1, min(limits))
+    tenant = request_tenant()
+    started = time.perf_counter()
+    dumps = current_app.json.dumps  # the generator runs after the request context is gone
+
+    def generate():
+        executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="batch-query")
+        failed = 0
+        try:
+            futures = {}
+            for index, (text, show_all, filters) in enumerate(items):
+                if not text and not filters:
+                    failed += 1
+                    yield dumps({"index": index, "query": text, "error": "No query provided", "results": None}) + "\n"
+                    continue
+                futures[executor.submit(run_search, text, show_all, filters, None, tenant, BULK)] = (index, text)
+
+            for future in as_completed(futures):
+                index, text = futures[future]
+                try:
+                    payload = future.result()
+                except Exception as e:
+                    payload = {"error": str(e), "sql": None, "results": None}
+                if payload.get("error"):
+                    failed += 1
+                yield dumps({"index": index, "query": text, **payload}) + "\n"
+
+            yield dumps(
+                {
+                    "done": True,
+                    "count": len(items),
+                    "failed": failed,
+                    "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+                }
+            ) + "\n"
+        finally:
+            # Client disconnects close the generator: drop searches that have not started yet
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    return Response(generate(), mimetype="application/x-ndjson", headers={"X-Accel-Buffering": "no"})
+
+
+@bp.route("/facets")
+def facets():
+    """
+    Precomputed document counts per canonical company, category and year.
+    """
+    try:
+        return jsonify({"facets": db.facet_store.counts(), "indexer": db.indexer.status()})
+    except Exception as e:
+        return jsonify({"error": str(e), "facets": None}), 500
+
+
+@bp.route("/slow-queries")
+def slow_queries():
+    """
+    Worst slow queries seen so far (by max duration), with their EXPLAIN (ANALYZE, BUFFERS) plans.
+    """
+    limit = request.args.get("limit", default=20, type=int)
+    return jsonify({"threshold_ms": db.slow_query_log.threshold_ms, "queries": db.slow_query_log.worst(limit)})
+
+
+@bp.route("/run-sql", methods=["POST"])
+@scheduled(INTERACTIVE)
+def run_sql():
+    """
+    Execute a raw SQL query directly (for re-running queries from chat history).
+    Runs on a read replica when one is available, unless the body sets "consistent": true.
+    """
+    data = request.json or {}
+    sql_query = data.get("sql", "")
+
+    if not sql_query:
+        return jsonify({"error": "No SQL query provided"}), 400
+
+    # Basic validation - only allow SELECT queries
+    if not sql_query.strip().upper().startswith("SELECT"):
+        return jsonify({"error": "Only SELECT queries are allowed"}), 400
+
+    # Execute SQL
+    tenant = request_tenant()
+    llm.quotas.rows.check(tenant)
+    reason_plan = match_reason_plan(sql_query)
+    result = db.execute_query(reason_plan.sql, route=request.endpoint, max_rows=llm.quotas.row_cap(INTERACTIVE),
+                              max_lag=read_max_lag(data))
+
+    if not result["success"]:
+        return jsonify(
+            {
+                "error": result["error"],
+                "sql": sql_query,
+                "results": [],
+            }
+        )
+
+    # Format results for display
+    results_data = db.rows_to_dicts(result["columns"], result["rows"])
+    columns = add_match_reasons(reason_plan, results_data, result["columns"])
+    record_rows(len(results_data))
+    llm.quotas.rows.charge(tenant, len(results_data))
+    prefetch_previews(results_data)
+    snapshot_id = storage.result_snapshots.save(sql_query, columns, results_data, tenant=tenant)
+
+    with stage("serialize"):
+        return jsonify(
+            {
+                "sql": sql_query,
+                "results": results_data,
+                "total_count": result["count"],
+                "returned_count": len(results_data),
+                "columns": columns,
+                "truncated": result["truncated"],
+                "snapshot_id": snapshot_id,
+            }
+        )
+
+
+def quote_ident(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+@bp.route("/snapshots/<snapshot_id>")
+@scheduled(INTERACTIVE)
+def snapshot(snapshot_id):
+    """
+    Rows of a saved result read back by primary key, in their original order, for reopening chat
+    history without re-running its SQL. Rows are as they are now; deleted ones are skipped.
+    404 once the snapshot has expired or when it belongs to another tenant, 409 when its columns cannot be read back by id (the
+    client re-runs the SQL instead).
+    """
+    tenant = request_tenant()
+    saved = storage.result_snapshots.load(snapshot_id, tenant=tenant)
+    if saved is None:
+        return jsonify({"error": "Snapshot not found or expired", "snapshot_id": snapshot_id}), 404
+
+    llm.quotas.rows.check(tenant)
+    ids = saved["ids"][:llm.quotas.row_cap(INTERACTIVE) or None]
+    read_columns = ["id"] + [c for c in saved["columns"] if c not in ("id", "match_reason")]
+    result = db.execute_query(
+        f"SELECT {', '.join(quote_ident(c) for c in read_columns)} FROM uml_temp WHERE id = ANY(%s)",
+        (ids,), route=request.endpoint,
+    )
+    if not result["success"]:
+        return jsonify({"error": result["error"], "sql": saved["sql"], "snapshot_id": snapshot_id}), 409
+
+    position = {row_id: index for index, row_id in enumerate(ids)}
+    results_data = sorted(db.rows_to_dicts(result["columns"], result["rows"]), key=lambda row: position[row["id"]])
+    columns = add_match_reasons(match_reason_plan(saved["sql"]), results_data, saved["columns"])
+    record_rows(len(results_data))
+    llm.quotas.rows.charge(tenant, len(results_data))
+    prefetch_previews(results_data)
+
+    with stage("serialize"):
+        return jsonify(
+            {
+                "sql": saved["sql"],
+                "results": results_data,
+                "total_count": len(saved["ids"]),
+                "returned_count": len(results_data),
+                "columns": columns,
+                "truncated": len(ids) < len(saved["ids"]),
+                "missing": len(ids) - len(results_data),
+                "snapshot_id": snapshot_id,
+                "snapshot_at": datetime.fromtimestamp(saved["created_at"], timezone.utc).isoformat(),
+            }
+        )
+
+
+def chat_error(exc: Exception, conversation_id: str):
+    """
+    Error response for a failed chat call: 503 + Retry-After while the LLM circuit is open,
+    429/503 + Retry-After when the tenant is over quota or no slot freed up, else 500.
+    """
+    if isinstance(exc, QuotaExceeded):
+        return quota_error(exc, success=False, conversation_id=conversation_id)
+    body = jsonify({"success": False, "error": str(exc), "conversation_id": conversation_id})
+    if isinstance(exc, CircuitOpenError):
+        body.headers["Retry-After"] = str(int(exc.retry_after + 0.999))
+        return body, 503
+    return body, 500
+
+
+@bp.route("/summary-chat", methods=["POST"])
+@scheduled(INTERACTIVE)
+def summary_chat():
+    """
+    SUMMARY mode: Chat with documents using their description content.
+    Supports multiple files and conversation memory.
+    """
+    data = request.json or {}
+    files = data.get("files", [])  # Array of {filename, description, ...}
+    user_message = data.get("message", "")
+    conversation_id = data.get("conversation_id", "")
+
+    if not files or not user_message:
+        return jsonify({"error": "Missing files or message"}), 400
+
+    # Generate conversation ID if not provided
+    if not conversation_id:
+        conversation_id = f"conv_{datetime.utcnow().strftime('%Y%m%d%H%M%S')}_{os.urandom(4).hex()}"
+
+    # Load existing conversation or create new
+    with stage("conv_load"):
+        conversation = storage.load_summary_conversation(conversation_id)
+    if not conversation:
+        conversation = {
+            "id": conversation_id,
+            "created_at": datetime.utcnow().isoformat(),
+            "files": files,
+            "messages": []
+        }
+
+    total_chars = sum(len(f.get("description") or "") for f in files)
+    compact = len(files) >= config.SUMMARY_COMPACT_MIN_FILES or total_chars >= config.SUMMARY_COMPACT_MIN_CHARS
+    if compact:
+        # Start from cached per-document summaries; full text only where the question needs it
+        with stage("doc_summaries"):
+            summaries = llm.doc_summarizer.summaries(files)
+        raw = raw_text_needed(files, user_message, config.SUMMARY_RAW_BUDGET_CHARS)
+    elif not conversation["messages"]:
+        # Small selections go in verbatim; count the opens (once per conversation) so documents
+        # that keep being opened are summarised in the background for later, larger conversations
+        llm.doc_summarizer.prefetch(files)
+
+    # Build document context from all files
+    doc_context_parts = []
+    for i, f in enumerate(files, 1):
+        filename = f.get("filename", f"Document {i}")
+        description = f.get("description", "No content available")
+        if compact and (i - 1) not in raw:
+            doc_context_parts.append(f"=== Document {i}: {filename} (summary) ===\n{summaries[i - 1]}")
+        else:
+            doc_context_parts.append(f"=== Document {i}: {filename} ===\n{description}")
+
+    documents_context = "\n\n".join(doc_context_parts)
+    intro = "Here are the documents to analyze"
+    if compact:
+        intro += " (cached summaries with key facts; full text is included where marked without \"summary\")"
+
+    # Build messages for OpenAI (include conversation history)
+    messages = [
+        {"role": "system", "content": SUMMARY_SYSTEM_PROMPT},
+        {"role": "user", "content": f"{intro}:\n\n{documents_context}"}
+    ]
+
+    # Add conversation history
+    for msg in conversation["messages"]:
+        messages.append({"role": msg["role"], "content": msg["content"]})
+
+    # Add current user message
+    messages.append({"role": "user", "content": user_message})
+
+    try:
+        with stage("llm"):
+            response = llm.resilient_client.chat.completions.create(
+                model="gpt-4o-mini",
+                messages=messages,
+                temperature=0.3,
+                max_tokens=2000,
+            )
+        record_tokens("summary", getattr(response, "usage", None))
+
+        assistant_response = response.choices[0].message.content.strip()
+
+        # Update conversation with new messages
+        conversation["messages"].append({
+            "role": "user",
+            "content": user_message,
+            "timestamp": datetime.utcnow().isoformat()
+        })
+        conversation["messages"].append({
+            "role": "assistant",
+            "content": assistant_response,
+            "timestamp": datetime.utcnow().isoformat()
+        })
+        conversation["updated_at"] = datetime.utcnow().isoformat()
+
+        # Save conversation
+        with stage("conv_save"):
+            storage.save_summary_conversation(conversation_id, conversation)
+
+        return jsonify({
+            "success": True,
+            "conversation_id": conversation_id,
+            "response": assistant_response,
+            "messages": conversation["messages"]
+        })
+
+    except Exception as e:
+        return chat_error(e, conversation_id)
+
+
+def new_analyse_conversation_id() -> str:
+    return f"analyse_{datetime.utcnow().strftime('%Y%m%d%H%M%S')}_{os.urandom(4).hex()}"
+
+
+def run_analysis(payload: dict, progress=None) -> dict:
+    """
+    ANALYSE mode worker: build the prompt from the files, call the model, parse the
+    charts/tables JSON and append the exchange to the stored conversation.
+    Runs inline for synchronous /analyse-chat calls and on the job queue otherwise.
+    """
+    progress = progress or (lambda fraction, message=None: None)
+    files = payload.get("files", [])
+    user_message = payload.get("message", "")
+    conversation_id = payload.get("conversation_id") or new_analyse_conversation_id()
+
+    # Load existing conversation or create new
+    with stage("conv_load"):
+        conversation = storage.load_analyse_conversation(conversation_id)
+    if not conversation:
+        conversation = {
+            "id": conversation_id,
+            "created_at": datetime.utcnow().isoformat(),
+            "files": files,
+            "messages": []
+        }
+
+    total_chars = sum(len(f.get("description") or "") for f in files)
+    if len(files) >= config.ANALYSE_MAP_MIN_FILES or total_chars >= config.ANALYSE_MAP_MIN_CHARS:
+        # Map: extract compact facts per document in parallel (cached), then reduce over the facts
+        progress(0.05, f"Extracting facts from {len(files)} documents")
+        facts = llm.map_reduce.extract(
+            files, lambda done, total: progress(0.05 + 0.75 * done / max(total, 1), f"Extracted {done}/{total} documents")
+        )
+        documents_context = facts_context(files, facts)
+        context_label = "Facts extracted from each document (JSON)"
+    else:
+        # Build document context from all files
+        doc_context_parts = []
+        for i, f in enumerate(files, 1):
+            filename = f.get("filename", f"Document {i}")
+            description = f.get("description", "No content available")
+            category = f.get("category", "Unknown")
+            doc_context_parts.append(f"=== Document {i}: {filename} (Category: {category}) ===\n{description}")
+
+        documents_context = "\n\n".join(doc_context_parts)
+        context_label = "Documents to analyze"
+        facts = None
+
+    # Build the analysis request
+    analysis_request = user_message if user_message else "Analyze these documents and provide insights with visualizations."
+
+    # Questions about counts or amounts by time, company or category are charted locally (exact counts,
+    # estimated amounts) and the model only writes the narrative; anything else keeps the model's charts
+    with stage("aggregate"):
+        aggregates = build_aggregates(files, facts, user_message)
+
+    # Build messages for OpenAI
+    if aggregates["charts"]:
+        computed = json.dumps(aggregates["summary"], ensure_ascii=False)
+        estimated = ""
+        if aggregates["estimates"]:
+            estimated = ("\n\nEstimated amounts (heuristic: largest amount found per document; call them estimates): "
+                         + json.dumps(aggregates["estimates"], ensure_ascii=False))
+        messages = [
+            {"role": "system", "content": ANALYSE_NARRATIVE_PROMPT},
+            {"role": "user", "content": f"{context_label}:\n\n{documents_context}\n\nComputed aggregates (exact): {computed}{estimated}\n\nAnalysis request: {analysis_request}"}
+        ]
+    else:
+        messages = [
+            {"role": "system", "content": ANALYSE_SYSTEM_PROMPT},
+            {"role": "user", "content": f"{context_label}:\n\n{documents_context}\n\nAnalysis request: {analysis_request}"}
+        ]
+
+    # Add conversation history for follow-up
+    for msg in conversation["messages"]:
+        messages.append({"role": msg["role"], "content": msg["content"]})
+
+    progress(0.8, f"Analysing {len(files)} document{'s' if len(files) != 1 else ''}")
+    with stage("llm"):
+        response = llm.resilient_client.chat.completions.create(
+            model="gpt-4o-mini",
+            messages=messages,
+            temperature=0.3,
+            max_tokens=1500 if aggregates["charts"] else 3000,
+        )
+    record_tokens("analyse", getattr(response, "usage", None))
+    progress(0.9, "Saving analysis")
+
+    assistant_response = response.choices[0].message.content.strip()
+
+    # Try to parse as JSON
+    analysis_data = None
+    try:
+        # Remove markdown code blocks if present
+        clean_response = assistant_response
+        if clean_response.startswith("```"):
+            clean_response = re.sub(r'^```\w*\n?', '', clean_response)
+            clean_response = re.sub(r'\n?```$', '', clean_response)
+        analysis_data = json.loads(clean_response)
+    except json.JSONDecodeError:
+        # If not valid JSON, wrap in a basic structure
+        analysis_data = {
+            "analysis_text": assistant_response,
+            "charts": [],
+            "tables": [],
+            "key_findings": []
+        }
+
+    if aggregates["charts"]:
+        # Numbers always come from the local aggregation, never from the model
+        analysis_data = {
+            "analysis_text": analysis_data.get("analysis_text", ""),
+            "charts": aggregates["charts"],
+            "tables": aggregates["tables"] + [t for t in analysis_data.get("tables") or [] if isinstance(t, dict)],
+            "key_findings": analysis_data.get("key_findings") or [],
+        }
+
+    # Update conversation
+    conversation["messages"].append({
+        "role": "user",
+        "content": analysis_request,
+        "timestamp": datetime.utcnow().isoformat()
+    })
+    conversation["messages"].append({
+        "role": "assistant",
+        "content": json.dumps(analysis_data),
+        "timestamp": datetime.utcnow().isoformat()
+    })
+    conversation["updated_at"] = datetime.utcnow().isoformat()
+
+    # Save conversation
+    with stage("conv_save"):
+        storage.save_analyse_conversation(conversation_id, conversation)
+
+    return {
+        "success": True,
+        "conversation_id": conversation_id,
+        "analysis": analysis_data,
+        "messages": conversation["messages"]
+    }
+
+
+def run_analysis_job(payload: dict, progress=None) -> dict:
+    """Job-queue handler: waits (as long as it takes) for a bulk slot for the submitting tenant, then analyses."""
+    progress = progress or (lambda fraction, message=None: None)
+    progress(0.0, "Waiting for a free analysis slot")
+    with scheduler.slot(payload.get("tenant"), BULK, timeout=float("inf")):
+        return run_analysis(payload, progress)
+
+
+def analyse_dedup_key(files, user_message: str, conversation_id: str) -> str:
+    """Identical resubmissions (same files, question and conversation state) share one job."""
+    history = 0
+    if conversation_id:
+        conversation = storage.load_analyse_conversation(conversation_id)
+        history = len(conversation["messages"]) if conversation else 0
+    digest = hashlib.sha1()
+    for value in (user_message, conversation_id, str(history)):
+        digest.update(value.encode("utf-8") + b"\0")
+    for f in files:
+        for field in ("filename", "category", "description"):
+            digest.update(str(f.get(field) or "").encode("utf-8") + b"\0")
+    return digest.hexdigest()
+
+
+@bp.route("/analyse-chat", methods=["POST"])
+def analyse_chat():
+    """
+    ANALYSE mode: Analyze documents and generate visualizations.
+    Returns structured data for charts and tables.
+    With "async": true the analysis is queued as a background job and the response is
+    202 {job_id, conversation_id}; poll /jobs/<job_id> for progress and the result.
+    Analyses are bulk work: they queue behind interactive searches in the fair scheduler.
+    """
+    data = request.json or {}
+    files = data.get("files", [])
+    user_message = data.get("message", "")
+    conversation_id = data.get("conversation_id", "")
+
+    if not files:
+        return jsonify({"error": "No files provided for analysis"}), 400
+
+    if data.get("async"):
+        dedup_key = analyse_dedup_key(files, user_message, conversation_id)
+        conversation_id = conversation_id or new_analyse_conversation_id()
+        job, created = storage.job_queue.submit(
+            "analyse",
+            {"files": files, "message": user_message, "conversation_id": conversation_id, "tenant": request_tenant()},
+            dedup_key=dedup_key,
+            meta={"conversation_id": conversation_id},
+        )
+        return jsonify({
+            "job_id": job["id"],
+            "status": job["status"],
+            "deduplicated": not created,
+            "conversation_id": job["meta"].get("conversation_id", conversation_id),
+        }), 202
+
+    # Generate conversation ID if not provided
+    if not conversation_id:
+        conversation_id = new_analyse_conversation_id()
+
+    try:
+        with scheduler.slot(request_tenant(), BULK):
+            return jsonify(run_analysis({"files": files, "message": user_message, "conversation_id": conversation_id}))
+    except Exception as e:
+        return chat_error(e, conversation_id)
+
+
+@bp.route("/jobs/<job_id>")
+def job_status(job_id: str):
+    """Background job status: {id, status, progress, message, meta, result?, error?}."""
+    job = storage.job_queue.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    response = jsonify(job)
+    response.cache_control.no_store = True
+    return response
+
+
+@bp.route("/healthz")
+def healthz():
+    """
+    Liveness only: the process is up and serving. Never touches the database.
+    """
+    return jsonify({"status": "alive"})
+
+
+@bp.route("/health")
+def health():
+    """
+    Readiness: cached database probe with an approximate record count, plus indexer lag,
+    NL->SQL cache hit rate, the LLM circuit breaker state, scheduler occupancy and, when
+    read replicas are configured, their health and replication lag.
+    """
+    payload, status_code = db.health_monitor.check()
+    return jsonify({
+        **payload,
+        "indexer": db.indexer.status(),
+        "sql_cache": llm.sql_cache.stats(),
+        "llm": llm.breaker.stats(),
+        "workload": scheduler.stats(),
+        **({"replicas": db.replica_router.stats()} if db.replica_router.enabled else {}),
+    }), status_code
+
+
+@bp.route("/quota")
+def quota():
+    """The requesting tenant's budget usage in the current window and the per-request row caps."""
+    tenant = request_tenant()
+    response = jsonify({
+        "tenant": tenant,
+        **llm.quotas.usage(tenant),
+        "max_rows": {workload: llm.quotas.row_cap(workload) for workload in (INTERACTIVE, BULK)},
+        "concurrent_queries": config.QUOTA_CONCURRENT_QUERIES or None,
+    })
+    response.cache_control.no_store = True
+    return response
+
+
+@bp.route("/<path:path>")
+def spa(path: str):
+    """
+    Serve files from frontend/dist with SPA fallback to index.html.
+    Unknown paths fall back to the built index.
+    """
+    response = static_assets.serve(path, request) or static_assets.serve("index.html", request)
+    if response is None:
+        return FRONTEND_MISSING, 500
+    return response
+
+
+@bp.post("/save-chats")
+def save_chats():
+    """
+    Persist chat conversations to TEMP_STORAGE as JSON.
+    """
+    payload = request.get_json(silent=True) or {}
+    chats = payload.get("chats")
+    if not isinstance(chats, list):
+        return jsonify({"error": "Invalid payload; 'chats' must be a list."}), 400
+
+    try:
+        with stage("conv_save"):
+            file_path = storage.save_chats(chats)
+        return jsonify({"saved": True, "file": file_path.name, "path": str(file_path)})
+    except Exception as exc:
+        return jsonify({"error": str(exc)}), 500
+
+
+@bp.get("/chats")
+def list_chats():
+    """
+    Return all stored chats from TEMP_STORAGE (merged list).
+    """
+    with stage("conv_load"):
+        return jsonify({"chats": storage.load_chats()})
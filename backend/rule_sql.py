@@ -0,0 +1,86 @@
+# rule_sql.py - deterministic NL->SQL from the parsed search intent, used when the LLM is unavailable
+from normalize import CATEGORY_ALIASES, COMPANY_ALIASES
+from sql_cache import LOGIC_WORDS, MONTH_NAMES
+
+# Exclusions can only be expressed by the model; every rule-based group is a positive match
+NEGATION_WORDS = {"not", "no", "without", "except", "exclude", "excluding", "never", "nor"}
+
+
+def _quote(value: str) -> str:
+    return value.replace("'", "''")
+
+
+def _like(value: str) -> str:
+    """value as the body of an ILIKE '%...%' literal: wildcards and the escape character match literally."""
+    return _quote(value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_"))
+
+
+def _month_pattern(months) -> str:
+    names = [name for month in months for name in sorted(MONTH_NAMES[month], key=len, reverse=True)]
+    return "(" + "|".join(names) + ")"
+
+
+def rule_based_sql(intent: dict):
+    """
+    SQL in the shape SYSTEM_PROMPT asks for (OR groups over every alias, AND between groups,
+    plus a match_reason column) built from extract_intent() output. Broad by design, like the
+    prompt's own guidance. None when the intent has nothing to search on, or asks to exclude
+    something ("reports not from Siemens"), which these positive groups would invert.
+    """
+    if not intent or any(t in NEGATION_WORDS or t.endswith("n't") for t in intent["terms"]):
+        return None
+    groups, reasons = [], []
+
+    def add_group(conditions):
+        groups.append("(" + " OR ".join(cond for cond, _ in conditions) + ")")
+        reasons.extend(f"CASE WHEN {cond} THEN '{_quote(label)}' END" for cond, label in conditions)
+
+    if intent["companies"]:
+        conditions = []
+        for company in intent["companies"]:
+            for alias in dict.fromkeys([company.lower()] + COMPANY_ALIASES[company]):
+                conditions.append((f"company ILIKE '%{_like(alias)}%'", f"Company: {alias}"))
+            conditions.append((f"description ILIKE '%{_like(company)}%'", f"Description: {company}"))
+        add_group(conditions)
+
+    if intent["categories"]:
+        conditions = []
+        for category in intent["categories"]:
+            for alias in CATEGORY_ALIASES[category]:
+                conditions.append((f"category ILIKE '%{_like(alias)}%'", f"Category: {alias}"))
+                if len(alias) > 4:
+                    conditions.append((f"description ILIKE '%{_like(alias)}%'", f"Description: {alias}"))
+        add_group(conditions)
+
+    years, months = intent["years"], intent["months"]
+    if years or months:
+        if months and years:
+            pattern = f"{_month_pattern(months)}[^0-9]*({'|'.join(years)})"
+        elif months:
+            pattern = _month_pattern(months)
+        else:
+            pattern = "|".join(years)
+        label = " ".join(filter(None, [" / ".join(MONTH_NAMES[m][0] for m in months), " / ".join(years)]))
+        add_group([
+            (f"date ~* '{pattern}'", f"Date field: {label}"),
+            (f"description ~* '{pattern}'", f"Description: {label}"),
+        ])
+
+    terms = [t for t in intent["terms"] if t not in LOGIC_WORDS and len(t) > 1]
+    if terms:
+        conditions = []
+        for term in terms:
+            like = _like(term)
+            conditions += [
+                (f"description ILIKE '%{like}%'", f"Description: {term}"),
+                (f"filename ILIKE '%{like}%'", f"Filename: {term}"),
+                (f"name ILIKE '%{like}%'", f"Name field: {term}"),
+            ]
+        add_group(conditions)
+
+    if not groups:
+        return None
+    return (
+        "SELECT *,\n  CONCAT_WS(' | ',\n    " + ",\n    ".join(reasons) + "\n  ) as match_reason\n"
+        "FROM uml_temp\nWHERE " + "\n  AND ".join(groups)
+    )
@@ -0,0 +1,46 @@
+# serve.py - production entry point (gunicorn on Linux/macOS, waitress on Windows)
+import os
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent
+
+
+def serve_gunicorn():
+    from gunicorn.app.base import Application
+
+    class DashboardApplication(Application):
+        def init(self, parser, opts, args):
+            return None
+
+        def load_config(self):
+            self.load_config_from_file(str(BACKEND_DIR / "gunicorn.conf.py"))
+
+        def load(self):
+            from app import app
+
+            return app
+
+    DashboardApplication().run()
+
+
+def serve_waitress():
+    # Windows has no fork(): one process, many threads
+    from waitress import serve
+
+    import app as dashboard
+
+    dashboard.init_worker(warm_up=os.getenv("WEB_WARM_UP", "1") == "1")
+    host, _, port = os.getenv("BIND", "0.0.0.0:5000").rpartition(":")
+    try:
+        serve(dashboard.app, host=host or "0.0.0.0", port=int(port), threads=int(os.getenv("WEB_THREADS", "16")))
+    finally:
+        dashboard.shutdown_worker()
+
+
+if __name__ == "__main__":
+    sys.path.insert(0, str(BACKEND_DIR))
+    if os.name == "nt":
+        serve_waitress()
+    else:
+        serve_gunicorn()
@@ -0,0 +1,164 @@
+# slow_queries.py - records slow generated SQL with its EXPLAIN (ANALYZE, BUFFERS) plan
+import hashlib
+import json
+import logging
+import queue
+import threading
+from datetime import datetime
+
+log = logging.getLogger(__name__)
+
+
+def fingerprint(sql: str) -> str:
+    return hashlib.sha1(" ".join(sql.split()).lower().encode("utf-8")).hexdigest()[:16]
+
+
+class SlowQueryLog:
+    """
+    Keeps the worst slow queries (one entry per SQL fingerprint) in memory and in a local
+    JSONL file, including statements that failed or were cancelled by statement_timeout
+    after running past the threshold (those get a plain EXPLAIN, since ANALYZE would only
+    run into the same timeout). Plans are captured on a single background thread inside a READ ONLY
+    transaction with a statement_timeout, so the request that was slow is not delayed
+    further and a burst of slow searches cannot stack up EXPLAIN runs.
+    """
+
+    def __init__(self, connect, path, threshold_ms: float = 1000.0, max_entries: int = 200,
+                 explain_timeout_ms: int = 60000):
+        self._connect = connect
+        self.path = path
+        self.threshold_ms = threshold_ms
+        self.max_entries = max_entries
+        self.explain_timeout_ms = explain_timeout_ms
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._queue = queue.Queue(maxsize=16)
+        self._worker = None
+        self._lines_written = 0
+        self._load()
+
+    def _load(self):
+        if not self.path.exists():
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    entry = json.loads(line)
+                    self._entries[entry["fingerprint"]] = entry
+                    self._lines_written += 1
+        except Exception as exc:
+            log.warning("could not load slow query log %s: %s", self.path, exc)
+        self._trim()
+
+    def _trim(self):
+        if len(self._entries) <= self.max_entries:
+            return
+        keep = sorted(self._entries.values(), key=lambda e: e["max_duration_ms"], reverse=True)
+        self._entries = {e["fingerprint"]: e for e in keep[: self.max_entries]}
+
+    def _persist(self, entry):
+        """Append the updated entry; compact the file once it holds many superseded lines."""
+        self.path.parent.mkdir(exist_ok=True)
+        if self._lines_written > 4 * self.max_entries:
+            tmp = self.path.with_suffix(".tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                for e in self._entries.values():
+                    f.write(json.dumps(e, ensure_ascii=False, default=str) + "\n")
+            tmp.replace(self.path)
+            self._lines_written = len(self._entries)
+            return
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False, default=str) + "\n")
+        self._lines_written += 1
+
+    def record(self, sql: str, duration_ms: float, row_count: int, nl_query: str = None, route: str = None,
+               error: str = None):
+        """Called after every execution (error: why it failed); ignores anything under the threshold."""
+        if duration_ms < self.threshold_ms:
+            return
+        key = fingerprint(sql)
+        now = datetime.utcnow().isoformat()
+        with self._lock:
+            entry = self._entries.get(key)
+            needs_plan = entry is None or not entry.get("plan")
+            if entry is None:
+                entry = self._entries[key] = {
+                    "fingerprint": key,
+                    "sql": sql,
+                    "nl_query": nl_query,
+                    "route": route,
+                    "count": 0,
+                    "max_duration_ms": 0.0,
+                    "first_seen": now,
+                    "plan": None,
+                    "plan_duration_ms": None,
+                }
+            entry["count"] += 1
+            entry["last_seen"] = now
+            entry["last_duration_ms"] = round(duration_ms, 1)
+            entry["max_duration_ms"] = round(max(entry["max_duration_ms"], duration_ms), 1)
+            entry["row_count"] = row_count
+            entry["error"] = error
+            if error:
+                entry["errors"] = entry.get("errors", 0) + 1
+            if nl_query:
+                entry["nl_query"] = nl_query
+            self._trim()
+            self._persist(entry)
+        if error:
+            log.warning("slow query failed after %.0fms (%s): %s", duration_ms, error.strip()[:200],
+                        nl_query or sql[:200])
+        else:
+            log.warning("slow query %.0fms (%s rows): %s", duration_ms, row_count, nl_query or sql[:200])
+        if needs_plan:
+            self._enqueue_explain(key, sql, analyze=not error)
+
+    def _enqueue_explain(self, key, sql, analyze: bool = True):
+        if not sql.lstrip().upper().startswith(("SELECT", "WITH")):
+            return
+        try:
+            self._queue.put_nowait((key, sql, analyze))
+        except queue.Full:
+            return
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._explain_loop, name="slow-query-explain", daemon=True)
+            self._worker.start()
+
+    def _explain_loop(self):
+        while True:
+            key, sql, analyze = self._queue.get()
+            try:
+                plan, plan_ms = self._explain(sql, analyze)
+            except Exception as exc:
+                plan, plan_ms = f"EXPLAIN failed: {exc}", None
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    entry["plan"] = plan
+                    entry["plan_duration_ms"] = plan_ms
+                    self._persist(entry)
+
+    def _explain(self, sql, analyze: bool = True):
+        conn = self._connect()
+        try:
+            conn.set_session(readonly=True)
+            with conn, conn.cursor() as cur:
+                cur.execute("SET LOCAL statement_timeout = %s", (self.explain_timeout_ms,))
+                options = "ANALYZE, BUFFERS, FORMAT TEXT" if analyze else "FORMAT TEXT"
+                cur.execute(f"EXPLAIN ({options}) " + sql.strip().rstrip(";"))
+                lines = [row[0] for row in cur.fetchall()]
+        finally:
+            conn.close()
+        plan_ms = None
+        for line in lines:
+            if line.startswith("Execution Time:"):
+                plan_ms = float(line.split(":")[1].strip().split()[0])
+        return "\n".join(lines), plan_ms
+
+    def worst(self, limit: int = 20) -> list:
+        with self._lock:
+            entries = sorted(self._entries.values(), key=lambda e: e["max_duration_ms"], reverse=True)
+            return [dict(e) for e in entries[:limit]]
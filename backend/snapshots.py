@@ -0,0 +1,157 @@
+# snapshots.py - compact result snapshots (ordered row ids) so reopened chats rehydrate by primary key
+import hashlib
+import itertools
+import json
+import logging
+import sqlite3
+import sys
+import threading
+import time
+import zlib
+from array import array
+
+log = logging.getLogger(__name__)
+
+
+def encode_ids(ids) -> bytes:
+    """Ordered ids as zlib-compressed little-endian int64 deltas (sorted runs compress to almost nothing)."""
+    deltas = array("q", (b - a for a, b in zip(itertools.chain((0,), ids), ids)))
+    if sys.byteorder == "big":
+        deltas.byteswap()
+    return zlib.compress(deltas.tobytes(), 6)
+
+
+def decode_ids(blob: bytes) -> list:
+    deltas = array("q")
+    deltas.frombytes(zlib.decompress(blob))
+    if sys.byteorder == "big":
+        deltas.byteswap()
+    return list(itertools.accumulate(deltas))
+
+
+class SnapshotStore:
+    """
+    The rows a search or SQL run returned, kept as their ordered ids plus the columns shown and the
+    SQL that produced them, in a local SQLite file. Reopening a chat reads those rows back by id
+    instead of re-running the query. A snapshot belongs to the tenant that saved it and is only
+    loaded for that tenant; identical results of one tenant share one snapshot. Snapshots expire after
+    `ttl` seconds, results over `max_ids` rows are not kept, and the oldest snapshots are dropped
+    once the file holds more than `max_bytes` of id data.
+    """
+
+    def __init__(self, path, ttl: float = 30 * 86400.0, max_ids: int = 100000, max_bytes: int = 64 * 1024 * 1024,
+                 purge_interval: float = 60.0):
+        self.path = path
+        self.ttl = ttl
+        self.max_ids = max_ids
+        self.max_bytes = max_bytes
+        self.purge_interval = purge_interval
+        self._lock = threading.Lock()
+        self._schema_ready = False
+        self._purged_at = 0.0
+
+    def _connect(self):
+        conn = sqlite3.connect(str(self.path), timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def ensure_schema(self):
+        if self._schema_ready:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = self._connect()
+        try:
+            conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS snapshots (
+                    id TEXT PRIMARY KEY,
+                    tenant TEXT NOT NULL DEFAULT '',
+                    sql TEXT NOT NULL,
+                    columns TEXT NOT NULL,
+                    ids BLOB NOT NULL,
+                    row_count INTEGER NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    expires_at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS snapshots_expiry_idx ON snapshots (expires_at);
+                CREATE INDEX IF NOT EXISTS snapshots_created_idx ON snapshots (created_at);
+                """
+            )
+            # Files from before snapshots were per tenant: their rows keep tenant '' and match no one
+            if "tenant" not in {row[1] for row in conn.execute("PRAGMA table_info(snapshots)")}:
+                conn.execute("ALTER TABLE snapshots ADD COLUMN tenant TEXT NOT NULL DEFAULT ''")
+        finally:
+            conn.close()
+        self._schema_ready = True
+
+    def save(self, sql: str, columns, rows, tenant: str = None):
+        """
+        Snapshot result rows (dicts with an integer "id") for tenant; returns the snapshot id, or
+        None when the result has no row ids, is over max_ids, or could not be stored.
+        """
+        if self.ttl <= 0 or not rows or len(rows) > self.max_ids or "id" not in columns:
+            return None
+        ids = [row.get("id") for row in rows]
+        if not all(isinstance(row_id, int) and not isinstance(row_id, bool) for row_id in ids):
+            return None
+        blob = encode_ids(ids)
+        tenant = tenant or ""
+        snapshot_id = hashlib.sha1(f"{tenant}\0{sql}\0".encode("utf-8") + blob).hexdigest()[:24]
+        now = time.time()
+        try:
+            self.ensure_schema()
+            conn = self._connect()
+            try:
+                conn.execute(
+                    """
+                    INSERT INTO snapshots (id, tenant, sql, columns, ids, row_count, size, created_at, expires_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (id) DO UPDATE SET created_at = excluded.created_at, expires_at = excluded.expires_at
+                    """,
+                    (snapshot_id, tenant, sql, json.dumps(list(columns)), blob, len(ids), len(blob), now, now + self.ttl),
+                )
+                self._purge(conn, now)
+            finally:
+                conn.close()
+        except sqlite3.Error as exc:
+            log.warning("Could not save result snapshot: %s", exc)
+            return None
+        return snapshot_id
+
+    def load(self, snapshot_id: str, tenant: str = None):
+        """{"sql", "columns", "ids", "created_at"} of a live snapshot saved by tenant, or None."""
+        try:
+            self.ensure_schema()
+            conn = self._connect()
+            try:
+                row = conn.execute(
+                    "SELECT sql, columns, ids, created_at FROM snapshots WHERE id = ? AND tenant = ? AND expires_at > ?",
+                    (snapshot_id, tenant or "", time.time()),
+                ).fetchone()
+            finally:
+                conn.close()
+        except sqlite3.Error as exc:
+            log.warning("Could not read result snapshot %s: %s", snapshot_id, exc)
+            return None
+        if row is None:
+            return None
+        return {"sql": row[0], "columns": json.loads(row[1]), "ids": decode_ids(row[2]), "created_at": row[3]}
+
+    def _purge(self, conn, now: float):
+        with self._lock:
+            if now - self._purged_at < self.purge_interval:
+                return
+            self._purged_at = now
+        conn.execute("DELETE FROM snapshots WHERE expires_at <= ?", (now,))
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM snapshots").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        doomed = []
+        for snapshot_id, size in conn.execute("SELECT id, size FROM snapshots ORDER BY created_at").fetchall():
+            if total <= self.max_bytes * 0.9:  # leave headroom so the next saves don't purge again
+                break
+            doomed.append((snapshot_id,))
+            total -= size
+        conn.executemany("DELETE FROM snapshots WHERE id = ?", doomed)
@@ -0,0 +1,205 @@
+# sql_cache.py - intent-keyed cache in front of NL->SQL generation (paraphrases share one entry)
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from metrics import SQL_CACHE
+from normalize import CATEGORY_ALIASES, COMPANY_ALIASES, MONTHS, alias_spans
+
+# Filler that never changes the generated SQL
+STOPWORDS = {
+    "a", "an", "the", "for", "in", "of", "on", "from", "by", "at", "about", "all", "any", "me", "my",
+    "show", "find", "get", "list", "give", "search", "display", "fetch", "pull", "please", "i", "we", "want",
+    "need", "see", "look", "looking", "which", "that", "are", "is", "was", "were", "there", "can", "you",
+    "doc", "docs", "document", "documents", "file", "files", "record", "records", "result", "results",
+    "related", "regarding", "mentioning", "mention", "containing", "contain", "with", "year", "month",
+}
+# Time expressions whose meaning depends on today's date: never cached
+RELATIVE_TIME = {
+    "today", "yesterday", "tomorrow", "recent", "recently", "ago", "last", "this", "next", "past", "current",
+    "previous", "ytd",
+}
+# Words that change query logic; kept in the key but not expected verbatim in the SQL. Range
+# connectors ("2023 to 2024" vs "2023 and 2024") are among them; a range dash is read as "to".
+LOGIC_WORDS = {"and", "or", "not", "no", "without", "except", "exclude", "excluding", "only", "between",
+               "to", "through", "thru", "before", "after", "since", "until", "latest", "newest", "oldest",
+               "count", "many", "how", "top", "first", "each", "per"}
+
+YEAR_RE = re.compile(r"\b(?:19|20)\d{2}\b")
+TOKEN_RE = re.compile(r"[a-z0-9@][a-z0-9@._'-]*")
+_MONTH_ALT = "|".join(sorted(MONTHS, key=len, reverse=True))
+# "2023-2024", "jan-mar", "march - june 2024", "2023 – 2024"; not ISO dates like 2024-03-15
+RANGE_DASH_RE = re.compile(
+    rf"(?<=\w)(?:\s+[-\u2013\u2014]+\s+|\s*[\u2013\u2014]\s*)(?=\w)"
+    rf"|\b((?:19|20)\d{{2}}|{_MONTH_ALT})-(?=(?:19|20)\d{{2}}\b|(?:{_MONTH_ALT})\b)"
+)
+# "may" is only a month with a day or year next to it ("may 3", "3rd of may", "may 2024")
+DAY_OR_YEAR_BEFORE_RE = re.compile(r"(?:\b\d{1,2}(?:st|nd|rd|th)?\s+(?:of\s+)?|\b(?:19|20)\d{2}\s+)$")
+DAY_OR_YEAR_AFTER_RE = re.compile(r"\.?,?\s+(?:\d{1,2}(?:st|nd|rd|th)?|(?:19|20)\d{2})\b")
+MONTH_NAMES = {}
+for _name, _number in MONTHS.items():
+    MONTH_NAMES.setdefault(_number, []).append(_name)
+
+
+def _singular(word: str) -> str:
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+
+def extract_intent(text: str):
+    """
+    Structured intent of a search: canonical companies and categories (alias tables shared with
+    SYSTEM_PROMPT), years, months and the remaining content words. None when the query depends on
+    the current date or carries nothing recognisable, so it must always go to the model.
+    """
+    lowered = " ".join((text or "").lower().split())
+    if not lowered:
+        return None
+
+    companies, categories = set(), set()
+    for table, found in ((COMPANY_ALIASES, companies), (CATEGORY_ALIASES, categories)):
+        spans = alias_spans(lowered, table)
+        for start, end, canonical in reversed(spans):
+            found.add(canonical)
+            lowered = lowered[:start] + " " + lowered[end:]
+
+    lowered = RANGE_DASH_RE.sub(lambda m: f"{m.group(1) or ''} to ", lowered)
+    years = set(YEAR_RE.findall(lowered))
+    dated, lowered = lowered, YEAR_RE.sub(lambda m: " " * len(m.group()), lowered)
+
+    months, terms = set(), set()
+    for match in TOKEN_RE.finditer(lowered):
+        token = match.group().strip("._'-")
+        if not token:
+            continue
+        if token in RELATIVE_TIME:
+            return None
+        if token == "may" and not (DAY_OR_YEAR_BEFORE_RE.search(dated, 0, match.start())
+                                   or DAY_OR_YEAR_AFTER_RE.match(dated, match.end())):
+            terms.add(token)
+        elif token in MONTHS:
+            months.add(MONTHS[token])
+        elif token not in STOPWORDS:
+            terms.add(_singular(token))
+
+    if not (companies or categories or years or months or terms - LOGIC_WORDS):
+        return None
+    return {
+        "companies": sorted(companies),
+        "categories": sorted(categories),
+        "years": sorted(years),
+        "months": sorted(months),
+        "terms": sorted(terms),
+    }
+
+
+def intent_key(intent: dict) -> str:
+    return json.dumps(intent, sort_keys=True, separators=(",", ":"))
+
+
+def sql_covers_intent(sql: str, intent: dict) -> bool:
+    """
+    Precision guard: only SQL that visibly constrains every part of the intent is shared between
+    paraphrases. If the model dropped or reinterpreted something (a year, an entity, a name), the
+    SQL is specific to that wording and is not cached.
+    """
+    text = sql.lower()
+    for company in intent["companies"]:
+        if not any(alias in text for alias in [company.lower()] + COMPANY_ALIASES[company]):
+            return False
+    for category in intent["categories"]:
+        if not any(alias in text for alias in [category.lower()] + CATEGORY_ALIASES[category]):
+            return False
+    if not all(year in text for year in intent["years"]):
+        return False
+    for month in intent["months"]:
+        options = MONTH_NAMES[month] + [f"{month:02d}", str(month)]
+        if not any(option in text for option in options):
+            return False
+    for term in intent["terms"]:
+        if term in LOGIC_WORDS:
+            continue
+        if term not in text and term[:5] not in text:
+            return False
+    return True
+
+
+class SqlIntentCache:
+    """
+    LRU of generated SQL keyed by canonical search intent, so "UML billing docs 2024" and
+    "billing documents for US Medical Labs in 2024" share one model call. Outcomes are
+    counted in dashboard_sql_cache_total; stats() reports the hit rate.
+    """
+
+    def __init__(self, ttl: float = 86400.0, max_entries: int = 2000, enabled: bool = True):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._counts = {"hit": 0, "miss": 0, "bypass": 0, "rejected": 0}
+
+    def _count(self, outcome: str):
+        SQL_CACHE.inc(outcome)
+        with self._lock:
+            self._counts[outcome] += 1
+
+    def lookup(self, query: str):
+        """Return (sql or None, intent). intent is None when the query must bypass the cache."""
+        intent = extract_intent(query) if self.enabled else None
+        if intent is None:
+            self._count("bypass")
+            return None, None
+        key = intent_key(intent)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry["stored_at"] < self.ttl:
+                self._entries.move_to_end(key)
+                entry["hits"] += 1
+                sql = entry["sql"]
+            else:
+                sql = None
+        self._count("hit" if sql is not None else "miss")
+        return sql, intent
+
+    def stale(self, intent):
+        """SQL stored for this intent regardless of age (fallback while the LLM is unavailable)."""
+        if intent is None:
+            return None
+        with self._lock:
+            entry = self._entries.get(intent_key(intent))
+            return entry["sql"] if entry is not None else None
+
+    def store(self, query: str, intent, sql: str) -> bool:
+        if intent is None or not sql or sql.startswith("Error:"):
+            return False
+        if not sql_covers_intent(sql, intent):
+            self._count("rejected")
+            return False
+        with self._lock:
+            self._entries[intent_key(intent)] = {"sql": sql, "query": query, "stored_at": time.monotonic(), "hits": 0}
+            self._entries.move_to_end(intent_key(intent))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return True
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            counts = dict(self._counts)
+            entries = len(self._entries)
+        lookups = counts["hit"] + counts["miss"]
+        return {
+            **counts,
+            "entries": entries,
+            "hit_rate": round(counts["hit"] / lookups, 3) if lookups else None,
+        }
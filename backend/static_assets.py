@@ -0,0 +1,162 @@
+# static_assets.py - indexed, precompressed serving of the built frontend (frontend/dist)
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+import threading
+
+from flask import Response, send_file
+
+try:  # optional: brotli variants are produced only when the package is installed
+    import brotli
+except ImportError:  # pragma: no cover - depends on environment
+    brotli = None
+
+COMPRESSIBLE = {".js", ".mjs", ".css", ".html", ".svg", ".json", ".txt", ".map", ".xml", ".ico"}
+MIN_COMPRESS_BYTES = 1024
+MAX_MEMORY_BYTES = 2 * 1024 * 1024  # larger files are streamed from disk
+
+# Vite emits content-hashed names such as assets/index-BX3k9aQz.js: an 8-character base64url hash
+# right before the extension, only under assets/ (files from public/ keep their names and are not hashed)
+HASHED_NAME_RE = re.compile(r"^assets/(?:[^/]+/)*[^/]+-[A-Za-z0-9_-]{8}\.[A-Za-z0-9]+$")
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+SHORT_LIVED = "public, max-age=3600"
+
+
+class _Asset:
+    __slots__ = ("path", "mimetype", "etag", "mtime", "cache_control", "variants")
+
+    def __init__(self, path, mimetype, etag, mtime, cache_control, variants):
+        self.path = path
+        self.mimetype = mimetype
+        self.etag = etag
+        self.mtime = mtime
+        self.cache_control = cache_control
+        # encoding ("br", "gzip", "identity") -> bytes, or a file path when too large for memory
+        self.variants = variants
+
+
+class StaticAssets:
+    """
+    Indexes the build directory once (content ETags, cache policy, gzip/brotli variants held
+    in memory) so serving an asset is a dict lookup instead of per-request filesystem checks.
+    The index is rebuilt when index.html changes, i.e. after a new `npm run build`.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self._assets = {}
+        self._index_mtime = None
+        self._lock = threading.Lock()
+        self.refresh()
+
+    @property
+    def ready(self) -> bool:
+        return "index.html" in self._assets
+
+    def refresh(self):
+        assets = {}
+        if self.root.is_dir():
+            for dirpath, _dirnames, filenames in os.walk(self.root):
+                for filename in filenames:
+                    if filename.endswith((".gz", ".br")):
+                        continue
+                    full = os.path.join(dirpath, filename)
+                    rel = os.path.relpath(full, self.root).replace(os.sep, "/")
+                    assets[rel] = self._load(rel, full)
+        index = self.root / "index.html"
+        with self._lock:
+            self._assets = assets
+            self._index_mtime = index.stat().st_mtime if index.exists() else None
+
+    def _load(self, rel, full):
+        stat = os.stat(full)
+        mimetype = mimetypes.guess_type(full)[0] or "application/octet-stream"
+        if rel == "index.html":
+            cache_control = REVALIDATE
+        elif HASHED_NAME_RE.search(rel):
+            cache_control = IMMUTABLE
+        else:
+            cache_control = SHORT_LIVED
+
+        if stat.st_size > MAX_MEMORY_BYTES:
+            etag = f"{int(stat.st_mtime)}-{stat.st_size}"
+            return _Asset(full, mimetype, etag, stat.st_mtime, cache_control, {"identity": full})
+
+        with open(full, "rb") as f:
+            data = f.read()
+        etag = hashlib.sha1(data).hexdigest()[:20]
+        variants = {"identity": data}
+        if os.path.splitext(rel)[1].lower() in COMPRESSIBLE and len(data) >= MIN_COMPRESS_BYTES:
+            variants["gzip"] = self._precompressed(full, ".gz", data, lambda d: gzip.compress(d, 9, mtime=0))
+            if brotli is not None:
+                variants["br"] = self._precompressed(full, ".br", data, lambda d: brotli.compress(d, quality=11))
+            elif os.path.exists(full + ".br"):
+                variants["br"] = self._precompressed(full, ".br", data, None)
+            # Keep a variant only when it actually saves bytes
+            variants = {k: v for k, v in variants.items() if v is not None and (k == "identity" or len(v) < len(data))}
+        return _Asset(full, mimetype, etag, stat.st_mtime, cache_control, variants)
+
+    @staticmethod
+    def _precompressed(full, suffix, data, compress):
+        """Reuse an up-to-date .gz/.br next to the file (e.g. from the build), else create it."""
+        target = full + suffix
+        try:
+            if os.path.exists(target) and os.path.getmtime(target) >= os.path.getmtime(full):
+                with open(target, "rb") as f:
+                    return f.read()
+        except OSError:
+            pass
+        if compress is None:
+            return None
+        compressed = compress(data)
+        try:
+            with open(target, "wb") as f:
+                f.write(compressed)
+        except OSError:
+            pass  # read-only deployment: keep the in-memory copy only
+        return compressed
+
+    def _check_rebuild(self):
+        index = self.root / "index.html"
+        try:
+            mtime = index.stat().st_mtime
+        except OSError:
+            mtime = None
+        if mtime != self._index_mtime:
+            self.refresh()
+
+    def lookup(self, rel_path: str):
+        if rel_path == "index.html":
+            self._check_rebuild()
+        return self._assets.get(rel_path)
+
+    def serve(self, rel_path: str, request):
+        """Return a conditional, content-negotiated Response for rel_path, or None if unknown."""
+        asset = self.lookup(rel_path)
+        if asset is None:
+            return None
+
+        accepted = request.accept_encodings
+        encoding = "identity"
+        for candidate in ("br", "gzip"):
+            if candidate in asset.variants and accepted[candidate]:
+                encoding = candidate
+                break
+
+        body = asset.variants[encoding]
+        if isinstance(body, str):
+            response = send_file(body, mimetype=asset.mimetype, conditional=False, etag=False)
+        else:
+            response = Response(body, mimetype=asset.mimetype)
+            if encoding != "identity":
+                response.headers["Content-Encoding"] = encoding
+        if len(asset.variants) > 1:
+            response.headers["Vary"] = "Accept-Encoding"
+        response.headers["Cache-Control"] = asset.cache_control
+        response.set_etag(asset.etag if encoding == "identity" else f"{asset.etag}-{encoding}")
+        response.last_modified = asset.mtime
+        return response.make_conditional(request)
@@ -0,0 +1,99 @@
+# storage.py - on-disk state: conversations and chat snapshots, result snapshots, job queue, document stat/preview caches
+import json
+from datetime import datetime
+
+import config
+from file_server import StatCache
+from jobs import JobQueue
+from previews import PreviewService
+from snapshots import SnapshotStore
+
+CHAT_STORE_DIR = config.CHAT_STORE_DIR
+
+file_stats = StatCache(ttl=config.FILE_STAT_TTL)
+previews = PreviewService(
+    config.PREVIEW_CACHE_DIR,
+    workers=config.PREVIEW_WORKERS,
+    max_bytes=int(config.PREVIEW_CACHE_MAX_MB * 1024 * 1024),
+    max_age=config.PREVIEW_CACHE_MAX_AGE,
+)
+job_queue = JobQueue(
+    CHAT_STORE_DIR / "jobs.sqlite3",
+    workers=config.ANALYSE_JOB_WORKERS,
+    dedup_ttl=config.JOB_DEDUP_TTL,
+)
+result_snapshots = SnapshotStore(
+    CHAT_STORE_DIR / "snapshots.sqlite3",
+    ttl=config.SNAPSHOT_TTL,
+    max_ids=config.SNAPSHOT_MAX_IDS,
+    max_bytes=int(config.SNAPSHOT_MAX_MB * 1024 * 1024),
+)
+
+
+def _save_conversation(prefix: str, conversation_id: str, data: dict):
+    CHAT_STORE_DIR.mkdir(exist_ok=True)
+    file_path = CHAT_STORE_DIR / f"{prefix}_{conversation_id}.json"
+    with open(file_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    return file_path
+
+
+def _load_conversation(prefix: str, conversation_id: str) -> dict:
+    file_path = CHAT_STORE_DIR / f"{prefix}_{conversation_id}.json"
+    if file_path.exists():
+        with open(file_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return None
+
+
+def save_summary_conversation(conversation_id: str, data: dict):
+    """Save summary conversation to JSON file."""
+    return _save_conversation("summary", conversation_id, data)
+
+
+def load_summary_conversation(conversation_id: str) -> dict:
+    """Load summary conversation from JSON file."""
+    return _load_conversation("summary", conversation_id)
+
+
+def save_analyse_conversation(conversation_id: str, data: dict):
+    """Save analyse conversation to JSON file."""
+    return _save_conversation("analyse", conversation_id, data)
+
+
+def load_analyse_conversation(conversation_id: str) -> dict:
+    """Load analyse conversation from JSON file."""
+    return _load_conversation("analyse", conversation_id)
+
+
+def save_chats(chats: list):
+    """Write the chat list as the single latest snapshot (chats_<timestamp>.json); returns its path."""
+    CHAT_STORE_DIR.mkdir(exist_ok=True)
+    # Keep only the latest snapshot to avoid duplicate merges on reload
+    for fpath in CHAT_STORE_DIR.glob("chats_*.json"):
+        try:
+            fpath.unlink()
+        except Exception:
+            continue
+
+    timestamp = datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")
+    file_path = CHAT_STORE_DIR / f"chats_{timestamp}.json"
+    with open(file_path, "w", encoding="utf-8") as f:
+        json.dump({"saved_at": timestamp, "chats": chats}, f, ensure_ascii=False, indent=2)
+    return file_path
+
+
+def load_chats() -> list:
+    """Chats from the latest snapshot; empty when there is none or it is unreadable."""
+    CHAT_STORE_DIR.mkdir(exist_ok=True)
+    latest = max(CHAT_STORE_DIR.glob("chats_*.json"), default=None)
+    if latest is None:
+        return []
+    try:
+        with open(latest, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except Exception:
+        return []
+    if isinstance(data, dict) and isinstance(data.get("chats"), list):
+        return data["chats"]
+    return []
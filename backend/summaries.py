@@ -0,0 +1,176 @@
+# summaries.py - cached per-document summaries so SUMMARY conversations start from compact context
+import contextvars
+import hashlib
+import logging
+import queue
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from analysis import document_key
+from metrics import record_tokens, stage
+
+log = logging.getLogger(__name__)
+
+# Bump when DOC_SUMMARY_PROMPT changes so cached summaries are regenerated
+SUMMARY_VERSION = "1"
+
+DOC_SUMMARY_PROMPT = """You summarise one medical laboratory document for later question answering.
+
+Write a summary of at most 120 words, then a "Key facts:" list with every date, name, email,
+company, amount, account or reference number and diagnosis in the document, copied exactly.
+Plain text only."""
+
+# Questions that need the original wording rather than a summary
+RAW_TEXT_RE = re.compile(r"\b(quote|quoted|verbatim|exact(ly)?|word for word|full text|original text|line by line)\b",
+                         re.IGNORECASE)
+
+
+def summary_hash(text: str) -> str:
+    return hashlib.sha1(f"{SUMMARY_VERSION}\0{text}".encode("utf-8")).hexdigest()
+
+
+def raw_text_needed(files, message: str, budget_chars: int):
+    """
+    Indexes of documents whose full text should accompany the summaries: those named in the
+    question (by filename), or all of them, in order, when it asks for exact wording.
+    """
+    text = (message or "").lower()
+    if RAW_TEXT_RE.search(text):
+        wanted = list(range(len(files)))
+    else:
+        wanted = []
+        for i, f in enumerate(files):
+            name = (f.get("filename") or "").lower()
+            stem = name.rsplit(".", 1)[0]
+            if (name and name in text) or (len(stem) >= 4 and stem in text):
+                wanted.append(i)
+    chosen, used = set(), 0
+    for i in wanted:
+        size = len(files[i].get("description") or "")
+        if used + size > budget_chars:
+            break
+        chosen.add(i)
+        used += size
+    return chosen
+
+
+class DocumentSummarizer:
+    """
+    Summaries keyed by document id + content hash, shared by every conversation and user.
+    summaries() fills gaps on demand (in parallel); prefetch() counts how often each document is
+    opened and, once one reaches min_opens (0 disables it), queues it for a single background
+    thread so it is ready before it is needed in a larger conversation. Background summaries run
+    in the opening request's context, so their tokens are charged to that tenant.
+    """
+
+    def __init__(self, get_client, cache, concurrency: int = 8, max_chars: int = 24000,
+                 model: str = "gpt-4o-mini", min_opens: int = 3, max_tracked: int = 50000):
+        self._get_client = get_client
+        self.cache = cache
+        self.concurrency = concurrency
+        self.max_chars = max_chars
+        self.model = model
+        self.min_opens = min_opens
+        self.max_tracked = max_tracked
+        self._opens = OrderedDict()  # key -> times opened (this process, most recent last)
+        self._queue = queue.Queue(maxsize=256)
+        self._queued = set()
+        self._lock = threading.Lock()
+        self._worker = None
+
+    @staticmethod
+    def key(f: dict):
+        return document_key(f), summary_hash(f.get("description") or "")
+
+    def _summarize(self, f: dict) -> str:
+        text = (f.get("description") or "")[: self.max_chars]
+        with stage("llm_doc_summary"):
+            response = self._get_client().chat.completions.create(
+                model=self.model,
+                messages=[
+                    {"role": "system", "content": DOC_SUMMARY_PROMPT},
+                    {"role": "user", "content": f"Document: {f.get('filename', 'Document')}\n\n{text}"},
+                ],
+                temperature=0,
+                max_tokens=400,
+            )
+        record_tokens("doc_summary", getattr(response, "usage", None))
+        summary = response.choices[0].message.content.strip()
+        self.cache.put(*self.key(f), {"summary": summary})
+        return summary
+
+    def summaries(self, files):
+        """One summary per file (same order); missing ones are generated now and cached."""
+        keys = [self.key(f) for f in files]
+        cached = self.cache.get_many(list(set(keys)))
+        results = [(cached.get(k) or {}).get("summary") for k in keys]
+
+        missing = {}
+        for i, k in enumerate(keys):
+            if results[i] is None:
+                missing.setdefault(k, []).append(i)
+        if not missing:
+            return results
+
+        with ThreadPoolExecutor(max_workers=max(1, min(self.concurrency, len(missing))),
+                                thread_name_prefix="doc-summary") as pool:
+            # Copies of the caller's context: summary tokens are charged to the requesting tenant
+            futures = {k: pool.submit(contextvars.copy_context().run, self._summarize, files[indexes[0]])
+                       for k, indexes in missing.items()}
+        for k, future in futures.items():
+            try:
+                summary = future.result()
+            except Exception as exc:
+                # Fall back to the head of the raw text for this one document
+                log.warning("document summary failed for %s: %s", k[0], exc)
+                summary = (files[missing[k][0]].get("description") or "")[:2000]
+            for i in missing[k]:
+                results[i] = summary
+        return results
+
+    def _count_open(self, k) -> int:
+        with self._lock:
+            opens = self._opens.pop(k, 0) + 1
+            self._opens[k] = opens
+            while len(self._opens) > self.max_tracked:
+                self._opens.popitem(last=False)
+        return opens
+
+    def prefetch(self, files):
+        """Record that files were opened; queue frequently opened, uncached ones for background summarisation."""
+        if self.min_opens <= 0:
+            return
+        by_key = {self.key(f): f for f in files}
+        frequent = [(f, k) for k, f in by_key.items() if self._count_open(k) >= self.min_opens]
+        if not frequent:
+            return
+        cached = self.cache.get_many(list({k for _, k in frequent}))
+        context = contextvars.copy_context()
+        for f, k in frequent:
+            if k in cached:
+                continue
+            with self._lock:
+                if k in self._queued:
+                    continue
+                try:
+                    self._queue.put_nowait((k, f, context))
+                except queue.Full:
+                    return
+                self._queued.add(k)
+                if self._worker is None or not self._worker.is_alive():
+                    self._worker = threading.Thread(target=self._drain, name="doc-summary-prefetch", daemon=True)
+                    self._worker.start()
+
+    def _drain(self):
+        while True:
+            k, f, context = self._queue.get()
+            try:
+                if not self.cache.get_many([k]):
+                    context.run(self._summarize, f)
+            except Exception as exc:
+                log.warning("background summary failed for %s: %s", k[0], exc)
+            finally:
+                with self._lock:
+                    self._queued.discard(k)
@@ -0,0 +1,5 @@
+# conftest.py - backend modules import each other by bare name (the app runs from backend/)
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,155 @@
+# test_match_reasons.py - match_reason computed in Python must equal what CONCAT_WS returns in Postgres
+import os
+
+import pytest
+
+from match_reasons import ReasonCache, like_to_regex, plan
+
+# Shaped like the SYSTEM_PROMPT examples
+UML_2024 = """SELECT *,
+  CONCAT_WS(' | ',
+    CASE WHEN company ILIKE '%UML%' THEN 'Company: UML' END,
+    CASE WHEN company ILIKE '%US Medical Labs%' THEN 'Company: US Medical Labs' END,
+    CASE WHEN description ILIKE '%UML%' THEN 'Description: UML' END,
+    CASE WHEN date ~* '2024' THEN 'Date field: 2024' END
+  ) as match_reason
+FROM uml_temp
+WHERE (company ILIKE '%UML%' OR company ILIKE '%US Medical Labs%' OR description ILIKE '%UML%')
+  AND date ~* '2024'
+LIMIT 200"""
+
+STAR_BOY = """SELECT *,
+  CONCAT_WS(' | ',
+    CASE WHEN LOWER(name) LIKE LOWER('%star%boy%') THEN 'Name field: star boy' END,
+    CASE WHEN LOWER(description) LIKE LOWER('%starboy%') THEN 'Description: starboy' END
+  ) as match_reason
+FROM uml_temp
+WHERE LOWER(name) LIKE LOWER('%star%boy%') OR LOWER(description) LIKE LOWER('%starboy%')"""
+
+JUNE_JULY = """SELECT *,
+  CONCAT_WS(' | ',
+    CASE WHEN date ~* '(june|jun)[^0-9]*(2023|2024|2025)' THEN 'Date field: june 2023-2025' END,
+    CASE WHEN description ~* '(july|jul)[^[:digit:]]*(2023|2024|2025)' THEN 'Description: july 2023-2025' END
+  ) as match_reason
+FROM uml_temp
+WHERE date ~* '(june|jun)[^0-9]*(2023|2024|2025)' OR description ~* '(july|jul)[^[:digit:]]*(2023|2024|2025)'"""
+
+ROWS = [
+    {"id": 1, "company": "US Medical Labs", "description": "UML invoice", "date": "2024-03-15", "name": "Starboy"},
+    {"id": 2, "company": "uml", "description": None, "date": "March 2023", "name": "Star Boy"},
+    {"id": 3, "company": None, "description": "paid in July, 2024", "date": "June 5 2024", "name": None},
+    {"id": 4, "company": "Aetna", "description": "billing", "date": None, "name": "star-the-boy"},
+]
+
+
+@pytest.mark.parametrize("sql, expected", [
+    (UML_2024, [
+        "Company: US Medical Labs | Description: UML | Date field: 2024",
+        "Company: UML",
+        "Date field: 2024",
+        "",
+    ]),
+    (STAR_BOY, ["Name field: star boy", "Name field: star boy", "", "Name field: star boy"]),
+    # [^0-9]* cannot step over the day in "June 5 2024"
+    (JUNE_JULY, ["", "", "Description: july 2023-2025", ""]),
+])
+def test_reasons_match_concat_ws(sql, expected):
+    reason_plan = plan(sql)
+    assert reason_plan.active
+    assert [reason_plan.reasons(row) for row in ROWS] == expected
+
+
+def test_postgres_only_filters():
+    reason_plan = plan(UML_2024)
+    assert reason_plan.sql.startswith("SELECT *\nFROM uml_temp\nWHERE")
+    assert "match_reason" not in reason_plan.sql
+    assert reason_plan.restore(reason_plan.sql + " OFFSET 0") == UML_2024 + " OFFSET 0"
+
+
+def test_facet_wrapped_query():
+    wrapped = f"SELECT q.* FROM ({UML_2024}) q WHERE q.category ILIKE '%billing%'"
+    reason_plan = plan(wrapped)
+    assert reason_plan.active
+    assert "CONCAT_WS" not in reason_plan.sql
+    assert reason_plan.sql.endswith(") q WHERE q.category ILIKE '%billing%'")
+    assert reason_plan.reasons(ROWS[1]) == "Company: UML"
+
+
+@pytest.mark.parametrize("condition, row, expected", [
+    # NULL: the CASE yields NULL, which CONCAT_WS skips; NOT NULL is still NULL
+    ("description ILIKE '%x%'", {"description": None}, ""),
+    ("NOT description ILIKE '%x%'", {"description": None}, ""),
+    ("description NOT ILIKE '%x%'", {"description": "abc"}, "hit"),
+    ("COALESCE(description, '') NOT ILIKE '%x%'", {"description": None}, "hit"),
+    # NULL OR TRUE is TRUE, NULL AND TRUE is NULL
+    ("description ILIKE '%x%' OR name = 'Al'", {"description": None, "name": "Al"}, "hit"),
+    ("description ILIKE '%x%' AND name = 'Al'", {"description": None, "name": "Al"}, ""),
+    # LIKE is anchored and case-sensitive; _ is one character; \ escapes the wildcards
+    ("name LIKE 'Al'", {"name": "al"}, ""),
+    ("name LIKE 'A_'", {"name": "Al"}, "hit"),
+    ("name LIKE '100\\%'", {"name": "100%"}, "hit"),
+    ("name LIKE '100\\%'", {"name": "1000"}, ""),
+    ("name LIKE 'a_b'", {"name": "a\nb"}, "hit"),
+    # ~ is unanchored; \y is a word boundary; !~* negates
+    ("description ~* '\\yfraud\\y'", {"description": "Fraud prevention"}, "hit"),
+    ("description ~* '\\yfraud\\y'", {"description": "antifraud"}, ""),
+    ("description !~* 'fraud'", {"description": "audit"}, "hit"),
+    ("d.description ~ '[[:upper:]]{3}'", {"description": "the UML lab"}, "hit"),
+])
+def test_predicate_semantics(condition, row, expected):
+    reason_plan = plan(f"SELECT *, CONCAT_WS(' | ', CASE WHEN {condition} THEN 'hit' END) AS match_reason FROM uml_temp")
+    assert reason_plan.active
+    assert reason_plan.reasons(row) == expected
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT * FROM uml_temp WHERE name ILIKE '%x%'",
+    "SELECT *, CONCAT_WS(' | ', CASE WHEN name SIMILAR TO 'x' THEN 'a' END) AS match_reason FROM uml_temp",
+    "SELECT *, CONCAT_WS(' | ', CASE WHEN length(name) > 3 THEN 'a' END) AS match_reason FROM uml_temp",
+    "SELECT *, CONCAT_WS(' | ', CASE WHEN name ILIKE 'x' THEN 'a' END) AS match_reason FROM uml_temp "
+    "ORDER BY match_reason",
+])
+def test_unsupported_sql_runs_unchanged(sql):
+    reason_plan = plan(sql)
+    assert not reason_plan.active
+    assert reason_plan.sql == sql
+
+
+def test_like_to_regex_escapes_regex_metacharacters():
+    assert like_to_regex("a.b%", 0).fullmatch("a.bcd")
+    assert not like_to_regex("a.b%", 0).fullmatch("axbcd")
+
+
+def test_reason_cache_reuses_rows_by_id():
+    cache, reason_plan = ReasonCache(), plan(UML_2024)
+    rows = [dict(ROWS[1])]
+    cache.annotate(reason_plan, rows)
+    assert rows[0]["match_reason"] == "Company: UML"
+    stale = [dict(ROWS[1], company="Aetna")]
+    cache.annotate(reason_plan, stale)
+    assert stale[0]["match_reason"] == "Company: UML"
+
+
+@pytest.mark.skipif(not os.getenv("BENCH_DB_NAME"), reason="set BENCH_DB_NAME to a database loaded by bench/dataset.py")
+@pytest.mark.parametrize("sql", [UML_2024, STAR_BOY, JUNE_JULY])
+def test_reasons_agree_with_postgres(sql):
+    psycopg2 = pytest.importorskip("psycopg2")
+    from psycopg2.extras import RealDictCursor
+
+    conn = psycopg2.connect(
+        host=os.getenv("DB_HOST", "localhost"),
+        port=int(os.getenv("DB_PORT", "5433")),
+        dbname=os.getenv("BENCH_DB_NAME"),
+        user=os.getenv("DB_USER", "postgres"),
+        password=os.getenv("DB_PASSWORD", ""),
+    )
+    try:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute(f"SELECT * FROM ({sql.replace('LIMIT 200', '')}) r ORDER BY id LIMIT 2000")
+            rows = cur.fetchall()
+    finally:
+        conn.close()
+    assert rows
+    reason_plan = plan(sql)
+    for row in rows:
+        assert reason_plan.reasons(dict(row)) == row["match_reason"], row["id"]
@@ -0,0 +1,63 @@
+# test_partitions.py - partition years of rows and the years a generated search may be pruned to
+import pytest
+
+from partitions import UNDATED_YEAR, partition_year, predicate_years, year_predicate
+
+
+@pytest.mark.parametrize("date, description_head, expected", [
+    ("2024-03-15", None, 2024),
+    ("03/15/2024", "Invoice from 2019", 2024),
+    ("March 3rd, 2022", None, 2022),
+    # Several years: undated, so a date predicate on either year still scans it
+    ("2019-2024", None, UNDATED_YEAR),
+    ("filed 2021, amended 2023", None, UNDATED_YEAR),
+    ("2024 (rev. 2024)", None, 2024),
+    # No year in date: the indexer's normalization, falling back to description
+    ("March 3", "Lab report dated 2022-01-05", 2022),
+    (None, None, UNDATED_YEAR),
+    ("", "no date here", UNDATED_YEAR),
+])
+def test_partition_year(date, description_head, expected):
+    assert partition_year(date, description_head) == expected
+
+
+@pytest.mark.parametrize("sql, expected", [
+    ("SELECT * FROM uml_temp WHERE date ~* '2024' LIMIT 50", ["2024"]),
+    ("SELECT * FROM uml_temp WHERE (date ~* '2023' OR date ~* '2024') AND company ILIKE '%uml%'", ["2023", "2024"]),
+    ("SELECT * FROM uml_temp WHERE date ~* '2024' AND date ~* '2023|2024'", ["2024"]),
+    ("SELECT * FROM uml_temp WHERE date ~* '(june|jun)[^0-9]*(2023|2024|2025)' ORDER BY id", ["2023", "2024", "2025"]),
+    ("SELECT * FROM uml_temp WHERE date ~* '(march|mar)[^0-9]*2024' OR date ~* '2024-03'", ["2024"]),
+    # A year that description alone can satisfy, or a pattern that does not require a literal year
+    ("SELECT * FROM uml_temp WHERE date ~* '2024' OR description ~* '2024'", None),
+    ("SELECT * FROM uml_temp WHERE date ~* '202[34]'", None),
+    ("SELECT * FROM uml_temp WHERE date ~* '2024?'", None),
+    ("SELECT * FROM uml_temp WHERE date ~* '(2023|2024)?'", None),
+    ("SELECT * FROM uml_temp WHERE date ~* '19\\d\\d|2024'", None),
+    ("SELECT * FROM uml_temp WHERE date !~* '2024'", None),
+    ("SELECT * FROM uml_temp WHERE NOT (date ~* '2024')", None),
+    ("SELECT * FROM uml_temp WHERE company ILIKE '%uml%'", None),
+    ("SELECT * FROM uml_temp", None),
+])
+def test_predicate_years(sql, expected):
+    assert predicate_years(sql) == expected
+
+
+def test_year_predicate_narrows_the_where_clause():
+    sql = "SELECT * FROM uml_temp t WHERE date ~* '2024' OR date ~* '2023' ORDER BY id DESC LIMIT 10"
+    assert year_predicate(sql, ["2024", "2023"]) == (
+        "SELECT * FROM uml_temp t\nWHERE t.doc_year IN (2023, 2024, 0)\n  AND (date ~* '2024' OR date ~* '2023')\n"
+        "ORDER BY id DESC LIMIT 10"
+    )
+    assert year_predicate("SELECT * FROM uml_temp LIMIT 5", [2024]) == (
+        "SELECT * FROM uml_temp\nWHERE doc_year IN (2024, 0)\nLIMIT 5"
+    )
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT company, count(*) FROM uml_temp WHERE date ~* '2024' GROUP BY company",
+    "SELECT * FROM uml_temp a JOIN uml_index i ON i.id = a.id WHERE date ~* '2024'",
+    "SELECT * FROM uml_temp WHERE date ~* '2024' UNION SELECT * FROM uml_temp WHERE date ~* '2023'",
+    "WITH x AS (SELECT * FROM uml_temp) SELECT * FROM x",
+])
+def test_year_predicate_leaves_other_shapes_alone(sql):
+    assert year_predicate(sql, [2024]) == sql
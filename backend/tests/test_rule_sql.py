@@ -0,0 +1,36 @@
+# test_rule_sql.py - fallback SQL built from the search intent while the LLM is unavailable
+import pytest
+
+from match_reasons import plan
+from rule_sql import rule_based_sql
+from sql_cache import extract_intent
+
+
+@pytest.mark.parametrize("text", [
+    "reports not from Siemens",
+    "invoices without UML",
+    "claims except aetna 2024",
+    "lab reports that aren't billed",
+])
+def test_exclusions_are_not_answered(text):
+    assert extract_intent(text) is not None
+    assert rule_based_sql(extract_intent(text)) is None
+
+
+def test_like_wildcards_in_terms_match_literally():
+    sql = rule_based_sql(extract_intent("file_name reports"))
+    assert "description ILIKE '%file\\_name%'" in sql
+    reason_plan = plan(sql)
+    assert reason_plan.reasons({"description": "see file_name"}) == "Description: file_name"
+    assert reason_plan.reasons({"description": "see filexname"}) == ""
+
+
+def test_groups_and_match_reason():
+    sql = rule_based_sql(extract_intent("UML billing 2024"))
+    assert sql.startswith("SELECT *,\n  CONCAT_WS(' | ',")
+    assert sql.count("\n  AND ") == 2
+    reason_plan = plan(sql)
+    assert reason_plan.active
+    row = {"company": "US Medical Labs", "category": "Billing", "date": "2024-01-02", "description": None}
+    assert reason_plan.reasons(row) == (
+        "Company: us medical labs | Company: us medical lab | Category: billing | Date field: 2024")
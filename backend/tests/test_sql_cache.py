@@ -0,0 +1,61 @@
+# test_sql_cache.py - paraphrases share an intent key, different searches never do
+import pytest
+
+from sql_cache import extract_intent, intent_key, sql_covers_intent
+
+
+def key(text):
+    intent = extract_intent(text)
+    return intent_key(intent) if intent else None
+
+
+@pytest.mark.parametrize("a, b", [
+    ("UML billing docs 2024", "billing documents for US Medical Labs in 2024"),
+    ("show me all invoices", "Find invoice files"),
+    ("aetna claims from 2023 to 2024", "Aetna claims 2023-2024"),
+    ("HR records march 2024", "human resources documents in Mar 2024"),
+])
+def test_paraphrases_share_a_key(a, b):
+    assert key(a) is not None
+    assert key(a) == key(b)
+
+
+@pytest.mark.parametrize("a, b", [
+    ("invoices 2023 to 2024", "invoices 2023 and 2024"),
+    ("invoices 2023 to 2024", "invoices 2023 2024"),
+    ("invoices between 2022 and 2024", "invoices 2022 and 2024"),
+    ("invoices from jan through mar 2024", "invoices jan mar 2024"),
+    ("documents that may mention fraud", "fraud documents"),
+    ("invoices without UML", "invoices UML"),
+])
+def test_different_searches_get_different_keys(a, b):
+    assert key(a) != key(b)
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("UML billing docs 2024", {"companies": ["UML"], "categories": ["Billing and Revenue Management"],
+                               "years": ["2024"], "months": [], "terms": []}),
+    ("invoices 2023-2024", {"companies": [], "categories": [], "years": ["2023", "2024"], "months": [],
+                            "terms": ["invoice", "to"]}),
+    ("lab reports jan-mar 2024", {"companies": [], "categories": [], "years": ["2024"], "months": [1, 3],
+                                  "terms": ["lab", "report", "to"]}),
+    ("claims may 2024", {"companies": [], "categories": [], "years": ["2024"], "months": [5], "terms": ["claim"]}),
+    ("claims 3rd of may", {"companies": [], "categories": [], "years": [], "months": [5], "terms": ["3rd", "claim"]}),
+    ("claims that may be denied", {"companies": [], "categories": [], "years": [], "months": [],
+                                   "terms": ["be", "claim", "denied", "may"]}),
+    ("letter dated 2024-03-15", {"companies": [], "categories": [], "years": ["2024"], "months": [],
+                                 "terms": ["03-15", "dated", "letter"]}),
+])
+def test_extract_intent(text, expected):
+    assert extract_intent(text) == expected
+
+
+@pytest.mark.parametrize("text", ["invoices from last month", "recent claims", "documents from yesterday", "", "show me"])
+def test_uncacheable_queries(text):
+    assert extract_intent(text) is None
+
+
+def test_range_connectors_need_not_appear_in_sql():
+    intent = extract_intent("invoices 2023 to 2024")
+    assert sql_covers_intent("SELECT * FROM uml_temp WHERE description ILIKE '%invoice%' AND date ~* '2023|2024'", intent)
+    assert not sql_covers_intent("SELECT * FROM uml_temp WHERE description ILIKE '%invoice%' AND date ~* '2023'", intent)
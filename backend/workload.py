@@ -0,0 +1,202 @@
+# workload.py - per-tenant quotas and a fair scheduler separating interactive searches from bulk work
+import itertools
+import threading
+import time
+from collections import Counter as Tally
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from metrics import QUOTA_REJECTED, WORKLOAD_WAIT
+
+INTERACTIVE = "interactive"  # single searches, /run-sql, summary chat
+BULK = "bulk"  # show_all searches, /batch-query, analyses
+
+# Tenant the current work is charged to; set by FairScheduler.slot() in the thread doing the work
+current_tenant = ContextVar("current_tenant", default=None)
+
+
+class QuotaExceeded(RuntimeError):
+    """A tenant is over one of its budgets (429) or no slot freed up in time (503); retry after retry_after."""
+
+    def __init__(self, message: str, retry_after: float, status: int = 429):
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.status = status
+
+
+class WindowBudget:
+    """
+    Per-tenant allowance that refills every `window` seconds (fixed window). limit <= 0 disables it.
+    check() refuses new work once a tenant has used its allowance; charge() records what work used.
+    """
+
+    def __init__(self, name: str, limit: float, window: float = 3600.0):
+        self.name = name
+        self.limit = limit
+        self.window = window
+        self._used = {}  # tenant -> (window start, amount)
+        self._lock = threading.Lock()
+
+    def _current(self, tenant, now):
+        started, used = self._used.get(tenant, (now, 0.0))
+        if now - started >= self.window:
+            started, used = now, 0.0
+        return started, used
+
+    def check(self, tenant):
+        if self.limit <= 0 or tenant is None:
+            return
+        now = time.monotonic()
+        with self._lock:
+            started, used = self._current(tenant, now)
+        if used >= self.limit:
+            QUOTA_REJECTED.inc(self.name)
+            raise QuotaExceeded(f"{self.name} quota exhausted ({self.limit:g} per {self.window:g}s)",
+                                retry_after=max(started + self.window - now, 1.0))
+
+    def charge(self, tenant, amount: float):
+        if self.limit <= 0 or tenant is None or not amount:
+            return
+        now = time.monotonic()
+        with self._lock:
+            started, used = self._current(tenant, now)
+            self._used[tenant] = (started, used + amount)
+            if len(self._used) > 10000:  # forget tenants whose window has ended
+                self._used = {t: v for t, v in self._used.items() if now - v[0] < self.window}
+
+    def usage(self, tenant) -> dict:
+        with self._lock:
+            _, used = self._current(tenant, time.monotonic())
+        return {"used": used, "limit": self.limit if self.limit > 0 else None}
+
+
+class _Waiter:
+    __slots__ = ("tenant", "workload", "seq")
+
+    def __init__(self, tenant, workload, seq):
+        self.tenant = tenant
+        self.workload = workload
+        self.seq = seq
+
+
+class FairScheduler:
+    """
+    Admission control for searches, SQL runs and analyses in one worker. At most `slots` run at
+    once, bulk work never takes more than `bulk_slots` of them (so interactive searches always
+    find room), and no tenant runs more than `per_tenant` at a time. When a slot frees up it goes
+    to a waiting interactive request before bulk work, then to the tenant with the fewest running,
+    then round robin (the tenant admitted longest ago) - one analyst's burst queues behind
+    everyone else's next query instead of ahead of it.
+    """
+
+    def __init__(self, slots: int = 10, bulk_slots: int = 4, per_tenant: int = 4, timeout: float = 30.0):
+        self.slots = max(1, slots)
+        self.bulk_slots = max(1, min(bulk_slots, self.slots))
+        self.per_tenant = per_tenant
+        self.timeout = timeout
+        self._running = Tally()  # tenant -> running
+        self._running_total = 0
+        self._running_bulk = 0
+        self._waiters = []
+        self._last_admitted = {}  # tenant -> admission number
+        self._admissions = itertools.count()
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+
+    def _fits(self, waiter) -> bool:
+        if self._running_total >= self.slots:
+            return False
+        if waiter.workload == BULK and self._running_bulk >= self.bulk_slots:
+            return False
+        return self.per_tenant <= 0 or self._running[waiter.tenant] < self.per_tenant
+
+    def _next(self):
+        eligible = [w for w in self._waiters if self._fits(w)]
+        if not eligible:
+            return None
+        return min(eligible, key=lambda w: (
+            w.workload != INTERACTIVE, self._running[w.tenant], self._last_admitted.get(w.tenant, -1), w.seq,
+        ))
+
+    @contextmanager
+    def slot(self, tenant, workload: str = INTERACTIVE, timeout: float = None):
+        """
+        Run the block once admitted; raises QuotaExceeded (503) when not admitted within timeout
+        seconds (default: the scheduler's; float("inf") waits as long as it takes, for background jobs).
+        """
+        timeout = self.timeout if timeout is None else timeout
+        started = time.perf_counter()
+        with self._cond:
+            waiter = _Waiter(tenant, workload, next(self._seq))
+            self._waiters.append(waiter)
+            deadline = time.monotonic() + timeout
+            while self._next() is not waiter:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._waiters.remove(waiter)
+                    self._cond.notify_all()
+                    QUOTA_REJECTED.inc("queue_timeout")
+                    raise QuotaExceeded(f"Server busy: no {workload} slot free within {timeout:g}s",
+                                        retry_after=1.0, status=503)
+                self._cond.wait(min(remaining, 60.0))
+            self._waiters.remove(waiter)
+            self._last_admitted[tenant] = next(self._admissions)
+            if len(self._last_admitted) > 10000:
+                self._last_admitted = {t: self._last_admitted[t] for t in self._running}
+                self._last_admitted[tenant] = next(self._admissions)
+            self._running[tenant] += 1
+            self._running_total += 1
+            self._running_bulk += workload == BULK
+            # A slot may have been left for another waiter (e.g. bulk capped but interactive waiting)
+            self._cond.notify_all()
+        WORKLOAD_WAIT.observe(workload, value=time.perf_counter() - started)
+
+        token = current_tenant.set(tenant)
+        try:
+            yield
+        finally:
+            current_tenant.reset(token)
+            with self._cond:
+                self._running[tenant] -= 1
+                if not self._running[tenant]:
+                    del self._running[tenant]
+                self._running_total -= 1
+                self._running_bulk -= workload == BULK
+                self._cond.notify_all()
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "slots": self.slots,
+                "bulk_slots": self.bulk_slots,
+                "per_tenant": self.per_tenant,
+                "running": self._running_total,
+                "running_bulk": self._running_bulk,
+                "waiting": len(self._waiters),
+                "tenants": len(self._running),
+            }
+
+
+class TenantQuotas:
+    """LLM token and returned-row budgets per tenant, plus the per-request row cap for each workload class."""
+
+    def __init__(self, tokens_per_window: float = 0, rows_per_window: float = 0, window: float = 3600.0,
+                 max_rows: dict = None):
+        self.tokens = WindowBudget("llm_tokens", tokens_per_window, window)
+        self.rows = WindowBudget("rows", rows_per_window, window)
+        self.max_rows = max_rows or {}
+
+    def row_cap(self, workload: str):
+        """Rows a single request of this class may return (None = no cap)."""
+        cap = self.max_rows.get(workload) or 0
+        return cap if cap > 0 else None
+
+    def before_llm_call(self):
+        self.tokens.check(current_tenant.get())
+
+    def charge_usage(self, usage):
+        if usage is not None:
+            self.tokens.charge(current_tenant.get(), getattr(usage, "total_tokens", 0) or 0)
+
+    def usage(self, tenant) -> dict:
+        return {"llm_tokens": self.tokens.usage(tenant), "rows": self.rows.usage(tenant)}
@@ -0,0 +1,195 @@
+# dataset.py - synthetic uml_temp corpus with the messy values SYSTEM_PROMPT describes
+import argparse
+import io
+import os
+import random
+from datetime import datetime, timedelta
+
+import psycopg2
+
+SCALES = {"10k": 10_000, "168k": 168_992, "1m": 1_000_000}
+
+FIRST_NAMES = ["Umair", "John", "Maria", "Ahmed", "Sarah", "David", "Fatima", "James", "Aisha", "Robert"]
+LAST_NAMES = ["Smith", "Khan", "Garcia", "Lee", "Patel", "Brown", "Elahi", "Johnson", "Ali", "Davis"]
+# Misspellings and casing variants for the same people
+NAME_VARIANTS = {"Umair": ["umair", "UMAIR", "Umar", "umeir", "umaeR"], "John": ["john", "JOHN", "Jon"]}
+
+COMPANY_VARIANTS = [
+    "UML", "uml", "US Medical Labs", "US Medical Laboratory", "USMedLab", "U.S. Medical Labs", "US MedLab",
+    "US Med Labs", "usmedlab", "us medical labs", "US Medcial Labs",
+    "SEM", "seem elahi", "Seema MD", "Dr Seema",
+    "MMM", "MMM Diagnostics Center", "mmm diagnostic",
+    "BCBS", "Blue Cross Blue Shield", "BlueCross",
+    "Aetna", "aetna better health", "AETNA",
+    "UHC", "United Health Care", "UnitedHealthcare",
+]
+CATEGORY_VARIANTS = [
+    "Human Resources", "Human Resource", "HR", "human resources",
+    "Billing and Revenue Management", "Billing & Revenue", "billing", "Biling and Revenu Management",
+    "Financial Management", "Financial Mgmt", "finance",
+    "Operations & Administration", "Operations and Administration", "Ops & Admin",
+    "Legal & Compliance", "Legal and Compliance", "Compliance", "Legal & Complaince",
+    "Supply & Vendor Management", "Vendor Management",
+    "Patient Care & Records", "Patient Care", "patient records",
+    "Transportation Services", "Transport", "Logistics",
+]
+DOC_TYPES = ["invoice", "bank statement", "lab report", "compliance audit", "offer letter", "claim", "policy"]
+MONTHS = ["january", "february", "march", "april", "may", "june", "july", "august", "september",
+          "october", "november", "december"]
+WORDS = (
+    "patient specimen billing payment amount due balance insurance claim provider fraud prevention "
+    "audit policy procedure laboratory result panel hemoglobin glucose invoice statement account "
+    "deposit withdrawal vendor supply shipment courier employee onboarding payroll benefit review"
+).split()
+EXTENSIONS = [".pdf", ".docx", ".xlsx", ".pdf", ".pdf"]
+
+COLUMNS = ("account", "filename", "filepath", "name", "date", "dob", "email", "company", "category",
+           "description", "created_at")
+
+SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS uml_temp (
+    id SERIAL PRIMARY KEY,
+    account TEXT,
+    filename TEXT,
+    filepath TEXT,
+    name TEXT,
+    date TEXT,
+    dob TEXT,
+    email TEXT,
+    company TEXT,
+    category TEXT,
+    description TEXT,
+    created_at TIMESTAMP DEFAULT now()
+)
+"""
+
+
+def messy_date(rng: random.Random, when: datetime) -> str:
+    month = MONTHS[when.month - 1]
+    formats = [
+        f"{month} {when.year}",
+        f"{month[:3]} {when.year}",
+        f"{month.title()} {when.year}",
+        f"{when.month}/{when.day}/{when.year}",
+        f"{when.month:02d}/{when.day:02d}/{when.year}",
+        f"{when.month}-{when.day}-{when.year}",
+        f"{month.title()} {when.day}, {when.year}",
+        f"{month[:3]} {when.day} {when.year}",
+        when.strftime("%Y-%m-%d"),
+    ]
+    return rng.choice(formats)
+
+
+def messy_name(rng: random.Random) -> str:
+    first = rng.choice(FIRST_NAMES)
+    if first in NAME_VARIANTS and rng.random() < 0.4:
+        first = rng.choice(NAME_VARIANTS[first])
+    return f"{first} {rng.choice(LAST_NAMES)}"
+
+
+def description(rng: random.Random, company: str, doc_type: str, name: str, date_text: str) -> str:
+    # Long-tailed sizes: most documents are a few KB, a few approach the 32k the prompt mentions
+    size = min(32_000, int(rng.lognormvariate(7.2, 0.9)))
+    head = f"{doc_type.title()} for {name} at {company} dated {date_text}. "
+    body = []
+    length = len(head)
+    while length < size:
+        word = rng.choice(WORDS)
+        body.append(word)
+        length += len(word) + 1
+    return head + " ".join(body)
+
+
+def generate_rows(count: int, seed: int = 42):
+    rng = random.Random(seed)
+    start = datetime(2015, 1, 1)
+    span_days = (datetime(2025, 12, 31) - start).days
+    for i in range(count):
+        when = start + timedelta(days=rng.randrange(span_days))
+        company = rng.choice(COMPANY_VARIANTS)
+        category = rng.choice(CATEGORY_VARIANTS)
+        doc_type = rng.choice(DOC_TYPES)
+        name = messy_name(rng)
+        date_text = messy_date(rng, when)
+        filename = f"{doc_type.replace(' ', '_')}_{i}{rng.choice(EXTENSIONS)}"
+        yield (
+            f"{name.split()[0].lower()}@usmedlab.org",
+            filename,
+            f"C:\\Users\\Owner\\Desktop\\docs\\{when.year}\\{filename}",
+            name if rng.random() > 0.3 else "",  # often empty even when present in description
+            date_text if rng.random() > 0.25 else "",
+            messy_date(rng, datetime(1950 + rng.randrange(50), 1 + rng.randrange(12), 1 + rng.randrange(28)))
+            if rng.random() > 0.6 else "",
+            f"{name.split()[-1].lower()}@example.com" if rng.random() > 0.5 else "",
+            company if rng.random() > 0.1 else "",
+            category,
+            description(rng, company, doc_type, name, date_text),
+            when + timedelta(seconds=rng.randrange(86400)),
+        )
+
+
+def _copy_escape(value) -> str:
+    if value is None:
+        return "\\N"
+    text = value.isoformat(sep=" ") if isinstance(value, datetime) else str(value)
+    return text.replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+
+
+def load(conn, count: int, reset: bool = False, chunk: int = 20_000, seed: int = 42):
+    """Create uml_temp if needed and COPY `count` synthetic rows into it."""
+    with conn, conn.cursor() as cur:
+        cur.execute(SCHEMA_SQL)
+        if reset:
+            # After migrate_partitions.py --split-description, uml_temp is a view over two tables
+            cur.execute("SELECT to_regclass('uml_description') IS NOT NULL")
+            if cur.fetchone()[0]:
+                cur.execute("TRUNCATE uml_temp_data, uml_description RESTART IDENTITY")
+            else:
+                cur.execute("TRUNCATE uml_temp RESTART IDENTITY")
+        else:
+            cur.execute("SELECT EXISTS (SELECT 1 FROM uml_temp)")
+            if cur.fetchone()[0]:
+                raise SystemExit("uml_temp already has rows; pass --reset to replace them.")
+
+    buffer = io.StringIO()
+    written = 0
+    for row in generate_rows(count, seed=seed):
+        buffer.write("\t".join(_copy_escape(v) for v in row) + "\n")
+        written += 1
+        if written % chunk == 0 or written == count:
+            buffer.seek(0)
+            with conn, conn.cursor() as cur:
+                cur.copy_from(buffer, "uml_temp", columns=COLUMNS)
+            buffer = io.StringIO()
+            print(f"  loaded {written:,}/{count:,} rows", flush=True)
+
+    with conn, conn.cursor() as cur:
+        cur.execute("ANALYZE uml_temp")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load a synthetic uml_temp corpus into a benchmark database.")
+    parser.add_argument("--scale", choices=sorted(SCALES), default="10k")
+    parser.add_argument("--rows", type=int, help="Exact row count (overrides --scale)")
+    parser.add_argument("--reset", action="store_true", help="Truncate uml_temp first")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    db_name = os.getenv("BENCH_DB_NAME")
+    if not db_name:
+        raise SystemExit("Set BENCH_DB_NAME to a dedicated benchmark database (never the production one).")
+    conn = psycopg2.connect(
+        host=os.getenv("DB_HOST", "localhost"),
+        port=int(os.getenv("DB_PORT", "5433")),
+        dbname=db_name,
+        user=os.getenv("DB_USER", "postgres"),
+        password=os.getenv("DB_PASSWORD", ""),
+    )
+    count = args.rows or SCALES[args.scale]
+    print(f"Generating {count:,} synthetic rows into {db_name}.uml_temp")
+    load(conn, count, reset=args.reset, seed=args.seed)
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
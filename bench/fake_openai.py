@@ -0,0 +1,133 @@
+# fake_openai.py - deterministic stand-in for the OpenAI client used by the benchmarks
+import json
+import re
+import time
+from types import SimpleNamespace
+
+from normalize import CATEGORY_ALIASES, COMPANY_ALIASES, canonical_category, canonical_company
+
+DOC_TYPES = ("invoice", "bank statement", "lab report", "compliance", "claim", "policy", "billing", "fraud")
+
+
+def _tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+def _quote(value: str) -> str:
+    return value.replace("'", "''")
+
+
+def fake_sql(user_query: str) -> str:
+    """Build SQL in the shape SYSTEM_PROMPT asks for (ILIKE/regex OR groups plus match_reason)."""
+    text = user_query.lower()
+    groups, reasons = [], []
+
+    company = canonical_company(text)
+    if company:
+        aliases = [company] + COMPANY_ALIASES[company][:4]
+        conds = [f"company ILIKE '%{_quote(a)}%'" for a in aliases] + [f"description ILIKE '%{_quote(company)}%'"]
+        groups.append("(" + " OR ".join(conds) + ")")
+        reasons += [f"CASE WHEN company ILIKE '%{_quote(a)}%' THEN 'Company: {_quote(a)}' END" for a in aliases]
+
+    category = canonical_category(text)
+    if category:
+        aliases = CATEGORY_ALIASES[category][:3]
+        conds = [f"category ILIKE '%{_quote(a)}%'" for a in aliases]
+        groups.append("(" + " OR ".join(conds) + ")")
+        reasons += [f"CASE WHEN category ILIKE '%{_quote(a)}%' THEN 'Category: {_quote(a)}' END" for a in aliases]
+
+    for doc_type in DOC_TYPES:
+        if doc_type in text:
+            pattern = doc_type.replace(" ", "%")
+            groups.append(f"(description ILIKE '%{pattern}%' OR filename ILIKE '%{pattern}%')")
+            reasons.append(f"CASE WHEN description ILIKE '%{pattern}%' THEN 'Description: {doc_type}' END")
+
+    years = re.findall(r"\b(20\d{2})\b", text)
+    if years:
+        year_re = "(" + "|".join(sorted(set(years))) + ")"
+        groups.append(f"(date ~* '{year_re}' OR description ~* '{year_re}')")
+        reasons.append(f"CASE WHEN date ~* '{year_re}' THEN 'Date field: {year_re}' END")
+
+    if not groups:
+        words = [w for w in re.findall(r"[a-z]{4,}", text)][:3] or ["document"]
+        groups.append("(" + " OR ".join(f"description ILIKE '%{w}%'" for w in words) + ")")
+        reasons += [f"CASE WHEN description ILIKE '%{w}%' THEN 'Description: {w}' END" for w in words]
+
+    return (
+        "SELECT *,\n  CONCAT_WS(' | ',\n    " + ",\n    ".join(reasons) + "\n  ) as match_reason\n"
+        "FROM uml_temp\nWHERE " + "\n   AND ".join(groups) + ";"
+    )
+
+
+def fake_analysis(document_text: str) -> str:
+    amounts = [float(a) for a in re.findall(r"\$?(\d{2,6}\.\d{2})", document_text)[:6]] or [120.0, 80.0, 45.5]
+    return json.dumps({
+        "analysis_text": "Synthetic analysis of the provided documents.",
+        "charts": [{
+            "type": "bar",
+            "title": "Amounts",
+            "labels": [f"Item {i + 1}" for i in range(len(amounts))],
+            "datasets": [{"label": "Amount", "data": amounts, "backgroundColor": ["#6366f1"] * len(amounts)}],
+        }],
+        "tables": [{"title": "Summary", "headers": ["Metric", "Value"], "rows": [["Documents", "n/a"]]}],
+        "key_findings": ["Deterministic benchmark output"],
+    })
+
+
+def fake_facts(document_text: str) -> str:
+    amounts = [float(a) for a in re.findall(r"\$?(\d{2,6}\.\d{2})", document_text)[:4]]
+    dates = re.findall(r"\b(20\d{2}-\d{2}-\d{2})\b", document_text)[:4]
+    return json.dumps({
+        "document_type": next((t for t in DOC_TYPES if t in document_text.lower()), "other"),
+        "dates": dates,
+        "amounts": [{"value": a, "currency": "USD", "label": "amount", "date": None} for a in amounts],
+        "payers": [], "patients": [], "diagnoses": [], "tests": [],
+        "companies": [c for c in [canonical_company(document_text)] if c],
+        "notes": "Synthetic extraction",
+    })
+
+
+class _Completions:
+    def __init__(self, owner):
+        self._owner = owner
+
+    def create(self, model=None, messages=None, temperature=None, max_tokens=None, **kwargs):
+        messages = messages or []
+        system = next((m["content"] for m in messages if m["role"] == "system"), "")
+        last_user = next((m["content"] for m in reversed(messages) if m["role"] == "user"), "")
+        prompt_text = "".join(m["content"] for m in messages)
+
+        if system.startswith("You are a PostgreSQL expert"):
+            content, latency = fake_sql(last_user), self._owner.sql_latency
+        elif system.startswith("You extract structured facts"):
+            content, latency = fake_facts(last_user), self._owner.chat_latency
+        elif "data analyst" in system:
+            content, latency = fake_analysis(prompt_text), self._owner.chat_latency
+        else:
+            content, latency = (
+                "- Key points: synthetic summary of the supplied documents.\n- Dates, names and amounts omitted.",
+                self._owner.chat_latency,
+            )
+
+        # Latency grows mildly with prompt size, like a real provider
+        time.sleep(latency + _tokens(prompt_text) * self._owner.per_token_latency)
+        self._owner.calls += 1
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=content))],
+            usage=SimpleNamespace(
+                prompt_tokens=_tokens(prompt_text),
+                completion_tokens=_tokens(content),
+                total_tokens=_tokens(prompt_text) + _tokens(content),
+            ),
+        )
+
+
+class FakeOpenAI:
+    """Mimics OpenAI().chat.completions.create with fixed, configurable latencies."""
+
+    def __init__(self, sql_latency: float = 0.1, chat_latency: float = 0.5, per_token_latency: float = 0.0):
+        self.sql_latency = sql_latency
+        self.chat_latency = chat_latency
+        self.per_token_latency = per_token_latency
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=_Completions(self))
@@ -0,0 +1,214 @@
+# run.py - end-to-end load benchmark for the dashboard API with a fake LLM
+import argparse
+import json
+import logging
+import os
+import random
+import resource
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+BACKEND_DIR = BENCH_DIR.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+SEARCHES = [
+    "Find compliance documents for UML from 2024",
+    "Bank statements for UML from january 2025 to july 2025",
+    "Show billing documents for UML",
+    "Legal and Compliance documents",
+    "Find all files from june 2023 to july 2025",
+    "invoices for Blue Cross in 2022",
+    "HR onboarding documents 2024",
+    "lab report for MMM Diagnostics 2021",
+]
+
+
+def rss_mb() -> float:
+    """Current resident set size of this process (Linux /proc, else peak from getrusage)."""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class RssSampler:
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self.peak = 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, rss_mb())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self.peak = rss_mb()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def post(base_url: str, path: str, payload: dict, timeout: float = 300.0):
+    req = urllib.request.Request(
+        base_url + path,
+        data=json.dumps(payload).encode("utf-8"),
+        headers={"Content-Type": "application/json"},
+        method="POST",
+    )
+    with urllib.request.urlopen(req, timeout=timeout) as res:
+        body = res.read()
+        if res.headers.get_content_type() == "application/x-ndjson":
+            # /batch-query streams one object per search; surface the first per-search error
+            lines = [json.loads(line) for line in body.splitlines() if line.strip()]
+            errors = [line["error"] for line in lines if line.get("error")]
+            return res.status, {"error": errors[0]} if errors else {"results": lines}
+        return res.status, json.loads(body) if body else {}
+
+
+def percentile(sorted_values, pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * pct / 100
+    lo, hi = int(k), min(int(k) + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+def run_endpoint(base_url, path, payloads, concurrency):
+    latencies, errors = [], 0
+    lock = threading.Lock()
+
+    def one(payload):
+        nonlocal errors
+        started = time.perf_counter()
+        try:
+            status, body = post(base_url, path, payload)
+            ok = status < 400 and not (isinstance(body, dict) and body.get("error"))
+        except Exception:
+            ok = False
+        elapsed = (time.perf_counter() - started) * 1000
+        with lock:
+            latencies.append(elapsed)
+            if not ok:
+                errors += 1
+
+    with RssSampler() as sampler:
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(one, payloads))
+        wall = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "endpoint": path,
+        "requests": len(payloads),
+        "concurrency": concurrency,
+        "errors": errors,
+        "p50_ms": round(percentile(latencies, 50), 1),
+        "p95_ms": round(percentile(latencies, 95), 1),
+        "p99_ms": round(percentile(latencies, 99), 1),
+        "mean_ms": round(statistics.fmean(latencies), 1) if latencies else 0.0,
+        "throughput_rps": round(len(payloads) / wall, 2) if wall else 0.0,
+        "peak_rss_mb": round(sampler.peak, 1),
+    }
+
+
+def build_payloads(base_url, requests_per_endpoint, rng):
+    """Prepare realistic payloads; chat endpoints reuse rows returned by a warm-up search."""
+    from fake_openai import fake_sql
+
+    _, sample = post(base_url, "/query", {"query": SEARCHES[0]})
+    rows = (sample.get("results") or [])[:50]
+    files = [
+        {"filename": r.get("filename"), "description": (r.get("description") or "")[:8000],
+         "category": r.get("category"), "filepath": r.get("filepath"), "id": r.get("id")}
+        for r in rows
+    ] or [{"filename": "empty.pdf", "description": "no rows", "category": "", "filepath": ""}]
+
+    def pick_files():
+        return rng.sample(files, k=min(len(files), rng.randint(1, 5)))
+
+    chats = [{"id": f"chat-{i}", "title": q, "messages": [{"role": "user", "content": q}]}
+             for i, q in enumerate(SEARCHES)]
+    return {
+        "/query": [{"query": rng.choice(SEARCHES)} for _ in range(requests_per_endpoint)],
+        "/run-sql": [{"sql": fake_sql(rng.choice(SEARCHES))} for _ in range(requests_per_endpoint)],
+        "/batch-query": [{"queries": rng.sample(SEARCHES, k=min(len(SEARCHES), 5))}
+                         for _ in range(requests_per_endpoint)],
+        "/summary-chat": [{"files": pick_files(), "message": "Summarize these documents"}
+                          for _ in range(requests_per_endpoint)],
+        "/analyse-chat": [{"files": pick_files(), "message": "Show billing amounts over time"}
+                          for _ in range(requests_per_endpoint)],
+        "/save-chats": [{"chats": chats} for _ in range(requests_per_endpoint)],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the dashboard API against a synthetic uml_temp.")
+    parser.add_argument("--requests", type=int, default=50, help="Requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--sql-latency", type=float, default=0.1, help="Fake LLM latency for SQL generation (s)")
+    parser.add_argument("--chat-latency", type=float, default=0.5, help="Fake LLM latency for chat calls (s)")
+    parser.add_argument("--endpoints", default="/query,/batch-query,/run-sql,/summary-chat,/analyse-chat,/save-chats")
+    parser.add_argument("--json", help="Write results to this JSON file")
+    parser.add_argument("--port", type=int, default=5055)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    db_name = os.getenv("BENCH_DB_NAME")
+    if not db_name:
+        raise SystemExit("Set BENCH_DB_NAME to the database loaded by bench/dataset.py.")
+
+    # Configure the app before import: benchmark DB, throwaway chat storage, no background indexer
+    os.environ["DB_NAME"] = db_name
+    os.environ.setdefault("OPENAI_API_KEY", "bench-fake-key")
+    os.environ["CHAT_STORE_DIR"] = tempfile.mkdtemp(prefix="bench_chats_")
+    os.environ.setdefault("INDEXER_ENABLED", "0")
+
+    from factory import create_app
+    from fake_openai import FakeOpenAI
+    from werkzeug.serving import make_server
+
+    fake = FakeOpenAI(sql_latency=args.sql_latency, chat_latency=args.chat_latency)
+    app = create_app(client=fake)
+
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    server = make_server("127.0.0.1", args.port, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{args.port}"
+
+    rng = random.Random(args.seed)
+    payloads = build_payloads(base_url, args.requests, rng)
+    results = []
+    for path in [p.strip() for p in args.endpoints.split(",") if p.strip()]:
+        print(f"-> {path} ({args.requests} requests, concurrency {args.concurrency})", flush=True)
+        results.append(run_endpoint(base_url, path, payloads[path], args.concurrency))
+    server.shutdown()
+
+    header = f"{'endpoint':<16}{'req':>6}{'err':>5}{'p50':>10}{'p95':>10}{'p99':>10}{'rps':>9}{'rss MB':>9}"
+    print("\n" + header + "\n" + "-" * len(header))
+    for r in results:
+        print(f"{r['endpoint']:<16}{r['requests']:>6}{r['errors']:>5}{r['p50_ms']:>10}{r['p95_ms']:>10}"
+              f"{r['p99_ms']:>10}{r['throughput_rps']:>9}{r['peak_rss_mb']:>9}")
+    print(f"\nfake LLM calls: {fake.calls}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+# startup.py - cold-start benchmark: wall time and heaviest imports of `import app`
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+ROOT_DIR = BENCH_DIR.parent
+TARGETS = {"backend": ROOT_DIR / "backend", "root": ROOT_DIR}
+# Modules that should never appear in a cold import of the app (they load on first use)
+HEAVY_MODULES = ("openai", "pandas", "fitz", "pypdf", "numpy")
+
+IMPORTTIME_RE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)$")
+
+
+def child_env():
+    env = dict(os.environ)
+    env.update({
+        "INDEXER_ENABLED": "0",
+        "WARM_UP_BACKGROUND": "0",
+        "CHAT_STORE_DIR": tempfile.mkdtemp(prefix="bench_startup_"),
+        "OPENAI_API_KEY": "",
+        "OPENAI_API": "",
+        "PYTHONDONTWRITEBYTECODE": "0",
+    })
+    return env
+
+
+def time_import(cwd: Path, env) -> float:
+    started = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "import app"], cwd=cwd, env=env, check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return time.perf_counter() - started
+
+
+def import_profile(cwd: Path, env):
+    """Top-level modules by cumulative import time (microseconds), from -X importtime."""
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", "import app"], cwd=cwd, env=env,
+                          capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise SystemExit(f"import app failed in {cwd}:\n{proc.stderr[-2000:]}")
+    cumulative = {}
+    for line in proc.stderr.splitlines():
+        m = IMPORTTIME_RE.match(line)
+        if m:
+            name = m.group(4)
+            cumulative[name] = max(cumulative.get(name, 0), int(m.group(2)))
+    return cumulative
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure cold-start time of the dashboard app.")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreter runs per target")
+    parser.add_argument("--targets", default="backend", help="Comma separated: backend,root")
+    parser.add_argument("--top", type=int, default=10, help="Heaviest imports to list")
+    parser.add_argument("--json", help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    env = child_env()
+    results = []
+    for name in [t.strip() for t in args.targets.split(",") if t.strip()]:
+        cwd = TARGETS[name]
+        time_import(cwd, env)  # compile bytecode so every measured run is a warm-disk cold start
+        times = [time_import(cwd, env) for _ in range(args.runs)]
+        profile = import_profile(cwd, env)
+        top = sorted(profile.items(), key=lambda kv: kv[1], reverse=True)[: args.top]
+        heavy = sorted(m for m in profile if m.split(".")[0] in HEAVY_MODULES)
+        results.append({
+            "target": name,
+            "runs": args.runs,
+            "median_ms": round(statistics.median(times) * 1000, 1),
+            "min_ms": round(min(times) * 1000, 1),
+            "top_imports_ms": [[m, round(us / 1000, 1)] for m, us in top],
+            "heavy_modules_imported": sorted({m.split(".")[0] for m in heavy}),
+        })
+
+    for r in results:
+        print(f"{r['target']}: median {r['median_ms']} ms, min {r['min_ms']} ms over {r['runs']} runs")
+        for module, ms in r["top_imports_ms"]:
+            print(f"  {module:<40}{ms:>9} ms")
+        if r["heavy_modules_imported"]:
+            print(f"  WARNING: imported at start-up: {', '.join(r['heavy_modules_imported'])}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
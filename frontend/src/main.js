@@ -145,6 +145,18 @@ const layout = `
                 <option value="">Any</option>
               </select>
             </div>
+            <div class="pill-select">
+              <label for="categorySelect">Category</label>
+              <select id="categorySelect">
+                <option value="" selected>Any</option>
+              </select>
+            </div>
+            <div class="pill-select">
+              <label for="yearSelect">Year</label>
+              <select id="yearSelect">
+                <option value="" selected>Any</option>
+              </select>
+            </div>
             <div class="pill-select">
               <label for="typeSelect">Type</label>
               <select id="typeSelect">
@@ -345,6 +357,10 @@ const els = {
   composerArea: document.getElementById("composerArea"),
   dropZone: document.getElementById("dropZone"),
   droppedFilesArea: document.getElementById("droppedFilesArea"),
+  // Facet pre-filters
+  entitySelect: document.getElementById("entitySelect"),
+  categorySelect: document.getElementById("categorySelect"),
+  yearSelect: document.getElementById("yearSelect"),
 };
 
 // Theme Management
@@ -442,16 +458,25 @@ async function loadChatsFromServer() {
 
     if (Array.isArray(data.chats) && data.chats.length) {
       // Ensure each chat has required properties
-      const validChats = data.chats.map(chat => ({
-        id: chat.id,
-        title: chat.title || "New chat",
-        messages: Array.isArray(chat.messages) ? chat.messages : [],
-        droppedFiles: Array.isArray(chat.droppedFiles) ? chat.droppedFiles : [],
-        summaryConversationId: chat.summaryConversationId || null,
-        analyseConversationId: chat.analyseConversationId || null,
-        results: [],  // Don't load results from server
-        meta: { sql: null, total: 0, returned: 0, source: "mock", error: null, show_all_available: false },
-      }));
+      const validChats = data.chats.map(chat => {
+        const messages = Array.isArray(chat.messages) ? chat.messages : [];
+        const last = [...messages].reverse().find((m) => m.snapshot);
+        return {
+          id: chat.id,
+          title: chat.title || "New chat",
+          messages,
+          droppedFiles: Array.isArray(chat.droppedFiles) ? chat.droppedFiles : [],
+          summaryConversationId: chat.summaryConversationId || null,
+          analyseConversationId: chat.analyseConversationId || null,
+          pendingAnalyseJob: chat.pendingAnalyseJob || null,
+          // Rows are not stored in the chat: they are read back from the last result snapshot when the chat is opened
+          results: [],
+          meta: {
+            sql: last?.sql || null, total: 0, returned: 0, source: "mock", error: null, show_all_available: false,
+            snapshot: last?.snapshot || null,
+          },
+        };
+      });
 
       const deduped = dedupeChats(validChats);
       state.chats = deduped;
@@ -471,6 +496,7 @@ function persistChats() {
     droppedFiles: chat.droppedFiles || [],
     summaryConversationId: chat.summaryConversationId || null,
     analyseConversationId: chat.analyseConversationId || null,
+    pendingAnalyseJob: chat.pendingAnalyseJob || null,
     // Don't persist results/meta - they're in-memory only
   }));
 
@@ -488,6 +514,7 @@ function setActiveChat(chatId) {
   renderMessages();
   renderDroppedFiles();  // Update dropped files display for this chat
   renderResults();  // Update results display for this chat
+  restoreChatResults(state.chats.find((c) => c.id === chatId));
 }
 
 function renderChats() {
@@ -609,7 +636,7 @@ function renderMessages() {
       const msgIdx = parseInt(btn.dataset.sqlRun, 10);
       const msg = chat.messages[msgIdx];
       if (msg?.sql) {
-        rerunSqlQuery(msg.sql);
+        rerunSqlQuery(msg.sql, msg);
       }
     });
   });
@@ -661,7 +688,10 @@ function renderResults() {
 
   // Update subtitle
   if (meta.total > 0) {
-    els.resultsSubtitle.textContent = `Found ${meta.total} matching documents`;
+    const timing = formatServerTiming(meta.timing);
+    const saved = meta.source === "snapshot" ? " · saved results" : "";
+    els.resultsSubtitle.textContent = `Found ${meta.total} matching documents${saved}${timing ? ` · ${timing}` : ""}`;
+    els.resultsSubtitle.title = timing ? "Server-side time per stage" : "";
   } else if (meta.error) {
     els.resultsSubtitle.textContent = `Error: ${meta.error}`;
   } else {
@@ -950,6 +980,7 @@ async function runSummaryQuery(message, targetChatId) {
       headers: { "Content-Type": "application/json" },
       body: JSON.stringify({
         files: droppedFiles.map((f) => ({
+          id: f.id ?? null,  // keys the server-side per-document summary cache
           filename: f.filename,
           description: f.description || "",
           category: f.category || "",
@@ -1017,13 +1048,17 @@ async function runAnalyseQuery(message, targetChatId) {
       headers: { "Content-Type": "application/json" },
       body: JSON.stringify({
         files: droppedFiles.map((f) => ({
+          id: f.id ?? null,  // keys the server-side per-document extraction cache
           filename: f.filename,
           description: f.description || "",
           category: f.category || "",
+          company: f.company || "",
+          date: f.date || "",
           filepath: f.filepath || "",
         })),
         message: message,
         conversation_id: chat?.analyseConversationId || "",
+        async: true,  // queued server-side; survives timeouts and page reloads
       }),
     });
 
@@ -1031,25 +1066,13 @@ async function runAnalyseQuery(message, targetChatId) {
       throw new Error(`Server returned ${res.status}`);
     }
 
-    const data = await res.json();
-
-    if (data.success) {
-      // Store conversation ID for follow-up questions
-      if (chat) {
-        chat.analyseConversationId = data.conversation_id;
-        persistChats();
-      }
-
-      // Add assistant message with analysis data
-      addMessageToChat(targetChatId, {
-        role: "assistant",
-        content: data.analysis.analysis_text || "Analysis complete.",
-        sql: null,
-        analysis: data.analysis,  // Store full analysis data for chart rendering
-      });
-    } else {
-      throw new Error(data.error || "Unknown error");
+    const job = await res.json();
+    if (chat) {
+      chat.analyseConversationId = job.conversation_id;
+      chat.pendingAnalyseJob = job.job_id;
+      persistChats();
     }
+    await waitForAnalyseJob(targetChatId, job.job_id);
 
   } catch (error) {
     addMessageToChat(targetChatId, {
@@ -1065,6 +1088,60 @@ async function runAnalyseQuery(message, targetChatId) {
   }
 }
 
+// Poll a background analyse job until it finishes, then add its result to the chat
+async function waitForAnalyseJob(chatId, jobId) {
+  for (;;) {
+    const res = await fetch(`/jobs/${encodeURIComponent(jobId)}`);
+    if (res.status === 404) {
+      clearPendingAnalyseJob(chatId);
+      throw new Error("Analysis job expired");
+    }
+    if (!res.ok) throw new Error(`Server returned ${res.status}`);
+
+    const job = await res.json();
+    if (job.status === "done") {
+      const data = job.result;
+      clearPendingAnalyseJob(chatId);
+      addMessageToChat(chatId, {
+        role: "assistant",
+        content: data.analysis.analysis_text || "Analysis complete.",
+        sql: null,
+        analysis: data.analysis,  // Store full analysis data for chart rendering
+      });
+      return;
+    }
+    if (job.status === "failed") {
+      clearPendingAnalyseJob(chatId);
+      throw new Error(job.error || "Unknown error");
+    }
+    if (job.message) {
+      els.loadBar.title = `${job.message} (${Math.round((job.progress || 0) * 100)}%)`;
+    }
+    await new Promise((resolve) => setTimeout(resolve, 1500));
+  }
+}
+
+function clearPendingAnalyseJob(chatId) {
+  const chat = state.chats.find((c) => c.id === chatId);
+  if (chat) chat.pendingAnalyseJob = null;
+  els.loadBar.title = "";
+}
+
+// After a reload, pick up analyses that were still running server-side
+function resumePendingAnalyseJobs() {
+  state.chats
+    .filter((chat) => chat.pendingAnalyseJob)
+    .forEach((chat) => {
+      waitForAnalyseJob(chat.id, chat.pendingAnalyseJob)
+        .catch((error) => {
+          addMessageToChat(chat.id, { role: "assistant", content: `Error: ${error.message}`, sql: null });
+        })
+        .finally(() => {
+          if (chat.id === state.activeChatId) renderMessages();
+        });
+    });
+}
+
 // Render analysis charts using Chart.js
 function renderAnalysisCharts(containerId, analysis) {
   const container = document.getElementById(containerId);
@@ -1265,8 +1342,65 @@ function autoResizeTextarea() {
   textarea.style.height = Math.min(textarea.scrollHeight, 150) + "px";
 }
 
-// Re-run a specific SQL query from chat history
-async function rerunSqlQuery(sql) {
+// Server-Timing header -> [{ name, dur }] (per-stage backend timings in ms)
+function parseServerTiming(header) {
+  if (!header) return [];
+  return header.split(",").map((entry) => {
+    const [name, ...params] = entry.trim().split(";");
+    const dur = params.map((p) => p.trim()).find((p) => p.startsWith("dur="));
+    return { name, dur: dur ? parseFloat(dur.slice(4)) : null };
+  }).filter((t) => t.name && t.dur !== null);
+}
+
+const TIMING_LABELS = { sql_gen: "SQL gen", db: "DB", format: "format", serialize: "JSON", total: "total" };
+
+function formatServerTiming(timing) {
+  if (!Array.isArray(timing) || !timing.length) return "";
+  return timing
+    .filter((t) => TIMING_LABELS[t.name])
+    .map((t) => `${TIMING_LABELS[t.name]} ${Math.round(t.dur)}ms`)
+    .join(" · ");
+}
+
+// Rows of a saved result snapshot, read back by id; null once it has expired or cannot be read back
+async function fetchSnapshot(snapshotId) {
+  try {
+    const res = await fetch(`/snapshots/${encodeURIComponent(snapshotId)}`);
+    if (!res.ok) return null;
+    return { data: await res.json(), timing: parseServerTiming(res.headers.get("Server-Timing")) };
+  } catch (err) {
+    return null;
+  }
+}
+
+// Show a reopened chat's last results again from its snapshot, without re-running the query
+async function restoreChatResults(chat) {
+  if (!chat || chat.results?.length || !chat.meta?.snapshot || chat.meta.restoring) return;
+  chat.meta.restoring = true;
+  const snapshot = await fetchSnapshot(chat.meta.snapshot);
+  chat.meta.restoring = false;
+  if (!snapshot) {
+    chat.meta.snapshot = null;
+    return;
+  }
+  const results = snapshot.data.results || [];
+  chat.results = results;
+  chat.meta = {
+    sql: snapshot.data.sql || chat.meta.sql,
+    total: snapshot.data.total_count ?? results.length,
+    returned: snapshot.data.returned_count ?? results.length,
+    source: "snapshot",
+    error: null,
+    show_all_available: false,
+    snapshot: snapshot.data.snapshot_id,
+    timing: snapshot.timing,
+  };
+  if (chat.id === state.activeChatId) renderResults();
+}
+
+// Re-run a specific SQL query from chat history: from the message's result snapshot while it
+// is still kept (a lookup by id), otherwise by executing the SQL again
+async function rerunSqlQuery(sql, msg = null) {
   if (!sql) return;
 
   const chat = state.chats.find((c) => c.id === state.activeChatId);
@@ -1280,17 +1414,26 @@ async function rerunSqlQuery(sql) {
   els.loadBar.classList.add("is-active");
 
   try {
-    const res = await fetch("/run-sql", {
-      method: "POST",
-      headers: { "Content-Type": "application/json" },
-      body: JSON.stringify({ sql }),
-    });
+    const snapshot = msg?.snapshot ? await fetchSnapshot(msg.snapshot) : null;
+    let data;
+    let timing;
+    if (snapshot) {
+      ({ data, timing } = snapshot);
+    } else {
+      const res = await fetch("/run-sql", {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify({ sql }),
+      });
 
-    if (!res.ok) {
-      throw new Error(`Server returned ${res.status}`);
-    }
+      if (!res.ok) {
+        throw new Error(`Server returned ${res.status}`);
+      }
 
-    const data = await res.json();
+      data = await res.json();
+      timing = parseServerTiming(res.headers.get("Server-Timing"));
+      if (msg) msg.snapshot = data.snapshot_id || null;
+    }
     const results = data.results || [];
 
     const totalCount = data.total_count ?? results.length;
@@ -1302,9 +1445,11 @@ async function rerunSqlQuery(sql) {
       sql: sql,
       total: totalCount,
       returned: returnedCount,
-      source: "db",
+      source: snapshot ? "snapshot" : "db",
       error: null,
       show_all_available: totalCount > returnedCount,
+      snapshot: data.snapshot_id || null,
+      timing,
     };
     persistChats();
 
@@ -1351,6 +1496,7 @@ async function runQuery(text, showAll = false, targetChatId = null) {
         query: text,
         show_all: showAll,
         chat_id: chatId,
+        filters: getSelectedFilters(),
       }),
     });
 
@@ -1388,6 +1534,8 @@ async function runQuery(text, showAll = false, targetChatId = null) {
         source: meta.source || (data.sql ? "db" : "mock"),
         error: meta.error || null,
         show_all_available: meta.show_all_available || (totalCount > returnedCount),
+        snapshot: data.snapshot_id || null,
+        timing: parseServerTiming(res.headers.get("Server-Timing")),
       };
       persistChats();
     }
@@ -1400,6 +1548,7 @@ async function runQuery(text, showAll = false, targetChatId = null) {
           role: "assistant",
           content: assistant.content,
           sql: assistant.sql || data.sql,
+          snapshot: data.snapshot_id || null,
         });
       }
     } else if (data.sql) {
@@ -1408,6 +1557,7 @@ async function runQuery(text, showAll = false, targetChatId = null) {
         role: "assistant",
         content: `Found ${totalCount} results.`,
         sql: data.sql,
+        snapshot: data.snapshot_id || null,
       });
     }
 
@@ -1515,9 +1665,53 @@ function openRecordModal(record) {
 
   els.modal.classList.add("is-open");
   document.body.style.overflow = "hidden";
+  loadRecordPreview(record);
+}
+
+// Preview (rendered and cached server-side; avoids downloading the original file)
+const PREVIEWABLE = /\.(pdf|docx|xlsx)$/i;
+let previewToken = 0;
+
+async function loadRecordPreview(record) {
+  const token = ++previewToken;
+  const slot = els.modalBody.querySelector(".record-preview");
+  if (!slot) return;
+
+  const path = encodeURIComponent(record.filepath);
+  for (let attempt = 0; attempt < 5; attempt++) {
+    let res;
+    try {
+      res = await fetch(`/preview?path=${path}`);
+    } catch {
+      break;
+    }
+    if (token !== previewToken) return; // modal moved on to another record
+    if (res.status === 202) {
+      await new Promise((resolve) => setTimeout(resolve, 1000));
+      continue;
+    }
+    if (!res.ok) break;
+
+    const data = await res.json();
+    if (token !== previewToken) return;
+    const thumb = data.thumbnail
+      ? `<img class="record-preview__thumb" loading="lazy" alt="First page" src="/preview?path=${path}&kind=thumb">`
+      : "";
+    // html is built and escaped server-side from the document's own text
+    const body = data.html
+      ? `<div class="record-preview__html">${data.html}</div>`
+      : `<pre class="record-preview__text">${escapeHtml(data.text || data.note || data.error || "No preview text")}</pre>`;
+    slot.innerHTML = `
+      <div class="detail-label"><i class="bi bi-eye"></i><span>Preview</span></div>
+      <div class="record-preview__content">${thumb}${body}</div>
+    `;
+    return;
+  }
+  if (token === previewToken) slot.remove();
 }
 
 function closeRecordModal() {
+  previewToken++;
   els.modal.classList.remove("is-open");
   document.body.style.overflow = "";
 }
@@ -1535,7 +1729,11 @@ function buildRecordDetail(record) {
     { key: "description", label: "Description", icon: "bi-text-paragraph" },
   ];
 
-  return fields.map(({ key, label, icon }) => `
+  const preview = record.filepath && PREVIEWABLE.test(record.filepath)
+    ? `<div class="detail-row full-width record-preview"><div class="record-preview__loading">Loading preview…</div></div>`
+    : "";
+
+  return preview + fields.map(({ key, label, icon }) => `
     <div class="detail-row ${key === 'match_reason' ? 'highlight' : ''} ${key === 'description' ? 'full-width' : ''}">
       <div class="detail-label">
         <i class="bi ${icon}"></i>
@@ -1720,6 +1918,40 @@ function pingHealth() {
     });
 }
 
+// Facet counts (precomputed server-side) for the Entity/Category/Year pre-filters
+function fillFacetSelect(select, items) {
+  if (!select || !Array.isArray(items) || !items.length) return;
+  const current = select.value;
+  // Keep the current choice (e.g. the UML default) even when it has no counts yet
+  const missing = current && !items.some((item) => String(item.value) === current)
+    ? `<option value="${escapeHtml(current)}">${escapeHtml(current)}</option>`
+    : "";
+  select.innerHTML = missing + items
+    .map((item) => `<option value="${escapeHtml(item.value)}">${escapeHtml(item.value)} (${Number(item.count).toLocaleString()})</option>`)
+    .join("") + `<option value="">Any</option>`;
+  select.value = current;
+}
+
+function loadFacets() {
+  fetch("/facets")
+    .then((res) => res.json())
+    .then((data) => {
+      const facets = data.facets || {};
+      fillFacetSelect(els.entitySelect, facets.company);
+      fillFacetSelect(els.categorySelect, facets.category);
+      fillFacetSelect(els.yearSelect, facets.year);
+    })
+    .catch(() => {});
+}
+
+function getSelectedFilters() {
+  const filters = {};
+  if (els.entitySelect?.value) filters.company = [els.entitySelect.value];
+  if (els.categorySelect?.value) filters.category = [els.categorySelect.value];
+  if (els.yearSelect?.value) filters.year = [els.yearSelect.value];
+  return filters;
+}
+
 // Toggle SQL visibility
 let sqlCollapsed = true;
 function toggleSQL() {
@@ -1878,6 +2110,8 @@ function init() {
     renderMessages();
     renderResults();
     renderDroppedFiles();  // Initialize dropped files display
+    restoreChatResults(state.chats.find((c) => c.id === state.activeChatId));
+    resumePendingAnalyseJobs();
     toggleSidebarMobile(false);
     setupDropZone();  // Set up drag-and-drop for SUMMARY mode
 
@@ -1981,3 +2215,4 @@ function init() {
 
 init();
 pingHealth();
+loadFacets();